@@ -1,75 +1,382 @@
 # flask_app/app.py
-from flask import Flask, render_template, request, redirect, url_for
-import pandas as pd
-import joblib
+from flask import Flask, render_template, request, redirect, url_for, jsonify, g, Response
 import numpy as np
 import os
+import sys
+import time
+
+# Shared modules (player index, similarity) live in scripts/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+
+from comparison_charts import ComparisonCharts
+from instrumentation import CallbackCounter, Histogram, metrics
+from micro_batcher import MicroBatcher
+from model_registry import RELOAD_INTERVAL, ModelRegistry
+from name_index import MAX_LIMIT, load_name_index
+from prediction_cache import PredictionCache
+from predictor import parse_stat_rows, predict_rows, quantize_stat_rows
+from player_season_store import PARTITION_METRICS, POSITIONS
+from similarity import FEATURES, METRICS, MAX_K, resolve_weights
 
 app = Flask(__name__)
 
-# Load scaler and KMeans models
-scaler = joblib.load('models/scaler_regular.pkl')  # Default (Regular Season scaler)
-kmeans = joblib.load('models/kmeans_regular.pkl')
+# Load scalers, KMeans models and clustered datasets once for both seasons
+registry = ModelRegistry()
+registry.preload()
+
+# Every known player name, for autocomplete and forgiving name lookups
+player_names = load_name_index()
+
+def refresh_player_names(season, models):
+    global player_names
+    player_names = load_name_index()
+
+# Pick up retrained models and regenerated datasets without a restart
+# (checked every NBA_RELOAD_INTERVAL seconds; 0 turns it off)
+registry.add_reload_listener(refresh_player_names)
+registry.watch(RELOAD_INTERVAL)
+
+# Results of repeated stat lines (sized by NBA_PREDICTION_CACHE_SIZE / _TTL)
+prediction_cache = PredictionCache()
+
+def cache_counts():
+    registry_counts, prediction_counts = registry.stats(), prediction_cache.stats()
+    return {
+        ('model_registry', 'hit'): registry_counts['hits'],
+        ('model_registry', 'miss'): registry_counts['loads'],
+        ('prediction', 'hit'): prediction_counts['hits'],
+        ('prediction', 'miss'): prediction_counts['misses'],
+    }
+
+# Registry and prediction cache hits, read at scrape time
+metrics.add_collector(CallbackCounter('nba_cache_requests_total', "Cache lookups by result.", ('cache', 'result'), cache_counts))
+
+def reload_counts():
+    counts = registry.stats()
+    return {('success',): counts['reloads'], ('failure',): counts['failed_reloads']}
+
+# Hot reloads of changed artifacts, by outcome
+metrics.add_collector(CallbackCounter('nba_model_reloads_total', "Artifact hot reloads by result.", ('result',), reload_counts))
+
+# Comparison charts for the result page, rendered off the request threads
+# (cache sized by NBA_CHART_CACHE_BYTES, pool by NBA_CHART_WORKERS)
+comparison_charts = ComparisonCharts()
+
+# Concurrent requests coalesced into one prediction call; off unless
+# enable_micro_batching() is called (serve.py does) or NBA_MICRO_BATCH_MS is set
+batcher = None
+batch_sizes = Histogram('nba_micro_batch_rows', "Stat lines scored per micro-batch.", ('season',),
+                        buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+metrics.add_collector(batch_sizes)
+
+def enable_micro_batching(max_wait_ms=2.0, max_batch=512):
+    global batcher
+    if batcher is None:
+        batcher = MicroBatcher(lambda models, X, similar, filters: predict_rows(models, X, similar, prediction_cache, filters),
+                               max_batch=max_batch, max_wait=max_wait_ms / 1000, size_histogram=batch_sizes)
+    return batcher
+
+if os.environ.get('NBA_MICRO_BATCH_MS'):
+    enable_micro_batching(float(os.environ['NBA_MICRO_BATCH_MS']))
+
+def run_prediction(models, X, similar=None, filters=None):
+    """
+    Scores stat lines for one season, through the micro-batcher when enabled.
+    """
+    if batcher is not None:
+        return batcher.predict(models, X, similar, filters)
+    return predict_rows(models, X, similar, prediction_cache, filters)
+
+# Form field names for the optional per-feature similarity weights
+WEIGHT_FIELDS = [(f"Weight_{i}", feature) for i, feature in enumerate(FEATURES)]
+
+# Home page form fields for the stat line, as (form field, feature)
+STAT_FIELDS = [('PTS', 'PTS'), ('Age', 'Age'), ('Usage_Rate', 'Usage Rate'), ('AST', 'AST'), ('TRB', 'TRB'),
+               ('STL', 'STL'), ('BLK', 'BLK'), ('ThreeP', '3P%')]
+
+def read_similarity_options(source):
+    """
+    Reads k, metric and per-feature weights from form data or a JSON payload.
+    Weights are None when every weight is left at its default of 1.
+    Raises ValueError for anything invalid.
+    """
+    try:
+        k = int(source.get('k') or 5)
+    except (TypeError, ValueError):
+        raise ValueError(f"k must be a whole number between 1 and {MAX_K}.")
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}.")
+    metric = source.get('metric') or 'euclidean'
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. Choose from {METRICS}.")
+
+    weights = source.get('weights')
+    try:
+        if weights is None:
+            weights = {feature: float(source[field]) for field, feature in WEIGHT_FIELDS if source.get(field)}
+        weights = resolve_weights(weights or None)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid weights: {e}")
+    if (weights == 1).all():
+        weights = None
+    return k, metric, weights
+
+class FiltersUnavailable(Exception):
+    pass
 
-# Load manually clustered datasets
-regular_season_data = pd.read_csv('data/clustered/Clustered_Manual_Regular_Season.csv')
-playoff_data = pd.read_csv('data/clustered/Clustered_Manual_Playoffs.csv')
+def read_player_filters(source, models, metric):
+    """
+    Reads the optional season and position filters ('seasons' and 'positions',
+    repeated form fields or JSON lists of strings) and validates them against
+    the season's player-season store. Returns None when no filter is given.
+    """
+    filters = []
+    for key in ('seasons', 'positions'):
+        values = source.getlist(key) if hasattr(source, 'getlist') else source.get(key)
+        if isinstance(values, str):
+            values = [values]
+        if values is not None and (not isinstance(values, list) or not all(isinstance(value, str) for value in values)):
+            raise ValueError(f"'{key}' must be a list of strings, e.g. {['2023-24'] if key == 'seasons' else ['C']}.")
+        filters.append([value for value in values or () if value])
+    if not any(filters):
+        return None
+    if models.player_seasons is None:
+        raise FiltersUnavailable("No player-season store for this season. Run scripts/player_season_store.py.")
+    if metric not in PARTITION_METRICS:
+        raise ValueError(f"Season and position filters support the {PARTITION_METRICS} metrics only.")
+    return models.player_seasons.resolve_filters(*filters)
+
+def filter_choices():
+    # Seasons offered by either season type's store, for the home page
+    seasons = set()
+    for season in registry.artifacts:
+        store = registry.get(season).player_seasons
+        if store is not None:
+            seasons.update(store.seasons)
+    return sorted(seasons), POSITIONS
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.season = 'none'
+
+@app.after_request
+def record_request(response):
+    metrics.observe_request(request.endpoint or 'unknown', g.season, response.status_code,
+                            time.perf_counter() - g.request_start)
+    g.request_recorded = True
+    return response
+
+@app.teardown_request
+def record_failed_request(exc):
+    # Unhandled exceptions skip after_request
+    if exc is not None and not g.get('request_recorded') and 'request_start' in g:
+        metrics.observe_request(request.endpoint or 'unknown', g.season, 500,
+                                time.perf_counter() - g.request_start)
 
 @app.route('/', methods=['GET', 'POST'])
 def home():
     if request.method == 'POST':
         # Collect form data
-        pts = float(request.form['PTS'])
-        age = float(request.form['Age'])
-        usage = float(request.form['Usage_Rate'])
-        ast = float(request.form['AST'])
-        trb = float(request.form['TRB'])
-        stl = float(request.form['STL'])
-        blk = float(request.form['BLK'])
-        three_pct = float(request.form['ThreeP'])
+        stats = {feature: request.form[field] for field, feature in STAT_FIELDS}
 
         # Season choice
         season = request.form['Season']
+        g.season = 'P' if season == 'P' else 'R'
 
-        # Select dataset and models based on season
-        if season == 'P':
-            selected_data = playoff_data
-            scaler_path = 'models/scaler_playoffs.pkl'
-            kmeans_path = 'models/kmeans_playoffs.pkl'
-        else:
-            selected_data = regular_season_data
-            scaler_path = 'models/scaler_regular.pkl'
-            kmeans_path = 'models/kmeans_regular.pkl'
+        # Select the preloaded models and dataset for the season
+        with metrics.phase('model_load', g.season):
+            models = registry.get(g.season)
+
+        # Predict the cluster, the most similar player (through the season's
+        # KD-tree index) and the top-k comparable players with the requested
+        # metric and weights, or reuse the result for the same stat line.
+        # The stat line is validated like the API's rows.
+        try:
+            user_input = parse_stat_rows([stats])
+            k, metric, weights = read_similarity_options(request.form)
+            filters = read_player_filters(request.form, models, metric)
+        except (ValueError, FiltersUnavailable) as e:
+            seasons, positions = filter_choices()
+            return render_template('home.html', metrics=METRICS, weight_fields=WEIGHT_FIELDS,
+                                   filter_seasons=seasons, filter_positions=positions, error=str(e)), 400
+        prediction_cache.sync(g.season, lambda: registry.version(g.season))
+        try:
+            result = run_prediction(models, user_input, (k, metric, weights), filters)[0]
+        except TimeoutError as e:
+            seasons, positions = filter_choices()
+            return render_template('home.html', metrics=METRICS, weight_fields=WEIGHT_FIELDS,
+                                   filter_seasons=seasons, filter_positions=positions,
+                                   error=f"{e}. Please try again."), 503, {'Retry-After': '1'}
+        player_type = result['player_type']
+        closest_player = result['closest_player']
+        comparisons = result['similar']
+
+        # Queued now so it is usually ready by the time the page asks for it
+        chart = comparison_charts.submit(models, quantize_stat_rows(user_input)[0], result['cluster'],
+                                         closest_player, result.get('closest_season'))
+
+        with metrics.phase('render', g.season):
+            return render_template('result.html', player_type=player_type, closest_player=closest_player, chart=chart,
+                                   closest_season=result.get('closest_season'),
+                                   closest_position=result.get('closest_position'),
+                                   comparisons=comparisons, metric=metric, filtered=filters is not None)
+
+    seasons, positions = filter_choices()
+    return render_template('home.html', metrics=METRICS, weight_fields=WEIGHT_FIELDS,
+                           filter_seasons=seasons, filter_positions=positions)
+
+@app.route('/api/predict', methods=['POST'])
+def api_predict():
+    """
+    Batch prediction. Expects JSON like
+        {"season": "R", "players": [{"PTS": 25, "Age": 27, ..., "3P%": 0.37}, ...]}
+    Rows may override the season with their own "season" key. Rows are grouped
+    by season and each group is scored in one vectorized pass, skipping rows
+    found in the prediction cache. Passing "k"
+    (optionally with "metric" and a "weights" dict) adds the top-k comparable
+    players to every result. Passing "seasons" (e.g. ["2023-24"]) and/or
+    "positions" (e.g. ["C"]) compares against those player-seasons only.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('players'), list):
+        return jsonify(error="Expected a JSON object with a 'players' list."), 400
 
-        # Load appropriate scaler and kmeans
-        scaler = joblib.load(scaler_path)
-        kmeans = joblib.load(kmeans_path)
+    rows = payload['players']
+    default_season = payload.get('season', 'R')
+    seasons = np.array([
+        row.get('season', default_season) if isinstance(row, dict) else default_season
+        for row in rows
+    ], dtype=object)
+    seasons = np.where(seasons == 'P', 'P', 'R')
+    if len(seasons):
+        g.season = seasons[0] if (seasons == seasons[0]).all() else 'mixed'
 
-        # Prepare user input
-        user_input = np.array([[pts, age, usage, ast, trb, stl, blk, three_pct]])
-        user_scaled = scaler.transform(user_input)
+    try:
+        X = parse_stat_rows(rows)
+        k, metric, weights = read_similarity_options(payload)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
 
-        # Predict cluster
-        predicted_cluster = kmeans.predict(user_scaled)[0]
+    results = [None] * len(rows)
+    for season in ('R', 'P'):
+        idx = np.flatnonzero(seasons == season)
+        if len(idx) == 0:
+            continue
+        with metrics.phase('model_load', season):
+            models = registry.get(season)
+        try:
+            filters = read_player_filters(payload, models, metric)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        except FiltersUnavailable as e:
+            return jsonify(error=str(e)), 503
+        prediction_cache.sync(season, lambda: registry.version(season))
+        similar = (k, metric, weights) if 'k' in payload else None
+        try:
+            season_results = run_prediction(models, X[idx], similar, filters)
+        except TimeoutError as e:
+            return jsonify(error=str(e)), 503, {'Retry-After': '1'}
+        for i, result in zip(idx, season_results):
+            results[i] = dict(result, season=season)
 
-        # Get label directly from the clustered dataset
-        cluster_label = selected_data[selected_data['Cluster_Label'] == predicted_cluster]['Cluster_Label'].values
-        if len(cluster_label) > 0:
-            player_type = cluster_label[0]
+    return jsonify(results=results)
+
+@app.route('/api/player/<name>/similar', methods=['GET'])
+def player_similar(name):
+    """
+    Most similar players to an existing player, e.g.
+        GET /api/player/Nikola%20Jokic/similar?season=P&k=5
+    Answered from the season's precomputed neighbor table.
+    """
+    season = g.season = 'P' if request.args.get('season') == 'P' else 'R'
+    table = registry.get(season).neighbors
+    if table is None:
+        return jsonify(error="No neighbor table for this season. Run scripts/neighbor_table.py."), 503
+
+    # Accept other spellings of a known name, e.g. without accents or with typos
+    if name not in table:
+        for spelling in player_names.spellings_for(player_names.resolve(name)):
+            if spelling in table:
+                name = spelling
+                break
         else:
-            player_type = "Unknown"
+            suggestions = [entry['player'] for entry in player_names.search(name, 5, season)]
+            return jsonify(error=f"Unknown player '{name}'.", suggestions=suggestions), 404
+
+    try:
+        k = int(request.args.get('k') or 5)
+        similar = table.similar(name, k)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    _, player = table.find(name)
+    return jsonify(player=player, season=season, similar=similar)
+
+@app.route('/api/players', methods=['GET'])
+def search_players():
+    """
+    Player name autocomplete, e.g.
+        GET /api/players?q=jok&limit=5&season=P
+    Returns exact, then prefix, then fuzzy matches, folding accents, case and
+    punctuation. season (R or P) limits results to players from that season type.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify(error="Missing query parameter 'q'."), 400
+    try:
+        limit = int(request.args.get('limit') or 10)
+    except ValueError:
+        return jsonify(error="limit must be an integer."), 400
+    if not 1 <= limit <= MAX_LIMIT:
+        return jsonify(error=f"limit must be between 1 and {MAX_LIMIT}."), 400
+    season = request.args.get('season')
+    if season not in (None, 'R', 'P'):
+        return jsonify(error="season must be R or P."), 400
+
+    return jsonify(query=query, results=player_names.search(query, limit, season))
+
+@app.route('/charts/<key>.svg', methods=['GET'])
+def comparison_chart(key):
+    """
+    A comparison chart queued by the result page, waiting briefly if it is
+    still being rendered.
+    """
+    try:
+        svg = comparison_charts.get(key)
+    except KeyError:
+        return jsonify(error="Unknown or expired chart."), 404
+    except TimeoutError:
+        return jsonify(error="Chart is still being rendered."), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify(error=f"Chart rendering failed: {e}"), 500
+    return Response(svg, mimetype='image/svg+xml', headers={'Cache-Control': 'private, max-age=3600'})
+
+@app.route('/api/charts', methods=['GET'])
+def chart_stats():
+    # Chart cache size, hit rate and render counts
+    return jsonify(comparison_charts.stats())
+
+@app.route('/api/registry', methods=['GET'])
+def registry_stats():
+    # Load/hit counters, used to confirm models are not reloaded per request
+    return jsonify(registry.stats())
 
-        # Find most similar player
-        features = ['PTS', 'Age', 'Usage Rate', 'AST', 'TRB', 'STL', 'BLK', '3P%']
-        X = selected_data[features]
-        X_scaled = scaler.transform(X)
-        distances = np.linalg.norm(X_scaled - user_scaled, axis=1)
-        closest_idx = np.argmin(distances)
-        closest_player = selected_data.iloc[closest_idx]['Player']
+@app.route('/api/version', methods=['GET'])
+def model_versions():
+    # Active artifact version per season, when it was loaded and how long it took
+    return jsonify(versions=registry.versions(), reloads=registry.stats()['reloads'])
 
-        return render_template('result.html', player_type=player_type, closest_player=closest_player)
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    # Prediction cache size and hit rate
+    return jsonify(prediction_cache.stats())
 
-    return render_template('home.html')
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # Request counts, latency histograms per phase and cache hits, for Prometheus to scrape
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
+    # Development server; see serve.py for the production mode
     app.run(debug=True)
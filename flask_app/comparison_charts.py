@@ -0,0 +1,215 @@
+# flask_app/comparison_charts.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from instrumentation import metrics
+from model_registry import FEATURES
+
+# Rendered charts kept in memory, in bytes (0 turns charts off)
+DEFAULT_MAX_BYTES = int(os.environ.get('NBA_CHART_CACHE_BYTES', 8 * 1024 * 1024))
+# Threads rendering charts off the request threads
+DEFAULT_WORKERS = int(os.environ.get('NBA_CHART_WORKERS', 2))
+# Longest the chart endpoint waits for a chart still being rendered
+CHART_WAIT_SECONDS = 5.0
+
+# Bars are clipped to this many standard deviations either side of the mean
+Z_LIMIT = 3.0
+
+SERIES = (('You', '#1d428a'), ('Closest player', '#c8102e'), ('Cluster centroid', '#8a8d8f'))
+
+
+def chart_key(season, version, player, quantized_row, player_season=None):
+    """
+    Returns the cache key of a comparison chart: a hash of the season and its
+    artifact version, the matched player (and season, for filtered matches)
+    and the quantized input stat line.
+    """
+    parts = [season, version, player, player_season] + [repr(float(value)) for value in quantized_row]
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()[:24]
+
+
+def _player_scaled_row(models, player, player_season=None):
+    """
+    Standardized stats of the matched player: the player-season row for a
+    filtered match, otherwise the player's row in the season's dataset.
+    """
+    if player_season is not None and models.player_seasons is not None:
+        return models.player_seasons.scaled_row(player, player_season)
+    names = getattr(models.players, 'names', models.players)
+    rows = np.flatnonzero(np.asarray(names) == player)
+    return np.asarray(models.X_scaled[rows[0]], dtype=float) if len(rows) else None
+
+
+def _unscale(models, scaled):
+    return np.asarray(scaled, dtype=float) * np.asarray(models.scaler.scale_) + np.asarray(models.scaler.mean_)
+
+
+def _format_stat(feature, value):
+    return f"{value:.3f}" if feature in ('Usage Rate', '3P%') else f"{value:.1f}"
+
+
+def render_comparison_svg(models, user_row, cluster, player, player_season=None):
+    """
+    Renders a grouped horizontal bar chart of the eight features, in standard
+    deviations from the season average, for the input stat line, the matched
+    player and the predicted cluster's centroid. Raw values are shown next to
+    each feature. Returns the SVG document as bytes.
+    """
+    user_row = np.asarray(user_row, dtype=float)
+    user_scaled = models.scaler.transform(user_row[None, :])[0]
+    player_scaled = _player_scaled_row(models, player, player_season)
+    centroid = np.asarray(models.kmeans.cluster_centers_[cluster], dtype=float)
+    series = [user_scaled, player_scaled, centroid]
+    raw = [user_row, None if player_scaled is None else _unscale(models, player_scaled), _unscale(models, centroid)]
+    # Plain floats, clipped once, keep the drawing loop out of NumPy
+    clipped = [None if values is None else np.clip(values, -Z_LIMIT, Z_LIMIT).tolist() for values in series]
+    series = [None if values is None else np.asarray(values, dtype=float).tolist() for values in series]
+    raw = [None if values is None else values.tolist() for values in raw]
+
+    label_width, plot_width, value_width = 110, 420, 190
+    row_height, bar_height, top = 44, 10, 64
+    width = label_width + plot_width + value_width
+    height = top + row_height * len(FEATURES) + 30
+    zero_x = label_width + plot_width / 2
+    unit = plot_width / 2 / Z_LIMIT
+
+    title = f"You vs {player}" + (f" ({player_season})" if player_season else "") + f" vs cluster {cluster} centroid"
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="12">',
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+        f'<text x="{width / 2}" y="20" text-anchor="middle" font-size="14" font-weight="bold">{escape(title)}</text>',
+    ]
+    for s, (name, color) in enumerate(SERIES):
+        x = label_width + s * 150
+        parts.append(f'<rect x="{x}" y="32" width="10" height="10" fill="{color}"/>')
+        parts.append(f'<text x="{x + 14}" y="41">{escape(name)}</text>')
+
+    for z in range(-int(Z_LIMIT), int(Z_LIMIT) + 1):
+        x = zero_x + z * unit
+        parts.append(f'<line x1="{x}" y1="{top - 6}" x2="{x}" y2="{height - 26}" '
+                     f'stroke="{"#444" if z == 0 else "#ddd"}" stroke-width="1"/>')
+        parts.append(f'<text x="{x}" y="{height - 12}" text-anchor="middle" fill="#666">{z:+d} sd</text>')
+
+    for j, feature in enumerate(FEATURES):
+        y = top + j * row_height
+        parts.append(f'<text x="{label_width - 8}" y="{y + row_height / 2}" text-anchor="end">{escape(feature)}</text>')
+        for s, (values, (name, color)) in enumerate(zip(series, SERIES)):
+            if values is None:
+                continue
+            z = clipped[s][j]
+            x = zero_x + min(z, 0) * unit
+            parts.append(f'<rect x="{x:.1f}" y="{y + 6 + s * (bar_height + 2)}" width="{abs(z) * unit:.1f}" '
+                         f'height="{bar_height}" fill="{color}"><title>{name}: {values[j]:+.2f} sd</title></rect>')
+        text = " / ".join("-" if values is None else _format_stat(feature, values[j]) for values in raw)
+        parts.append(f'<text x="{label_width + plot_width + 10}" y="{y + row_height / 2}" fill="#333">{text}</text>')
+    parts.append('</svg>')
+    return "\n".join(parts).encode('utf-8')
+
+
+class ComparisonCharts:
+    """
+    Renders comparison charts on a small thread pool and keeps the results in
+    a byte-bounded LRU cache.
+
+    submit() is called by the request that shows the result: it queues the
+    render (unless the chart is cached or already queued) and returns the
+    chart's key right away, so the page renders without waiting. The page's
+    <img> then fetches the chart, which get() returns from the cache or waits
+    for briefly.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, workers=DEFAULT_WORKERS):
+        self.max_bytes = max_bytes
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="chart-render")
+        self._charts = OrderedDict()
+        self._pending = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._renders = 0
+        self._evictions = 0
+        self._failures = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def submit(self, models, user_row, cluster, player, player_season=None):
+        """
+        Queues a chart for a (quantized) stat line and returns its key, or
+        None when charts are turned off.
+        """
+        if not self.enabled:
+            return None
+        key = chart_key(models.season, models.version, player, user_row, player_season)
+        with self._lock:
+            if key in self._charts or key in self._pending:
+                return key
+            self._pending[key] = self._pool.submit(self._render, key, models, user_row, cluster, player, player_season)
+        return key
+
+    def _render(self, key, models, user_row, cluster, player, player_season):
+        try:
+            with metrics.phase('chart_render', models.season):
+                svg = render_comparison_svg(models, user_row, cluster, player, player_season)
+        except Exception:
+            with self._lock:
+                self._failures += 1
+                self._pending.pop(key, None)
+            raise
+        with self._lock:
+            self._renders += 1
+            self._pending.pop(key, None)
+            if len(svg) <= self.max_bytes:
+                self._charts[key] = svg
+                self._bytes += len(svg)
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._charts.popitem(last=False)
+                    self._bytes -= len(evicted)
+                    self._evictions += 1
+        return svg
+
+    def get(self, key, timeout=CHART_WAIT_SECONDS):
+        """
+        Returns a chart's SVG, waiting up to `timeout` seconds if it is still
+        being rendered. Raises KeyError for unknown (or evicted) charts and
+        TimeoutError if rendering takes longer.
+        """
+        with self._lock:
+            svg = self._charts.get(key)
+            if svg is not None:
+                self._charts.move_to_end(key)
+                self._hits += 1
+                return svg
+            future = self._pending.get(key)
+            self._misses += 1
+        if future is None:
+            raise KeyError(key)
+        start = time.perf_counter()
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            raise TimeoutError(f"Chart {key} not rendered after {time.perf_counter() - start:.1f}s")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'charts': len(self._charts),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'pending': len(self._pending),
+                'hits': self._hits,
+                'misses': self._misses,
+                'renders': self._renders,
+                'evictions': self._evictions,
+                'failures': self._failures,
+            }
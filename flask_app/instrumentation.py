@@ -0,0 +1,165 @@
+# flask_app/instrumentation.py
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond phases up to slow cold loads
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    A monotonically increasing count per label combination.
+    """
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class CallbackCounter(Counter):
+    """
+    A counter whose values are read from `callback` at scrape time, for
+    components that already keep their own counts (e.g. the model registry).
+    `callback` returns {label values tuple: count}.
+    """
+
+    def __init__(self, name, help_text, label_names, callback):
+        super().__init__(name, help_text, label_names)
+        self.callback = callback
+
+    def render(self):
+        with self._lock:
+            self._values = dict(self.callback())
+        return super().render()
+
+
+class Histogram:
+    """
+    Latency histogram per label combination with fixed buckets. Observing
+    is one bisect and a few additions under a lock.
+    """
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bucket] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                label_text = _format_labels(self.label_names, labels, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class ServiceMetrics:
+    """
+    Metrics for the prediction service, rendered in the Prometheus text
+    exposition format by render().
+
+        nba_requests_total                 requests per endpoint, season and status
+        nba_request_errors_total           requests that ended in a 4xx/5xx status
+        nba_request_duration_seconds       whole-request latency per endpoint and season
+        nba_phase_duration_seconds         latency of each prediction step per season
+
+    Components that keep their own counts (such as cache hit counters) are
+    exposed through add_collector().
+    """
+
+    def __init__(self):
+        self.requests = Counter('nba_requests_total', "Requests handled.", ('endpoint', 'season', 'status'))
+        self.errors = Counter('nba_request_errors_total', "Requests that ended in an error status.", ('endpoint', 'status'))
+        self.request_duration = Histogram('nba_request_duration_seconds', "Request latency in seconds.", ('endpoint', 'season'))
+        self.phase_duration = Histogram('nba_phase_duration_seconds', "Latency of each prediction phase in seconds.", ('phase', 'season'))
+        self._collectors = []
+
+    def add_collector(self, collector):
+        """
+        Adds a metric (e.g. a CallbackCounter) rendered after the built-in ones.
+        """
+        self._collectors.append(collector)
+
+    @contextmanager
+    def phase(self, name, season):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_duration.observe(time.perf_counter() - start, name, season)
+
+    def observe_request(self, endpoint, season, status, seconds):
+        self.requests.inc(endpoint, season, str(status))
+        self.request_duration.observe(seconds, endpoint, season)
+        if status >= 400:
+            self.errors.inc(endpoint, str(status))
+
+    def render(self):
+        lines = []
+        for metric in [self.requests, self.errors, self.request_duration, self.phase_duration] + self._collectors:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide metrics shared by the app and the prediction helpers
+metrics = ServiceMetrics()
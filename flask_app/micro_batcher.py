@@ -0,0 +1,124 @@
+# flask_app/micro_batcher.py
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import numpy as np
+
+from instrumentation import metrics
+
+# Longest a request waits for others to join its batch, in seconds
+DEFAULT_MAX_WAIT = 0.002
+# Most stat lines scored in one batch
+DEFAULT_MAX_BATCH = 512
+# Longest predict() waits for its batch to be scored, in seconds
+DEFAULT_TIMEOUT = 10.0
+
+
+class MicroBatcher:
+    """
+    Coalesces prediction requests from concurrent handler threads into one
+    vectorized call.
+
+    Handlers submit() their stat lines and block on the returned Future. A
+    single worker thread takes the first waiting request, keeps collecting
+    for up to max_wait seconds (or until max_batch rows are queued), then
+    scores every request that shares a season bundle, similarity options and
+    season/position filters with one predict_fn(models, X, similar, filters) call and hands each request its
+    slice of the results. Under light traffic a request waits at most
+    max_wait; under heavy traffic the per-call overhead of scaling,
+    kmeans.predict and the distance scans is paid once per batch.
+
+    Any error while scoring a batch is set on the Futures of the requests
+    still waiting on it, and the worker goes on with the next batch.
+    """
+
+    def __init__(self, predict_fn, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT, size_histogram=None,
+                 timeout=DEFAULT_TIMEOUT):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.size_histogram = size_histogram
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, models, X, similar=None, filters=None):
+        """
+        Queues an (n, 8) stat matrix for one season's models. Returns a Future
+        that resolves to predict_fn's list of n results.
+        """
+        future = Future()
+        self._queue.put((models, np.asarray(X, dtype=float), similar, future, time.perf_counter(), filters))
+        return future
+
+    def predict(self, models, X, similar=None, filters=None):
+        """
+        Scores a stat matrix through the batcher and returns its results.
+        Raises TimeoutError when they are not ready within `timeout` seconds.
+        """
+        try:
+            return self.submit(models, X, similar, filters).result(timeout=self.timeout)
+        except TimeoutError:
+            raise TimeoutError(f"Prediction not scored after {self.timeout:g}s")
+
+    def _collect(self):
+        items = [self._queue.get()]
+        rows = len(items[0][1])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            rows += len(item[1])
+        return items
+
+    def _run(self):
+        while True:
+            items = []
+            try:
+                items = self._collect()
+                self._process(items)
+            except Exception as e:
+                # The worker must outlive any error, or every later request
+                # would wait forever
+                self._fail(items, e)
+
+    def _process(self, items):
+        started = time.perf_counter()
+
+        # Only requests for the same bundle, similarity options and filters share a call
+        groups = {}
+        for item in items:
+            models, _, similar, _, submitted, filters = item
+            metrics.phase_duration.observe(started - submitted, 'batch_wait', models.season)
+            groups.setdefault((id(models), repr(similar), repr(filters)), []).append(item)
+
+        for group in groups.values():
+            models, similar, filters = group[0][0], group[0][2], group[0][5]
+            try:
+                X = np.concatenate([item[1] for item in group])
+                results = self.predict_fn(models, X, similar, filters)
+                if self.size_histogram is not None:
+                    self.size_histogram.observe(len(X), models.season)
+                start = 0
+                for item in group:
+                    end = start + len(item[1])
+                    item[3].set_result(results[start:end])
+                    start = end
+            except Exception as e:
+                self._fail(group, e)
+
+    @staticmethod
+    def _fail(items, error):
+        # Only the worker resolves Futures, so skipping finished ones is enough
+        for item in items:
+            if not item[3].done():
+                item[3].set_exception(error)
@@ -0,0 +1,415 @@
+# flask_app/model_registry.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from feature_matrix import LazyPlayerNames, artifact_sources, feature_matrix_paths, open_feature_matrix
+from inference import compact_model_path, load_compact_model, player_label_map, read_player_table
+from neighbor_table import NeighborTable, neighbor_table_path
+from player_index import BruteForceIndex, PlayerIndex
+from player_season_store import PlayerSeasonStore, player_season_store_path
+from similarity import SimilarityEngine, METRICS
+
+# Features used by the scaler / KMeans models (same ones always)
+FEATURES = ['PTS', 'Age', 'Usage Rate', 'AST', 'TRB', 'STL', 'BLK', '3P%']
+
+# Artifact paths for each season choice ('R' = Regular Season, 'P' = Playoffs)
+SEASON_ARTIFACTS = {
+    'R': {
+        'scaler': 'models/scaler_regular.pkl',
+        'kmeans': 'models/kmeans_regular.pkl',
+        'data': 'data/clustered/Clustered_Manual_Regular_Season.csv',
+        'features': feature_matrix_paths('Regular_Season'),
+        'neighbors': neighbor_table_path('Regular_Season'),
+        'player_seasons': player_season_store_path('Regular_Season'),
+    },
+    'P': {
+        'scaler': 'models/scaler_playoffs.pkl',
+        'kmeans': 'models/kmeans_playoffs.pkl',
+        'data': 'data/clustered/Clustered_Manual_Playoffs.csv',
+        'features': feature_matrix_paths('Playoffs'),
+        'neighbors': neighbor_table_path('Playoffs'),
+        'player_seasons': player_season_store_path('Playoffs'),
+    },
+}
+
+# Set NBA_SHARED_FEATURES=1 to memory-map the exported float32 feature matrices
+# (see scripts/feature_matrix.py) so multi-process servers share one copy
+SHARED_FEATURES = os.environ.get('NBA_SHARED_FEATURES', '') == '1'
+
+# Below this many players a brute-force scan answers as fast as the KD-tree,
+# and skipping the tree keeps scikit-learn out of the serving process
+KD_TREE_MIN_PLAYERS = 5000
+
+# Seconds between checks of the artifact files for a new version (see
+# ModelRegistry.watch); 0 turns hot reload off
+RELOAD_INTERVAL = float(os.environ.get('NBA_RELOAD_INTERVAL', '5'))
+
+# Everything the request handler needs for one season, loaded once per
+# artifact version; labels maps each player to their manual player type and
+# sources holds the hashes of the scaler and dataset the players come from
+SeasonModels = namedtuple('SeasonModels', ['season', 'scaler', 'kmeans', 'players', 'labels', 'X_scaled', 'index', 'similarity', 'neighbors', 'player_seasons', 'version', 'sources'],
+                          defaults=(None, None))
+
+
+def artifact_signature(paths):
+    """
+    Returns the size and mtime of every file a season's bundle is loaded
+    from (models, datasets, exported matrices and tables), which changes
+    whenever the pipeline rewrites any of them.
+    """
+    files = [paths['scaler'], paths['kmeans'], compact_model_path(paths['kmeans']), paths['data'],
+             paths.get('neighbors'), paths.get('player_seasons')] + list(paths.get('features', ()))
+    signature = []
+    for path in files:
+        if path is None:
+            signature.append(None)
+            continue
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def artifact_version(signature):
+    """
+    Short, stable id of an artifact signature, reported as the bundle version.
+    """
+    return hashlib.sha256(repr(signature).encode()).hexdigest()[:12]
+
+
+def validate_season_models(models):
+    """
+    Checks a freshly loaded bundle before it is served: the scaler and KMeans
+    model take the eight FEATURES, the dataset is non-empty and finite and the
+    scaler standardizes it, the model predicts valid clusters for it, and the
+    neighbor table and player-season store were built from the same dataset
+    and scaler (by their recorded source hashes, and the neighbor table row by
+    row). Raises ValueError otherwise.
+
+    The cluster count may differ from the active bundle's: player types come
+    from the bundle's own labels, and cached results and charts are keyed by
+    artifact version.
+    """
+    names = getattr(models.scaler, 'feature_names_in_', None)
+    if names is not None and list(names) != FEATURES:
+        raise ValueError(f"Scaler was fitted on {list(names)}, expected {FEATURES}.")
+    if len(models.scaler.mean_) != len(FEATURES):
+        raise ValueError(f"Scaler has {len(models.scaler.mean_)} features, expected {len(FEATURES)}.")
+
+    centers = np.asarray(models.kmeans.cluster_centers_)
+    if centers.ndim != 2 or centers.shape[1] != len(FEATURES) or not np.isfinite(centers).all():
+        raise ValueError(f"KMeans centroids have shape {centers.shape}, expected (k, {len(FEATURES)}).")
+
+    if len(models.players) == 0 or models.X_scaled.shape != (len(models.players), len(FEATURES)):
+        raise ValueError(f"Dataset has {len(models.players)} players and a {models.X_scaled.shape} feature matrix.")
+    if not np.isfinite(models.X_scaled).all():
+        raise ValueError("Dataset has missing or non-finite feature values.")
+    # Raw stats must come out as z-scores, the space of the KMeans centroids;
+    # a scaler fitted on already-standardized rows leaves them as they are
+    means = np.asarray(models.X_scaled).mean(axis=0)
+    if (np.abs(means) > 1).any():
+        raise ValueError(f"Scaler does not standardize the dataset (feature means {np.round(means, 2).tolist()}). "
+                         f"Retrain it with scripts/create_models.py.")
+    clusters = models.kmeans.predict(models.X_scaled[:64])
+    if clusters.min() < 0 or clusters.max() >= len(centers):
+        raise ValueError("KMeans predicted clusters outside its cluster range.")
+
+    # A pipeline run rewrites the dataset before the artifacts derived from
+    # it, so a half-finished rebuild shows up as mismatched sources
+    sources = models.sources or {}
+    for name, artifact in (('Neighbor table', models.neighbors), ('Player-season store', models.player_seasons)):
+        if artifact is None:
+            continue
+        stale = [key for key, value in artifact.sources.items() if key in sources and sources[key] != value]
+        if stale:
+            raise ValueError(f"{name} was built from a different {' and '.join(key.split('_')[0] for key in stale)} "
+                             f"than the one being loaded. Rebuild it (scripts/pipeline.py) first.")
+    if models.neighbors is not None:
+        if len(models.neighbors) != len(models.players):
+            raise ValueError(f"Neighbor table has {len(models.neighbors)} players, the dataset has {len(models.players)}.")
+        if not (np.asarray(models.neighbors.players) == np.asarray(models.players[:])).all():
+            raise ValueError("Neighbor table lists different players than the dataset.")
+
+
+def load_estimators(paths):
+    """
+    Returns the season's (scaler, kmeans). Uses the compact NumPy export
+    (see scripts/inference.py) when it is up to date with the pickles, and
+    only falls back to unpickling the scikit-learn objects otherwise.
+    """
+    compact = load_compact_model(compact_model_path(paths['kmeans']), paths['scaler'], paths['kmeans'])
+    if compact is not None:
+        return compact
+    import joblib
+    return joblib.load(paths['scaler']), joblib.load(paths['kmeans'])
+
+
+def load_player_table(path):
+    """
+    Returns (players, features, labels) for a clustered dataset. Reads the CSV
+    with the csv module, or through pandas when a columnar copy exists.
+    """
+    if os.path.exists(os.path.splitext(path)[0] + ".npz"):
+        from artifact_store import read_table
+        data = read_table(path)
+        return data['Player'].to_numpy(dtype=object), data[FEATURES].to_numpy(dtype=float), data['Cluster_Label'].to_numpy(dtype=object)
+    return read_player_table(path, FEATURES)
+
+
+def load_season_models(season, paths):
+    """
+    Loads the scaler, KMeans model and clustered dataset for a season and
+    pre-scales the feature matrix, then builds its nearest-player index and an
+    unweighted similarity engine per metric, plus the precomputed neighbor
+    table and the player-season store when present. Arrays are marked read-only so the bundle
+    can be shared safely between worker threads.
+    """
+    scaler, kmeans = load_estimators(paths)
+    players, X, row_labels = load_player_table(paths['data'])
+
+    X_scaled = np.ascontiguousarray(scaler.transform(X))
+    X_scaled.setflags(write=False)
+    players.setflags(write=False)
+    labels = player_label_map(players, row_labels)
+
+    index = PlayerIndex(X_scaled) if len(X_scaled) >= KD_TREE_MIN_PLAYERS else BruteForceIndex(X_scaled)
+    similarity = {metric: SimilarityEngine(X_scaled, metric) for metric in METRICS}
+
+    return SeasonModels(season, scaler, kmeans, players, labels, X_scaled, index, similarity,
+                        load_neighbor_table(paths), load_player_season_store(paths),
+                        sources=artifact_sources(paths['scaler'], paths['data']))
+
+
+def load_neighbor_table(paths):
+    """
+    Loads the season's precomputed neighbor table, or returns None when it
+    has not been built yet (see scripts/neighbor_table.py).
+    """
+    path = paths.get('neighbors')
+    if path and os.path.exists(path):
+        return NeighborTable(path)
+    return None
+
+
+def load_player_season_store(paths):
+    """
+    Loads the season's per-season, per-position player store, or returns None
+    when it has not been built yet (see scripts/player_season_store.py).
+    """
+    path = paths.get('player_seasons')
+    if path and os.path.exists(path):
+        return PlayerSeasonStore(path)
+    return None
+
+
+def load_shared_season_models(season, paths):
+    """
+    Like load_season_models, but memory-maps the season's exported float32
+    feature matrix read-only and loads player names lazily, so every worker
+    process shares the same pages. Nothing is copied per worker: nearest
+    players are found by brute force over the mapped matrix, and only the
+    unweighted Euclidean engine (which needs no transformed copy) is prebuilt.
+    """
+    matrix_path, names_path, meta_path = paths['features']
+    scaler, kmeans = load_estimators(paths)
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    X_scaled = open_feature_matrix(matrix_path)
+    players = LazyPlayerNames(names_path)
+    if 'player_labels' in meta:
+        labels = meta['player_labels']
+    else:
+        # Exported before the player types were stored alongside
+        data_players, _, row_labels = load_player_table(paths['data'])
+        labels = player_label_map(data_players, row_labels)
+
+    index = BruteForceIndex(X_scaled)
+    similarity = {'euclidean': SimilarityEngine(X_scaled, 'euclidean')}
+
+    # The players come from the exported matrix, so its sources stand in
+    # for the dataset's (None for matrices exported before they were recorded)
+    return SeasonModels(season, scaler, kmeans, players, labels, X_scaled, index, similarity,
+                        load_neighbor_table(paths), load_player_season_store(paths),
+                        sources=meta.get('sources'))
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of per-season model bundles. Each season is loaded at
+    most once (on preload() or first use) and the same bundle is handed to
+    every request afterwards.
+
+    Bundles are versioned by their artifact signature. check_for_updates()
+    (run periodically by watch()) loads a changed season in the calling
+    thread, validates it and swaps it in with one reference assignment:
+    requests that already hold the old bundle finish on it, later ones get
+    the new one. A version that fails to load or validate is not retried
+    until its files change again, and the old version stays active.
+    """
+
+    def __init__(self, artifacts=None, shared_features=SHARED_FEATURES):
+        self.artifacts = artifacts or SEASON_ARTIFACTS
+        self.shared_features = shared_features
+        self._bundles = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._loads = 0
+        self._hits = 0
+        self._reloads = 0
+        self._failed_reloads = 0
+        self._last_error = {}
+        # Signatures seen on the previous check, and versions that failed
+        self._pending = {}
+        self._rejected = {}
+        self._listeners = []
+        self._watcher = None
+
+    def preload(self):
+        for season in self.artifacts:
+            self.get(season)
+
+    def get(self, season):
+        bundle = self._bundles.get(season)
+        if bundle is not None:
+            with self._lock:
+                self._hits += 1
+            return bundle
+
+        with self._lock:
+            # Another thread may have finished loading while we waited
+            bundle = self._bundles.get(season)
+            if bundle is None:
+                bundle, info = self._load(season)
+                self._bundles[season] = bundle
+                self._versions[season] = info
+                self._loads += 1
+            else:
+                self._hits += 1
+        return bundle
+
+    def _load(self, season):
+        paths = self.artifacts[season]
+        # Taken before loading, so files rewritten mid-load show up as a newer version
+        version = artifact_version(artifact_signature(paths))
+        start = time.perf_counter()
+        if self.shared_features and os.path.exists(paths['features'][0]):
+            bundle = load_shared_season_models(season, paths)
+        else:
+            bundle = load_season_models(season, paths)
+        info = {
+            'version': version,
+            'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'load_seconds': round(time.perf_counter() - start, 4),
+        }
+        return bundle._replace(version=version), info
+
+    def version(self, season):
+        info = self._versions.get(season)
+        return info['version'] if info else None
+
+    def add_reload_listener(self, listener):
+        """
+        Registers listener(season, models), called after a new version is swapped in.
+        """
+        self._listeners.append(listener)
+
+    def reload(self, season):
+        """
+        Loads the season's current artifacts, validates them and swaps them
+        in. Returns True on success; on failure the active bundle is kept and
+        the error is recorded.
+        """
+        with self._reload_lock:
+            attempted = artifact_version(artifact_signature(self.artifacts[season]))
+            try:
+                bundle, info = self._load(season)
+                validate_season_models(bundle)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                with self._lock:
+                    self._failed_reloads += 1
+                    self._last_error[season] = error
+                    self._rejected[season] = attempted
+                print(f"Reload of season {season} failed, keeping version {self.version(season)}: {error}")
+                return False
+
+            with self._lock:
+                self._bundles[season] = bundle
+                self._versions[season] = info
+                self._reloads += 1
+                self._last_error.pop(season, None)
+            print(f"Season {season} now serving version {info['version']} (loaded in {info['load_seconds']}s)")
+        for listener in self._listeners:
+            listener(season, bundle)
+        return True
+
+    def check_for_updates(self):
+        """
+        Reloads every loaded season whose artifact files changed. A change is
+        acted on once the files look the same on two consecutive checks, so
+        a pipeline still writing them is not picked up half-way. Returns the
+        seasons that were swapped.
+        """
+        reloaded = []
+        for season in list(self._bundles):
+            signature = artifact_signature(self.artifacts[season])
+            version = artifact_version(signature)
+            if version == self.version(season) or version == self._rejected.get(season):
+                self._pending.pop(season, None)
+                continue
+            if self._pending.get(season) != version:
+                self._pending[season] = version
+                continue
+            del self._pending[season]
+            if self.reload(season):
+                reloaded.append(season)
+        return reloaded
+
+    def watch(self, interval=RELOAD_INTERVAL):
+        """
+        Starts a daemon thread that calls check_for_updates() every
+        `interval` seconds. Does nothing if interval is 0 or already watching.
+        """
+        if interval <= 0 or self._watcher is not None:
+            return None
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.check_for_updates()
+                except Exception as e:
+                    print(f"Artifact check failed: {type(e).__name__}: {e}")
+
+        self._watcher = threading.Thread(target=run, name="artifact-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def versions(self):
+        with self._lock:
+            return {
+                season: dict(info, last_error=self._last_error.get(season))
+                for season, info in sorted(self._versions.items())
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loads': self._loads,
+                'hits': self._hits,
+                'reloads': self._reloads,
+                'failed_reloads': self._failed_reloads,
+                'seasons': sorted(self._bundles),
+                'shared_features': self.shared_features,
+                'watching': self._watcher is not None,
+            }
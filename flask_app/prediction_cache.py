@@ -0,0 +1,120 @@
+# flask_app/prediction_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Set NBA_PREDICTION_CACHE_SIZE=0 to turn the cache off
+DEFAULT_MAX_SIZE = int(os.environ.get('NBA_PREDICTION_CACHE_SIZE', 4096))
+# Seconds before an entry expires (0 = never)
+DEFAULT_TTL = float(os.environ.get('NBA_PREDICTION_CACHE_TTL', 3600))
+# Seconds between checks of the artifact files on disk
+ARTIFACT_CHECK_INTERVAL = 2.0
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of prediction results with an optional TTL.
+
+    Keys start with the season, so when a season's artifacts change on disk
+    (see sync()) only that season's entries are dropped. Hits, misses,
+    evictions, expirations and invalidations are counted for stats().
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL, check_interval=ARTIFACT_CHECK_INTERVAL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._signatures = {}
+        self._next_check = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get(self, key):
+        """
+        Returns the cached value for key, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is not None and time.monotonic() >= expires_at:
+                    del self._entries[key]
+                    self._expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+            self._misses += 1
+            return None
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, season=None):
+        """
+        Drops every entry, or only those of one season.
+        """
+        with self._lock:
+            if season is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = [key for key in self._entries if key[0] == season]
+                for key in keys:
+                    del self._entries[key]
+                dropped = len(keys)
+            self._invalidations += dropped
+
+    def sync(self, season, signature_fn):
+        """
+        Invalidates a season's entries when signature_fn() (e.g. the sizes and
+        mtimes of its artifact files) differs from the last one seen. The
+        files are checked at most once every check_interval seconds.
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now < self._next_check.get(season, 0):
+            return
+        self._next_check[season] = now + self.check_interval
+        signature = signature_fn()
+        previous = self._signatures.get(season)
+        self._signatures[season] = signature
+        if previous is not None and previous != signature:
+            self.invalidate(season)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+            }
@@ -0,0 +1,174 @@
+# flask_app/predictor.py
+import numpy as np
+
+from instrumentation import metrics
+from model_registry import FEATURES
+from similarity import SimilarityEngine
+
+
+# Decimal places that carry meaning for each input stat; inputs are rounded
+# to these before prediction so near-identical stat lines share cache entries
+FEATURE_PRECISION = {'PTS': 1, 'Age': 1, 'Usage Rate': 3, 'AST': 1, 'TRB': 1, 'STL': 1, 'BLK': 1, '3P%': 3}
+
+
+def parse_stat_rows(rows):
+    """
+    Converts a list of stat lines into an (n, 8) float matrix in FEATURES order.
+    Each row may be a dict keyed by feature name or a list of 8 values.
+    Raises ValueError with the offending row index (and field, for NaN,
+    infinite or negative values) on bad input.
+    """
+    X = np.empty((len(rows), len(FEATURES)), dtype=float)
+    for i, row in enumerate(rows):
+        try:
+            if isinstance(row, dict):
+                X[i] = [float(row[feature]) for feature in FEATURES]
+            else:
+                if len(row) != len(FEATURES):
+                    raise ValueError(f"expected {len(FEATURES)} values")
+                X[i] = [float(value) for value in row]
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Row {i} is invalid: {e}")
+        bad = np.flatnonzero(~np.isfinite(X[i]))
+        if len(bad):
+            raise ValueError(f"Row {i} is invalid: {FEATURES[bad[0]]} must be a finite number, got {X[i, bad[0]]}")
+        negative = np.flatnonzero(X[i] < 0)
+        if len(negative):
+            raise ValueError(f"Row {i} is invalid: {FEATURES[negative[0]]} must not be negative, got {X[i, negative[0]]}")
+    return X
+
+
+def quantize_stat_rows(X):
+    """
+    Rounds every column of an (n, 8) stat matrix to its FEATURE_PRECISION.
+    """
+    X = np.array(X, dtype=float)
+    for j, feature in enumerate(FEATURES):
+        X[:, j] = np.round(X[:, j], FEATURE_PRECISION[feature])
+    return X
+
+
+def predict_batch(models, X):
+    """
+    Scores a batch of stat lines against one season's models.
+
+    Scaling and cluster prediction run once over the whole batch; the
+    nearest-player search goes through the season's KD-tree index. Each step
+    is timed into the service's phase histograms.
+
+    Returns (clusters, player_types, closest_players) as arrays of length n;
+    each player type is the manual label of the closest player.
+    """
+    with metrics.phase('scale', models.season):
+        X_scaled = models.scaler.transform(X)
+    with metrics.phase('kmeans_predict', models.season):
+        clusters = models.kmeans.predict(X_scaled)
+
+    with metrics.phase('nearest', models.season):
+        closest_idx = models.index.nearest(X_scaled)
+    closest_players = models.players[closest_idx]
+
+    player_types = np.array([models.labels.get(str(player), "Unknown") for player in closest_players], dtype=object)
+    return clusters, player_types, closest_players
+
+
+def similar_players(models, X_scaled, k=5, metric='euclidean', weights=None):
+    """
+    Returns the top-k comparable players for every scaled stat line as a list
+    of [{'player': ..., 'distance': ...}, ...] lists. Unweighted queries use the
+    season's preloaded engine; weighted ones build a throwaway engine.
+    """
+    if weights is None:
+        engine = models.similarity.get(metric)
+        if engine is None:
+            engine = SimilarityEngine(models.X_scaled, metric)
+    else:
+        engine = SimilarityEngine(models.X_scaled, metric, weights)
+
+    indices, distances = engine.top_k(X_scaled, k)
+    return [
+        [{'player': models.players[i], 'distance': round(float(d), 4)} for i, d in zip(row_idx, row_dist)]
+        for row_idx, row_dist in zip(indices, distances)
+    ]
+
+
+def predict_filtered(models, X, filters, similar=None):
+    """
+    Like predict_batch, but the closest and comparable players are searched
+    only in the player-season store partitions matching `filters`, given as
+    (seasons, positions). Returns (clusters, player_types, matches), where
+    matches holds each stat line's nearest player-seasons, nearest first.
+    """
+    seasons, positions = filters
+    k, metric, weights = similar if similar is not None else (1, 'euclidean', None)
+    with metrics.phase('scale', models.season):
+        X_scaled = models.scaler.transform(X)
+    with metrics.phase('kmeans_predict', models.season):
+        clusters = models.kmeans.predict(X_scaled)
+
+    with metrics.phase('nearest', models.season):
+        matches = models.player_seasons.top_k(X_scaled, k, seasons, positions, metric, weights)
+
+    player_types = np.array([models.labels.get(str(row[0]['player']), "Unknown") for row in matches], dtype=object)
+    return clusters, player_types, matches
+
+
+def predict_rows(models, X, similar=None, cache=None, filters=None):
+    """
+    Predicts every stat line of a batch for one season and returns a list of
+    {'cluster', 'player_type', 'closest_player'} dicts, plus 'similar' when
+    `similar` is given as (k, metric, weights).
+
+    With `filters` as (seasons, positions), players are compared only against
+    the matching season and position partitions of the player-season store,
+    and the results also carry the closest player's 'closest_season' and
+    'closest_position'.
+
+    Inputs are quantized first. With a cache, each row is looked up by
+    (season, artifact version, quantized stats, similarity options, filters)
+    and only the misses are scored, in one vectorized pass with repeated rows scored once.
+    """
+    X = quantize_stat_rows(X)
+    similar_key = None
+    if similar is not None:
+        k, metric, weights = similar
+        similar_key = (k, metric, None if weights is None else tuple(np.asarray(weights).tolist()))
+    filters_key = None if filters is None else tuple(tuple(values or ()) for values in filters)
+    keys = [(models.season, models.version, tuple(row), similar_key, filters_key) for row in X.tolist()]
+
+    with metrics.phase('cache_lookup', models.season):
+        results = [cache.get(key) for key in keys] if cache is not None else [None] * len(keys)
+    # Rows repeated within the batch are scored once
+    pending = {}
+    for i, result in enumerate(results):
+        if result is None:
+            pending.setdefault(keys[i], []).append(i)
+    if not pending:
+        return results
+    missing = [rows[0] for rows in pending.values()]
+
+    if filters is not None:
+        clusters, player_types, comparisons = predict_filtered(models, X[missing], filters, similar)
+        closest_players = [matches[0]['player'] for matches in comparisons]
+    else:
+        clusters, player_types, closest_players = predict_batch(models, X[missing])
+        if similar is not None:
+            with metrics.phase('similar', models.season):
+                comparisons = similar_players(models, models.scaler.transform(X[missing]), *similar)
+
+    for j, rows in enumerate(pending.values()):
+        result = {
+            'cluster': int(clusters[j]),
+            'player_type': player_types[j],
+            'closest_player': closest_players[j],
+        }
+        if filters is not None:
+            result['closest_season'] = comparisons[j][0]['season']
+            result['closest_position'] = comparisons[j][0]['position']
+        if similar is not None:
+            result['similar'] = comparisons[j]
+        for i in rows:
+            results[i] = result
+        if cache is not None:
+            cache.put(keys[rows[0]], result)
+    return results
@@ -0,0 +1,62 @@
+# flask_app/serve.py
+import argparse
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    # One thread per connection, so concurrent requests can share micro-batches
+    daemon_threads = True
+    # The default listen backlog of 5 resets connections under bursts
+    request_queue_size = 256
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host='127.0.0.1', port=8000, threads=16, max_wait_ms=2.0, max_batch=512, batching=True, access_log=False):
+    """
+    Serves the app for production traffic: models are preloaded, debug mode is
+    off, requests are handled concurrently and, unless batching is False,
+    concurrent predictions are coalesced by the micro-batcher.
+
+    Uses waitress when it is installed and falls back to a threaded server
+    from the standard library otherwise.
+    """
+    import app as app_module
+
+    if batching:
+        app_module.enable_micro_batching(max_wait_ms, max_batch)
+
+    try:
+        import waitress
+    except ImportError:
+        waitress = None
+
+    if waitress is not None:
+        print(f"Serving on http://{host}:{port} with waitress ({threads} threads)")
+        waitress.serve(app_module.app, host=host, port=port, threads=threads)
+        return
+
+    handler = WSGIRequestHandler if access_log else QuietRequestHandler
+    with make_server(host, port, app_module.app, server_class=ThreadingWSGIServer, handler_class=handler) as server:
+        print(f"Serving on http://{host}:{port} (threaded stdlib server; install waitress for a hardened one)")
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the NBA player comparison app in production mode.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--threads', type=int, default=16, help="worker threads (waitress only)")
+    parser.add_argument('--batch-window-ms', type=float, default=2.0,
+                        help="longest a prediction waits for others to join its batch")
+    parser.add_argument('--max-batch', type=int, default=512, help="most stat lines scored in one batch")
+    parser.add_argument('--no-batching', action='store_true', help="score every request on its own")
+    parser.add_argument('--access-log', action='store_true', help="log every request (stdlib server only)")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.threads, args.batch_window_ms, args.max_batch,
+          batching=not args.no_batching, access_log=args.access_log)
@@ -0,0 +1,183 @@
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+# Columns where a zero is replaced by 1 before any metric divides by them
+ZERO_GUARDED_COLUMNS = ['PTS', 'MP', 'TOV', 'FGA']
+
+# Registered metrics, computed in this order: (name, terms, denominator)
+ADVANCED_METRICS = []
+
+
+def register_metric(name, terms, denominator=None):
+    """
+    Registers a derived metric of the form
+
+        (coef_1 * col_1 + coef_2 * col_2 + ...) / denominator
+
+    where `terms` is a list of (coefficient, column) pairs summed left to
+    right and `denominator` is an optional column. Coefficients of 1 and -1
+    become plain additions and subtractions, so results match the equivalent
+    pandas expression bit for bit.
+    """
+    if any(metric[0] == name for metric in ADVANCED_METRICS):
+        raise ValueError(f"Metric '{name}' is already registered.")
+    ADVANCED_METRICS.append((name, list(terms), denominator))
+
+
+# Scoring dependencies
+register_metric('3P Dependency', [(3, '3P')], 'PTS')
+register_metric('2P Dependency', [(2, '2P')], 'PTS')
+register_metric('FT Dependency', [(1, 'FT')], 'PTS')
+
+# Per-minute metrics
+register_metric('PTS/MP', [(1, 'PTS')], 'MP')
+register_metric('AST/MP', [(1, 'AST')], 'MP')
+register_metric('TRB/MP', [(1, 'TRB')], 'MP')
+register_metric('STL/MP', [(1, 'STL')], 'MP')
+register_metric('BLK/MP', [(1, 'BLK')], 'MP')
+
+# Assist-to-Turnover Ratio
+register_metric('AST/TOV', [(1, 'AST')], 'TOV')
+
+# Rebound Ratio (simplified)
+register_metric('Rebound Ratio', [(1, 'ORB'), (1, 'DRB')], 'G')
+
+# Scoring Efficiency
+register_metric('PTS/FGA', [(1, 'PTS')], 'FGA')
+
+# Free Throw Rate
+register_metric('FT Rate', [(1, 'FTA')], 'FGA')
+
+# Usage Rate (Simplified)
+register_metric('Usage Rate', [(1, 'FGA'), (0.44, 'FTA'), (1, 'TOV')], 'MP')
+
+# Player Impact Estimate (PIE)
+register_metric('PIE', [
+    (1, 'PTS'), (1, 'FG'), (1, 'FT'), (-1, 'FGA'), (-1, 'FTA'),
+    (1, 'ORB'), (1, 'DRB'), (1, 'AST'), (1, 'STL'), (1, 'BLK'), (-1, 'TOV'),
+])
+
+
+def base_columns(metrics=None):
+    """
+    Returns every input column the metrics need, zero-guarded columns first.
+    """
+    columns = list(ZERO_GUARDED_COLUMNS)
+    for _, terms, denominator in metrics or ADVANCED_METRICS:
+        for column in [column for _, column in terms] + ([denominator] if denominator else []):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+
+def compute_metrics_block(block, columns, metrics=None, decimals=3):
+    """
+    Computes every metric from a 2-D block of base columns into one
+    preallocated (rows x metrics) array, reusing a single scratch column for
+    scaled terms, then rounds the whole block in place once.
+    """
+    metrics = metrics or ADVANCED_METRICS
+    position = {column: j for j, column in enumerate(columns)}
+    out = np.empty((block.shape[0], len(metrics)), order='F')
+    scratch = np.empty(block.shape[0])
+
+    for m, (_, terms, denominator) in enumerate(metrics):
+        result = out[:, m]
+        for t, (coef, column) in enumerate(terms):
+            values = block[:, position[column]]
+            if coef == 1:
+                term = values
+            elif coef == -1 and t > 0:
+                np.subtract(result, values, out=result)
+                continue
+            else:
+                term = np.multiply(values, coef, out=scratch)
+            if t == 0:
+                result[:] = term
+            else:
+                np.add(result, term, out=result)
+        if denominator:
+            np.divide(result, block[:, position[denominator]], out=result)
+
+    np.round(out, decimals, out=out)
+    return out
+
+
+def add_advanced_metrics_fused(data, metrics=None):
+    """
+    Fused version of the column-by-column advanced metrics: copies the base
+    columns into one float block once, guards the zero-sensitive columns in a
+    single pass, computes all metrics into a preallocated block and assigns
+    them back together. Output is identical to the column-by-column version,
+    including writing the zero-guarded values back to PTS, MP, TOV and FGA.
+    """
+    metrics = metrics or ADVANCED_METRICS
+    columns = base_columns(metrics)
+    # Column-major, so every base column and metric is a contiguous vector;
+    # filled one column at a time to skip pandas' row-major consolidation
+    block = np.empty((len(data), len(columns)), order='F')
+    for j, column in enumerate(columns):
+        block[:, j] = data[column].to_numpy()
+
+    # Avoid division by zero
+    guarded = block[:, :len(ZERO_GUARDED_COLUMNS)]
+    guarded[guarded == 0] = 1
+    for j, column in enumerate(ZERO_GUARDED_COLUMNS):
+        data[column] = guarded[:, j].astype(data[column].dtype, copy=False)
+
+    out = compute_metrics_block(block, columns, metrics)
+    names = [name for name, _, _ in metrics]
+    data[names] = out
+    return data
+
+
+def benchmark(cleaned_file, repeat=100, rounds=20):
+    """
+    Times the column-by-column add_advanced_metrics from clean_data against
+    the fused version on the cleaned data tiled `repeat` times, after checking
+    both give identical output.
+    """
+    from clean_data import add_advanced_metrics_columnwise
+
+    names = [name for name, _, _ in ADVANCED_METRICS]
+    base = pd.read_csv(cleaned_file, delimiter=';')
+    base = pd.concat([base.drop(columns=names, errors='ignore')] * repeat, ignore_index=True)
+
+    # The column-by-column version prints on every call
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = add_advanced_metrics_columnwise(base.copy())
+    actual = add_advanced_metrics_fused(base.copy())
+    if not expected.equals(actual):
+        raise AssertionError("Fused metrics differ from the column-by-column metrics.")
+
+    timings = {}
+    for label, function in [('column-by-column', add_advanced_metrics_columnwise), ('fused', add_advanced_metrics_fused)]:
+        best = float('inf')
+        for _ in range(rounds):
+            data = base.copy()
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                function(data)
+                best = min(best, time.perf_counter() - start)
+        timings[label] = best
+
+    print(f"Advanced metrics over {len(base)} rows (best of {rounds}):")
+    for label, seconds in timings.items():
+        print(f"  {label:>16}: {seconds * 1000:.2f} ms")
+    print(f"  speedup: {timings['column-by-column'] / timings['fused']:.1f}x")
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the fused advanced metrics against the column-by-column version.")
+    parser.add_argument('--input', default="data/processed/cleaned/Cleaned_NBA_Player_Stats_Regular_Season.csv")
+    parser.add_argument('--repeat', type=int, default=100, help="times to tile the cleaned data")
+    parser.add_argument('--rounds', type=int, default=20, help="timed runs per version")
+    args = parser.parse_args()
+
+    benchmark(args.input, args.repeat, args.rounds)
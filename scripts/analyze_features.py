@@ -1,30 +1,110 @@
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
-from sklearn.ensemble import RandomForestRegressor
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import json
 import os
 
+from artifact_store import read_table
+
+# Computed correlations, PCA variance ratios and importances, keyed on the input file
+cache_dir = "data/cache/analysis"
+
+# Bump when the analysis itself changes, so older cached results are ignored
+ANALYSIS_VERSION = 1
+
 def ensure_directory_exists(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def plot_correlation_matrix(data, dataset_name):
+def input_hash(file_path):
+    """
+    Returns the SHA-256 of the input file, which keys its cached analysis.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_path(file_path, dataset_name, directory=cache_dir):
+    return os.path.join(directory, f"{dataset_name}_{input_hash(file_path)[:16]}_v{ANALYSIS_VERSION}.json")
+
+def compute_analysis(file_path, dataset_name, n_jobs=-1):
+    """
+    Computes the numbers behind the plots: the feature correlation matrix, the
+    PCA explained-variance ratios and the random forest feature importances.
+    The forest is trained on `n_jobs` cores (all by default).
+    """
+    from sklearn.decomposition import PCA
+    from sklearn.ensemble import RandomForestRegressor
+
+    data = read_table(file_path, delimiter=';')
+
+    correlation = data.corr()
+
+    pca = PCA()
+    pca.fit(data)
+
+    X = data.drop(columns=['PIE'], errors='ignore')  # Target variable is PIE
+    y = data['PIE'] if 'PIE' in data.columns else data.mean(axis=1)  # Default to mean if missing
+
+    model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs)
+    model.fit(X, y)
+
+    importance = pd.Series(model.feature_importances_, index=X.columns).sort_values(ascending=False)
+
+    return {
+        'dataset': dataset_name,
+        'input': file_path,
+        'correlation': {'columns': list(correlation.columns), 'values': correlation.to_numpy().tolist()},
+        'explained_variance_ratio': pca.explained_variance_ratio_.tolist(),
+        'feature_importance': {'features': list(importance.index), 'values': importance.to_numpy().tolist()},
+    }
+
+def load_or_compute_analysis(file_path, dataset_name, n_jobs=-1, force=False):
+    """
+    Returns the season's analysis from the on-disk cache when the input file
+    is unchanged, computing and caching it otherwise. The second value tells
+    whether the cache was used.
+    """
+    path = cache_path(file_path, dataset_name)
+    if not force and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f), True
+
+    analysis = compute_analysis(file_path, dataset_name, n_jobs)
+    ensure_directory_exists(os.path.dirname(path))
+    with open(path, 'w') as f:
+        json.dump(analysis, f)
+    return analysis, False
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')  # Render to files, also in worker processes
+    import matplotlib.pyplot as plt
+    return plt
+
+def plot_correlation_matrix(analysis, dataset_name):
+    import seaborn as sns
+    plt = _pyplot()
+
+    correlation = pd.DataFrame(analysis['correlation']['values'], index=analysis['correlation']['columns'],
+                               columns=analysis['correlation']['columns'])
     plt.figure(figsize=(12, 8))
-    sns.heatmap(data.corr(), annot=False, cmap="coolwarm", center=0)
+    sns.heatmap(correlation, annot=False, cmap="coolwarm", center=0)
     plt.title(f"Feature Correlation Matrix - {dataset_name}")
     ensure_directory_exists("images")
     plt.savefig(f"images/correlation_matrix_{dataset_name}.png")
     plt.close()
 
-def plot_pca_variance(data, dataset_name):
-    pca = PCA()
-    pca.fit(data)
+def plot_pca_variance(analysis, dataset_name):
+    plt = _pyplot()
 
     # Scree plot (individual explained variance)
     plt.figure(figsize=(10, 6))
-    plt.plot(pca.explained_variance_ratio_, marker='o')
+    plt.plot(analysis['explained_variance_ratio'], marker='o')
     plt.xlabel("Principal Component Index")
     plt.ylabel("Explained Variance Ratio")
     plt.title("PCA Scree Plot (Explained Variance per Component)")
@@ -32,16 +112,12 @@ def plot_pca_variance(data, dataset_name):
     plt.savefig(f"images/pca_scree_plot_{dataset_name}.png")
     plt.close()
 
+def plot_feature_importance(analysis, dataset_name):
+    import seaborn as sns
+    plt = _pyplot()
+
+    importance = pd.Series(analysis['feature_importance']['values'], index=analysis['feature_importance']['features'])
 
-def feature_importance(data, dataset_name):
-    X = data.drop(columns=['PIE'], errors='ignore')  # Target variable is PIE
-    y = data['PIE'] if 'PIE' in data.columns else data.mean(axis=1)  # Default to mean if missing
-    
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X, y)
-    
-    importance = pd.Series(model.feature_importances_, index=X.columns).sort_values(ascending=False)
-    
     plt.figure(figsize=(12, 6))
     sns.barplot(x=importance.values, y=importance.index, palette="viridis")
     plt.title("Feature Importance (Random Forest)")
@@ -50,14 +126,66 @@ def feature_importance(data, dataset_name):
     plt.savefig(f"images/feature_importance_{dataset_name}.png")
     plt.close()
 
+PLOTS = {
+    'correlation_matrix': (plot_correlation_matrix, "images/correlation_matrix_{}.png"),
+    'pca_scree_plot': (plot_pca_variance, "images/pca_scree_plot_{}.png"),
+    'feature_importance': (plot_feature_importance, "images/feature_importance_{}.png"),
+}
+
+def render_plot(kind, analysis, dataset_name):
+    PLOTS[kind][0](analysis, dataset_name)
+    return PLOTS[kind][1].format(dataset_name)
+
 def analyze_features(file_path, dataset_name):
+    """
+    Analyzes one season in this process, as before: computes (or loads the
+    cached) numbers and renders all three plots.
+    """
     print(f"Analyzing Features for: {dataset_name}")
-    data = pd.read_csv(file_path, delimiter=';')
-    
-    plot_correlation_matrix(data, dataset_name)
-    plot_pca_variance(data, dataset_name)
-    feature_importance(data, dataset_name)
+    analysis, _ = load_or_compute_analysis(file_path, dataset_name)
+    for kind in PLOTS:
+        render_plot(kind, analysis, dataset_name)
+
+def analyze_all(jobs, workers=None, force=False, plots=True):
+    """
+    Analyzes several seasons (a list of (file_path, dataset_name) pairs) in a
+    process pool. Seasons missing from the cache are computed in parallel,
+    their forests splitting the cores between them; then every plot of every
+    season is rendered as its own task. Seasons whose input is unchanged and
+    whose plots already exist are not recomputed or re-rendered.
+    """
+    workers = workers or min(os.cpu_count() or 1, max(len(jobs), len(jobs) * len(PLOTS)))
+    forest_jobs = max(1, (os.cpu_count() or 1) // max(1, len(jobs)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {dataset_name: pool.submit(load_or_compute_analysis, file_path, dataset_name, forest_jobs, force)
+                   for file_path, dataset_name in jobs}
+        analyses, cached = {}, {}
+        for dataset_name, future in futures.items():
+            analyses[dataset_name], cached[dataset_name] = future.result()
+            print(f"{dataset_name}: {'using cached analysis' if cached[dataset_name] else 'computed analysis'}")
+
+        if not plots:
+            return analyses
+
+        plot_futures = []
+        for dataset_name, analysis in analyses.items():
+            for kind, (_, image_pattern) in PLOTS.items():
+                if cached[dataset_name] and os.path.exists(image_pattern.format(dataset_name)):
+                    continue
+                plot_futures.append(pool.submit(render_plot, kind, analysis, dataset_name))
+        for future in plot_futures:
+            print(f"Saved {future.result()}")
+    return analyses
 
 if __name__ == "__main__":
-    analyze_features("data/processed/ml_ready/ML_Ready_NBA_Player_Stats_Regular_Season.csv", "Regular_Season")
-    analyze_features("data/processed/ml_ready/ML_Ready_NBA_Player_Stats_Playoffs.csv", "Playoffs")
+    parser = argparse.ArgumentParser(description="Analyze feature correlations, PCA variance and importances.")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--force', action='store_true', help="ignore cached results and existing plots")
+    parser.add_argument('--no-plots', action='store_true', help="only compute (or load) the cached numbers")
+    args = parser.parse_args()
+
+    analyze_all([
+        ("data/processed/ml_ready/ML_Ready_NBA_Player_Stats_Regular_Season.csv", "Regular_Season"),
+        ("data/processed/ml_ready/ML_Ready_NBA_Player_Stats_Playoffs.csv", "Playoffs"),
+    ], workers=args.workers, force=args.force, plots=not args.no_plots)
@@ -0,0 +1,122 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Set NBA_COLUMNAR_ARTIFACTS=1 (or pass --columnar to pipeline.py) to write a
+# columnar copy next to every pipeline CSV. Readers pick it up whenever present.
+COLUMNAR_ENABLED = os.environ.get('NBA_COLUMNAR_ARTIFACTS', '') == '1'
+
+FORMAT_VERSION = 2
+
+
+def columnar_paths(csv_path):
+    """
+    Returns the (.npz data, .schema.json sidecar) paths for a CSV artifact.
+    """
+    stem = os.path.splitext(csv_path)[0]
+    return stem + ".npz", stem + ".schema.json"
+
+
+def _source_signature(csv_path):
+    if not os.path.exists(csv_path):
+        return None
+    stat = os.stat(csv_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_columnar(data, csv_path):
+    """
+    Writes a DataFrame as NumPy arrays plus a JSON schema.
+
+    Numeric and boolean columns are stored with their own dtype, so reading
+    them back gives exactly the values a CSV round trip would, and downstream
+    stages produce the same outputs in either mode. Text columns are stored
+    as categoricals (int32 codes plus a category array) and read back with
+    their original dtype. The schema records the size and mtime of the CSV
+    written alongside, so a CSV regenerated without the columnar copy is never
+    shadowed by a stale one.
+    """
+    npz_path, schema_path = columnar_paths(csv_path)
+    arrays = {}
+    columns = []
+    for i, name in enumerate(data.columns):
+        series = data[name]
+        key = f"c{i}"
+        column = {'name': name, 'key': key}
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biuf':
+            column['kind'] = {'b': 'bool', 'f': 'float'}.get(series.dtype.kind, 'int')
+            arrays[key] = series.to_numpy()
+        else:
+            column['kind'] = 'category'
+            column['dtype'] = str(series.dtype)
+            categorical = pd.Categorical(series)
+            arrays[key] = categorical.codes.astype(np.int32)
+            arrays[key + "_categories"] = np.asarray(categorical.categories.astype(str), dtype=str)
+        columns.append(column)
+
+    np.savez(npz_path, **arrays)
+    schema = {
+        'format_version': FORMAT_VERSION,
+        'rows': len(data),
+        'columns': columns,
+        'source': _source_signature(csv_path),
+    }
+    with open(schema_path, 'w') as f:
+        json.dump(schema, f, indent=2)
+
+
+def read_columnar(csv_path):
+    """
+    Loads the columnar copy of a CSV artifact, or returns None when it is
+    missing, from another format version, or older than the CSV.
+    """
+    npz_path, schema_path = columnar_paths(csv_path)
+    if not (os.path.exists(npz_path) and os.path.exists(schema_path)):
+        return None
+    with open(schema_path) as f:
+        schema = json.load(f)
+    if schema.get('format_version') != FORMAT_VERSION:
+        return None
+    source = _source_signature(csv_path)
+    if source is not None and source != schema.get('source'):
+        return None
+
+    with np.load(npz_path, allow_pickle=False) as arrays:
+        data = {}
+        for column in schema['columns']:
+            if column['kind'] == 'category':
+                values = pd.Categorical.from_codes(arrays[column['key']], categories=arrays[column['key'] + "_categories"])
+                values = pd.Series(values).astype(column['dtype']).to_numpy()
+            else:
+                values = arrays[column['key']]
+            data[column['name']] = values
+    return pd.DataFrame(data, columns=[column['name'] for column in schema['columns']])
+
+
+def read_table(csv_path, delimiter=','):
+    """
+    Reads a pipeline artifact, preferring its columnar copy when present and
+    up to date, and falling back to the CSV otherwise. CSV floats are parsed
+    with round-trip precision, so both give back exactly the values written.
+    """
+    data = read_columnar(csv_path)
+    if data is None:
+        data = pd.read_csv(csv_path, delimiter=delimiter, float_precision='round_trip')
+    return data
+
+
+def write_table(data, csv_path, delimiter=','):
+    """
+    Writes a pipeline artifact as CSV and, when columnar artifacts are
+    enabled, as a columnar copy too. Without the columnar copy any stale one
+    left from an earlier run is removed.
+    """
+    data.to_csv(csv_path, index=False, sep=delimiter)
+    if COLUMNAR_ENABLED:
+        write_columnar(data, csv_path)
+    else:
+        for path in columnar_paths(csv_path):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,299 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import clean_data
+import create_key_stats
+import create_models
+import manual_clusters
+import prepare_ml
+
+FEATURES = ['PTS', 'Age', 'Usage Rate', 'AST', 'TRB', 'STL', 'BLK', '3P%']
+
+# Paths (absolute, since every scaled run works inside its own temporary directory)
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+flask_dir = os.path.join(repo_dir, "flask_app")
+RAW_FILES = {
+    'Regular': os.path.join(repo_dir, "data/raw/Combined NBA Player Stats - Regular.csv"),
+    'Playoffs': os.path.join(repo_dir, "data/raw/Combined NBA Player Stats - Playoffs.csv"),
+}
+
+# Rows per /api/predict request for the batched latency measurements
+BATCH_SIZES = (100, 1000)
+
+SCHEMA_VERSION = 1
+
+
+def scale_raw_data(raw_file, scale):
+    """
+    Tiles a combined raw file `scale` times. Copies get a ' #n' suffix on the
+    player name so duplicate-player averaging keeps them apart, which scales
+    the number of distinct players and not just the number of rows.
+    """
+    data = pd.read_csv(raw_file, delimiter=';', encoding='utf-8')
+    copies = [data]
+    for n in range(2, scale + 1):
+        copy = data.copy()
+        copy['Player'] = copy['Player'] + f" #{n}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def time_call(function, *args, repeat=1):
+    """
+    Runs function(*args) `repeat` times with its progress output silenced and
+    returns the best and mean wall time in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function(*args)
+            timings.append(time.perf_counter() - start)
+    return {'best_seconds': round(min(timings), 6), 'mean_seconds': round(sum(timings) / len(timings), 6), 'runs': repeat}
+
+
+def run_analyze_features(ml_ready_file, dataset):
+    # Times the full computation and plots, bypassing the analysis cache.
+    # Plotting needs matplotlib and seaborn, which the app does not
+    import analyze_features
+    analysis = analyze_features.compute_analysis(ml_ready_file, dataset)
+    for kind in analyze_features.PLOTS:
+        analyze_features.render_plot(kind, analysis, dataset)
+
+
+def benchmark_stages(workdir, raw_file, dataset, is_regular_season, repeat):
+    """
+    Times every pipeline stage in order on one raw file, each stage reading
+    the previous stage's output. Returns the per-stage timings and the paths
+    of the artifacts the app needs.
+    """
+    cleaned_file = os.path.join(workdir, f"Cleaned_NBA_Player_Stats_{dataset}.csv")
+    ml_ready_file = os.path.join(workdir, f"ML_Ready_NBA_Player_Stats_{dataset}.csv")
+    mapping_file = os.path.join(workdir, f"Player_Mapping_{dataset}.csv")
+    key_stats_name = f"Key_Stats_{dataset}.csv"
+    clustered_name = f"Clustered_Manual_{dataset}.csv"
+    preprocessing_file = os.path.join(workdir, "preprocessing.json")
+    scaler_file = os.path.join(workdir, "scaler.pkl")
+    kmeans_file = os.path.join(workdir, "kmeans.pkl")
+
+    stages = [
+        ('clean_data', clean_data.drop_tm_column, (raw_file, cleaned_file, is_regular_season), cleaned_file),
+        ('prepare_ml', prepare_ml.preprocess_data, (cleaned_file, ml_ready_file, mapping_file, preprocessing_file),
+         ml_ready_file),
+        ('create_key_stats', create_key_stats.process_file, (cleaned_file, key_stats_name, workdir),
+         os.path.join(workdir, key_stats_name)),
+        ('manual_clusters', manual_clusters.process_file, (os.path.join(workdir, key_stats_name), clustered_name, workdir),
+         os.path.join(workdir, clustered_name)),
+        ('create_models', create_models.train_and_save_models,
+         (ml_ready_file, scaler_file, kmeans_file, (4,), (42,), 1, None, preprocessing_file), kmeans_file),
+        ('analyze_features', run_analyze_features, (ml_ready_file, dataset), None),
+    ]
+
+    results = {}
+    for name, function, args, output in stages:
+        try:
+            results[name] = time_call(function, *args, repeat=repeat)
+        except ImportError as e:
+            results[name] = {'skipped': f"missing dependency: {e.name}"}
+            print(f"  {name}: skipped ({e.name} is not installed)")
+            continue
+        # Some stages report errors instead of raising
+        if output is not None and not os.path.exists(output):
+            raise RuntimeError(f"Stage {name} did not produce {output}")
+        print(f"  {name}: {results[name]['best_seconds'] * 1000:.1f} ms")
+
+    artifacts = {
+        'scaler': scaler_file,
+        'kmeans': kmeans_file,
+        'data': os.path.join(workdir, clustered_name),
+    }
+    return results, artifacts
+
+
+def latency_summary(timings):
+    timings_ms = np.array(timings) * 1000
+    return {
+        'requests': len(timings_ms),
+        'mean_ms': round(float(timings_ms.mean()), 4),
+        'p50_ms': round(float(np.percentile(timings_ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(timings_ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(timings_ms, 99)), 4),
+    }
+
+
+def benchmark_predictions(app_module, artifacts, season, requests, seed=0):
+    """
+    Measures /api/predict latency through the Flask test client, for single
+    stat lines and for batches of BATCH_SIZES rows, against a registry built
+    from the given artifacts.
+    """
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry(artifacts={season: artifacts}, shared_features=False)
+    start = time.perf_counter()
+    registry.preload()
+    load_seconds = time.perf_counter() - start
+    app_module.registry = registry
+    # Results cached for the previous scale's models no longer apply
+    app_module.prediction_cache.invalidate()
+    client = app_module.app.test_client()
+
+    # Query rows drawn from the players' own stat lines
+    players = pd.read_csv(artifacts['data'])[FEATURES].astype(float).to_numpy()
+    rng = np.random.default_rng(seed)
+
+    def post(rows):
+        payload = {'season': season, 'players': [dict(zip(FEATURES, row)) for row in rows.tolist()]}
+        start = time.perf_counter()
+        response = client.post('/api/predict', json=payload)
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/predict returned {response.status_code}: {response.get_data(as_text=True)}")
+        return elapsed
+
+    results = {'registry_load_seconds': round(load_seconds, 6)}
+    post(players[:1])  # warm-up
+    results['single'] = latency_summary([post(players[rng.integers(len(players), size=1)]) for _ in range(requests)])
+    for batch_size in BATCH_SIZES:
+        batch_requests = max(requests // 10, 5)
+        timings = [post(players[rng.integers(len(players), size=batch_size)]) for _ in range(batch_requests)]
+        summary = latency_summary(timings)
+        summary['rows_per_request'] = batch_size
+        summary['mean_ms_per_row'] = round(summary['mean_ms'] / batch_size, 6)
+        results[f"batch_{batch_size}"] = summary
+    results['prediction_cache'] = app_module.prediction_cache.stats()
+    return results
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=repo_dir, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import sklearn
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_benchmarks(scales=(1, 10, 100), season_type='Regular', repeat=3, requests=200, include_app=True):
+    """
+    Runs the stage and prediction benchmarks at every scale and returns the
+    report as a JSON-serializable dict.
+    """
+    season = 'R' if season_type == 'Regular' else 'P'
+    dataset = 'Regular_Season' if season_type == 'Regular' else 'Playoffs'
+
+    app_module = None
+    if include_app:
+        # The app preloads the bundled models from paths relative to the repo
+        sys.path.insert(0, flask_dir)
+        cwd = os.getcwd()
+        os.chdir(repo_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                import app as app_module
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'schema_version': SCHEMA_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': environment_info(),
+        'season_type': season_type,
+        'runs': [],
+    }
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as workdir:
+            raw_file = os.path.join(workdir, "raw.csv")
+            raw = scale_raw_data(RAW_FILES[season_type], scale)
+            raw.to_csv(raw_file, index=False, sep=';')
+            print(f"Scale {scale}x: {len(raw)} raw rows")
+
+            # analyze_features writes its plots under images/ in the working directory
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                stages, artifacts = benchmark_stages(workdir, raw_file, dataset, season_type == 'Regular', repeat)
+            finally:
+                os.chdir(cwd)
+
+            run = {
+                'scale': scale,
+                'raw_rows': len(raw),
+                'players': len(pd.read_csv(artifacts['data'])),
+                'stages': stages,
+            }
+            if app_module is not None:
+                run['prediction'] = benchmark_predictions(app_module, artifacts, season, requests)
+                print(f"  single prediction p50: {run['prediction']['single']['p50_ms']:.2f} ms")
+            report['runs'].append(run)
+    return report
+
+
+def compare_reports(baseline, report, threshold=1.2):
+    """
+    Prints how each stage and prediction timing changed against a baseline
+    report, flagging anything at least `threshold` times slower. Returns the
+    list of regressions.
+    """
+    baseline_runs = {run['scale']: run for run in baseline['runs']}
+    regressions = []
+    print(f"\nCompared with {baseline['environment'].get('commit') or 'baseline'}:")
+    for run in report['runs']:
+        old = baseline_runs.get(run['scale'])
+        if old is None:
+            continue
+        pairs = [(f"stage {name}", timing.get('best_seconds'), old['stages'].get(name, {}).get('best_seconds'))
+                 for name, timing in run['stages'].items()]
+        pairs += [(f"predict {name}", timing.get('p50_ms'), old.get('prediction', {}).get(name, {}).get('p50_ms'))
+                  for name, timing in run.get('prediction', {}).items() if isinstance(timing, dict)]
+        for label, new_value, old_value in pairs:
+            if not new_value or not old_value:
+                continue
+            ratio = new_value / old_value
+            flag = "  <-- slower" if ratio >= threshold else ""
+            print(f"  {run['scale']:>4}x {label:<28} {ratio:5.2f}x{flag}")
+            if flag:
+                regressions.append((run['scale'], label, ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the pipeline stages and prediction latency, and write a JSON report.")
+    parser.add_argument('--scales', default="1,10,100", help="comma-separated dataset multipliers (default 1,10,100)")
+    parser.add_argument('--season-type', choices=sorted(RAW_FILES), default='Regular')
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (best and mean are reported)")
+    parser.add_argument('--requests', type=int, default=200, help="single-row prediction requests per scale")
+    parser.add_argument('--no-app', action='store_true', help="skip the Flask prediction latency measurements")
+    parser.add_argument('--output', default="benchmark_results.json", help="where to write the JSON report")
+    parser.add_argument('--baseline', help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    scales = [int(scale) for scale in args.scales.split(',')]
+    report = run_benchmarks(scales, args.season_type, args.repeat, args.requests, include_app=not args.no_app)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved benchmark report to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare_reports(json.load(f), report)
@@ -1,40 +1,79 @@
+import argparse
+import filecmp
+import os
+import tempfile
+
+import numpy as np
 import pandas as pd
 
+from advanced_metrics import add_advanced_metrics_fused
+from artifact_store import write_table
+
+# Raw rows read per chunk in streaming mode
+STREAMING_CHUNK_SIZE = 50000
+
 def drop_tm_column(input_file, output_file, is_regular_season=True):
     try:
         data = pd.read_csv(input_file, delimiter=';', encoding='utf-8')
         print(f"Processing {input_file}...")
 
-        data = fix_player_names(data)
+        data = clean_raw_rows(data, is_regular_season)
+        data = combine_cleaned_rows(data)
+        save_cleaned_data(data, output_file)
+
+    except Exception as e:
+        print(f"An error occurred while processing {input_file}: {e}")
 
-        if 'Tm' in data.columns:
-            data = data.drop(columns=['Tm'])
-            print("'Tm' column dropped successfully.")
 
-        if 'Rk' in data.columns:
-            data = data.drop(columns=['Rk'])
-            print("'Rk' column dropped successfully.")
+def clean_raw_rows(data, is_regular_season=True):
+    """
+    Applies the row-by-row cleaning steps: fixes player names, drops the 'Tm'
+    and 'Rk' columns and, for the regular season, drops players with few games.
+    Each raw season file can go through this step on its own.
+    """
+    data = fix_player_names(data)
 
-        if is_regular_season:
-            # Drop players with fewer than 20 games
-            data = drop_players_with_few_games(data, min_games=20)
+    if 'Tm' in data.columns:
+        data = data.drop(columns=['Tm'])
+        print("'Tm' column dropped successfully.")
 
-        data = add_id_column(data)
-        data = move_column_to_index(data, 'ID', 0)
-        data = average_duplicate_players(data)
-        data = add_advanced_metrics(data)
+    if 'Rk' in data.columns:
+        data = data.drop(columns=['Rk'])
+        print("'Rk' column dropped successfully.")
 
-        # Save human-readable backup
-        human_readable_backup = output_file.replace('Cleaned', 'Human_Readable_Cleaned')
-        data.to_csv(human_readable_backup, index=False, sep=';')
-        print(f"Human-readable backup saved to {human_readable_backup}.\n")
-        
-        # Save cleaned data
-        data.to_csv(output_file, index=False, sep=';')
-        print(f"Cleaned data saved to {output_file}.\n")
+    if is_regular_season:
+        # Drop players with fewer than 20 games
+        data = drop_players_with_few_games(data, min_games=20)
 
-    except Exception as e:
-        print(f"An error occurred while processing {input_file}: {e}")
+    return data
+
+
+def combine_cleaned_rows(data):
+    """
+    Applies the steps that need every season at once: adds the 'ID' column,
+    averages duplicate players and adds the advanced metrics.
+    """
+    data = add_id_column(data)
+    data = move_column_to_index(data, 'ID', 0)
+    data = average_duplicate_players(data)
+    data = add_advanced_metrics(data)
+    return data
+
+
+def save_cleaned_data(data, output_file, human_readable_file=None):
+    """
+    Saves the cleaned data along with its human-readable backup. By default the
+    backup goes next to the output file with 'Cleaned' renamed to
+    'Human_Readable_Cleaned'.
+    """
+    # Save human-readable backup
+    human_readable_backup = human_readable_file or output_file.replace('Cleaned', 'Human_Readable_Cleaned')
+    data.to_csv(human_readable_backup, index=False, sep=';')
+    print(f"Human-readable backup saved to {human_readable_backup}.\n")
+
+    # Save cleaned data
+    write_table(data, output_file, delimiter=';')
+    print(f"Cleaned data saved to {output_file}.\n")
 
 
 def fix_player_names(data):
@@ -134,7 +173,18 @@ def drop_players_with_few_games(data, min_games=20):
 def add_advanced_metrics(data):
     """
     Adds advanced metrics to the dataset, including scoring dependencies, per-minute metrics,
-    and additional performance ratios.
+    and additional performance ratios. The metrics are declared in advanced_metrics.py and
+    computed in one fused pass.
+    """
+    data = add_advanced_metrics_fused(data)
+    print("Advanced metrics added successfully.")
+    return data
+
+
+def add_advanced_metrics_columnwise(data):
+    """
+    Column-by-column version of add_advanced_metrics, kept as the reference the
+    fused version is checked and benchmarked against.
     """
     # Avoid division by zero
     data['PTS'] = data['PTS'].replace(0, 1)
@@ -179,17 +229,165 @@ def add_advanced_metrics(data):
     return data
 
 
-# Regular season: Apply the filter
-drop_tm_column(
-    'data/raw/Combined NBA Player Stats - Regular.csv',
-    'data/processed/Cleaned_NBA_Player_Stats_Regular_Season.csv',
-    is_regular_season=True  # Regular season flag
-)
+class RunningPlayerAverages:
+    """
+    Streaming equivalent of average_duplicate_players. Keeps, per distinct
+    player, a running sum, a compensation term and a count for every numeric
+    column, plus the non-numeric values of the player's first row, so memory
+    grows with the number of players rather than the number of raw rows.
+
+    Sums use the same compensated (Kahan) summation, applied in the same row
+    order, as pandas' groupby mean, so the averages are bit-for-bit identical
+    and round to the same one-decimal values.
+    """
 
-# Playoffs: Skip the filter
-drop_tm_column(
-    'data/raw/Combined NBA Player Stats - Playoffs.csv',
-    'data/processed/Cleaned_NBA_Player_Stats_Playoffs.csv',
-    is_regular_season=False  # Playoffs flag
-)
+    def __init__(self):
+        self.numeric_columns = None
+        self.non_numeric_columns = None
+        self.player_ids = {}
+        self.names = []
+        self.first_rows = []
+        self._sums = self._compensation = self._counts = None
+
+    def _grow(self, n_players):
+        capacity = 0 if self._sums is None else len(self._sums)
+        if n_players <= capacity:
+            return
+        new_capacity = max(n_players, capacity * 2, 1024)
+        n_columns = len(self.numeric_columns)
+        for name in ('_sums', '_compensation', '_counts'):
+            grown = np.zeros((new_capacity, n_columns))
+            if capacity:
+                grown[:capacity] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def add(self, chunk):
+        if self.numeric_columns is None:
+            self.numeric_columns = [col for col in chunk.select_dtypes(include=['number']).columns if col != 'ID']
+            self.non_numeric_columns = [col for col in chunk.columns
+                                        if col not in self.numeric_columns + ['Player', 'ID']]
+
+        chunk = chunk[chunk['Player'].notna()]
+        ids = np.empty(len(chunk), dtype=np.intp)
+        for i, (name, first_row) in enumerate(zip(chunk['Player'], chunk[self.non_numeric_columns].itertuples(index=False))):
+            player_id = self.player_ids.get(name)
+            if player_id is None:
+                player_id = self.player_ids[name] = len(self.names)
+                self.names.append(name)
+                self.first_rows.append(tuple(first_row))
+            ids[i] = player_id
+        self._grow(len(self.names))
+
+        values = chunk[self.numeric_columns].to_numpy(dtype=float)
+        occurrence = pd.Series(ids).groupby(ids).cumcount().to_numpy()
+
+        # Each round takes at most one row per player, so rows of the same
+        # player are added in file order, exactly like a sequential pass
+        for round_number in range(occurrence.max() + 1 if len(ids) else 0):
+            selected = occurrence == round_number
+            round_ids = ids[selected]
+            round_values = values[selected]
+            valid = ~np.isnan(round_values)
+
+            sums = self._sums[round_ids]
+            compensation = self._compensation[round_ids]
+            y = round_values - compensation
+            t = sums + y
+            new_compensation = t - sums - y
+            # An infinite value would make the compensation NaN
+            new_compensation[np.isnan(new_compensation)] = 0
+
+            self._sums[round_ids] = np.where(valid, t, sums)
+            self._compensation[round_ids] = np.where(valid, new_compensation, compensation)
+            self._counts[round_ids] += valid
+
+    def result(self):
+        """
+        Returns the averaged data in the same layout as average_duplicate_players:
+        sorted by player, numeric columns rounded to one decimal, fresh IDs.
+        """
+        n_players = len(self.names)
+        names = np.array(self.names, dtype=object)
+        order = np.argsort(names.astype(str), kind='stable')
+
+        sums = self._sums[:n_players]
+        counts = self._counts[:n_players]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / counts, np.nan)
+
+        final_data = pd.DataFrame({'Player': names[order]})
+        for j, column in enumerate(self.numeric_columns):
+            final_data[column] = means[order, j]
+        first_rows = [self.first_rows[i] for i in order]
+        for j, column in enumerate(self.non_numeric_columns):
+            final_data[column] = [row[j] for row in first_rows]
+
+        # Round all numeric columns to one decimal place
+        final_data[self.numeric_columns] = final_data[self.numeric_columns].round(1)
+
+        # Recompute ID column and move it to index 0
+        final_data['ID'] = range(1, len(final_data) + 1)
+        final_data = move_column_to_index(final_data, 'ID', 0)
 
+        print(f"Averaged statistics for {n_players} players successfully.")
+        return final_data
+
+
+def stream_clean(input_file, output_file, is_regular_season=True, chunksize=STREAMING_CHUNK_SIZE, encoding='utf-8'):
+    """
+    Streaming version of drop_tm_column: reads the raw file in chunks, applies
+    the row-by-row cleaning to each chunk, and folds it into running per-player
+    averages. Peak memory is bounded by the chunk size and the number of
+    distinct players. The output is identical to the in-memory path.
+    """
+    print(f"Streaming {input_file} in chunks of {chunksize} rows...")
+    averages = RunningPlayerAverages()
+    for chunk in pd.read_csv(input_file, delimiter=';', encoding=encoding, chunksize=chunksize):
+        averages.add(clean_raw_rows(chunk, is_regular_season))
+
+    data = averages.result()
+    data = add_advanced_metrics(data)
+    save_cleaned_data(data, output_file)
+
+
+def check_streaming_matches(input_file, is_regular_season=True, chunksize=97):
+    """
+    Runs the in-memory and streaming paths on the same input (with a small,
+    odd chunk size so players straddle chunk boundaries) and verifies the
+    cleaned outputs are byte-for-byte identical.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        in_memory = os.path.join(directory, 'Cleaned_In_Memory.csv')
+        streamed = os.path.join(directory, 'Cleaned_Streamed.csv')
+        drop_tm_column(input_file, in_memory, is_regular_season)
+        stream_clean(input_file, streamed, is_regular_season, chunksize=chunksize)
+        if not filecmp.cmp(in_memory, streamed, shallow=False):
+            raise AssertionError(f"Streaming output differs from the in-memory output for {input_file}")
+    print(f"Streaming output matches the in-memory output for {input_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean the combined raw NBA player stats.")
+    parser.add_argument('--streaming', action='store_true',
+                        help="read the raw files in chunks with bounded memory")
+    parser.add_argument('--chunksize', type=int, default=STREAMING_CHUNK_SIZE, help="rows per chunk in streaming mode")
+    parser.add_argument('--check', action='store_true',
+                        help="only verify the streaming and in-memory outputs are identical")
+    args = parser.parse_args()
+
+    jobs = [
+        # Regular season: Apply the filter
+        ('data/raw/Combined NBA Player Stats - Regular.csv',
+         'data/processed/Cleaned_NBA_Player_Stats_Regular_Season.csv', True),
+        # Playoffs: Skip the filter
+        ('data/raw/Combined NBA Player Stats - Playoffs.csv',
+         'data/processed/Cleaned_NBA_Player_Stats_Playoffs.csv', False),
+    ]
+
+    for input_file, output_file, is_regular_season in jobs:
+        if args.check:
+            check_streaming_matches(input_file, is_regular_season)
+        elif args.streaming:
+            stream_clean(input_file, output_file, is_regular_season, chunksize=args.chunksize)
+        else:
+            drop_tm_column(input_file, output_file, is_regular_season)
@@ -1,17 +1,34 @@
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import numpy as np
+import json
 import pickle
 import os
+import time
+
+import prepare_ml
+from artifact_store import read_table
+from inference import export_compact_model
 
 # Paths
 regular_season_path = "data/processed/ml_ready/ML_Ready_NBA_Player_Stats_Regular_Season.csv"
 playoffs_path = "data/processed/ml_ready/ML_Ready_NBA_Player_Stats_Playoffs.csv"
-models_dir = r"C:\Users\Shrav\OneDrive\Desktop\NBA_Stats_Project\models"
+models_dir = os.environ.get('NBA_MODELS_DIR', "models")
+
+# Default sweep: the single 4-cluster model the app has always used
+DEFAULT_K_VALUES = (4,)
+DEFAULT_SEEDS = (42,)
+
+# Rows read per chunk in streaming mode
+STREAMING_CHUNK_SIZE = 10000
 
+# Silhouette is O(n^2), so larger datasets are scored on a sample
+SILHOUETTE_SAMPLE_SIZE = 5000
 
-# Make sure models directory exists
-os.makedirs(models_dir, exist_ok=True)
 
 # Features we will use
 selected_features = [
@@ -25,42 +42,288 @@ selected_features = [
     "3P%"
 ]
 
-def train_and_save_models(input_csv, scaler_path, kmeans_path):
-    print(f"Loading {input_csv}...")
-    data = pd.read_csv(input_csv, delimiter=';')
-    
-    # Select only the desired 8 features
-    X = data[selected_features]
+def preprocessing_for(kmeans_path):
+    """
+    Returns the preprocessing artifact saved next to a KMeans pickle, e.g.
+    models/kmeans_regular.pkl -> models/preprocessing_regular.json.
+    """
+    directory, filename = os.path.split(kmeans_path)
+    stem = os.path.splitext(filename)[0]
+    if stem.startswith('kmeans_'):
+        stem = stem[len('kmeans_'):]
+    return prepare_ml.preprocessing_path(stem, directory)
+
+
+def raw_features(X, preprocessing):
+    """
+    Undoes prepare_ml's standardization of the selected features, giving back
+    raw stat lines. The scaler is fitted on these so it maps what the app and
+    the CLI feed it (raw stats) to the z-scores KMeans is trained on.
+    """
+    columns = preprocessing['numeric_columns']
+    idx = [columns.index(feature) for feature in selected_features]
+    mean = np.asarray(preprocessing['mean'], dtype=float)[idx]
+    scale = np.asarray(preprocessing['scale'], dtype=float)[idx]
+    return np.asarray(X, dtype=float) * scale + mean
+
+
+def fit_candidate(X_scaled, k, seed):
+    """
+    Fits one KMeans candidate and scores it. Runs in a worker process, limited
+    to one BLAS/OpenMP thread so parallel candidates do not oversubscribe cores.
+    """
+    from threadpoolctl import threadpool_limits
+
+    with threadpool_limits(limits=1):
+        start = time.perf_counter()
+        kmeans = KMeans(n_clusters=k, random_state=seed, n_init=10)
+        kmeans.fit(X_scaled)
+        fit_seconds = time.perf_counter() - start
+
+        silhouette = None
+        if 1 < k < len(X_scaled):
+            sample_size = min(len(X_scaled), SILHOUETTE_SAMPLE_SIZE)
+            silhouette = float(silhouette_score(X_scaled, kmeans.labels_, sample_size=sample_size, random_state=seed))
+
+    return kmeans, {
+        'k': k,
+        'seed': seed,
+        'inertia': float(kmeans.inertia_),
+        'silhouette': silhouette,
+        'fit_seconds': round(fit_seconds, 4),
+    }
+
+
+def best_candidate(scores):
+    """
+    Picks the candidate with the highest silhouette score, breaking ties (and
+    single-k sweeps) by lowest inertia, then by sweep order.
+    """
+    return min(
+        range(len(scores)),
+        key=lambda i: (-(scores[i]['silhouette'] if scores[i]['silhouette'] is not None else float('-inf')),
+                       scores[i]['inertia'], i),
+    )
+
+
+def train_seasons(jobs, k_values=DEFAULT_K_VALUES, seeds=DEFAULT_SEEDS, n_jobs=None, report_path=None):
+    """
+    Trains every season in `jobs` (a list of (name, input_csv, scaler_path,
+    kmeans_path, preprocessing_path) tuples) at once: each season gets its
+    scaler fitted on raw stat lines (ML-ready rows unscaled with the season's
+    preprocessing artifact), then every (k, seed) candidate of every season
+    is fitted in one process pool.
+    The best candidate per season is saved next to its scaler, and a JSON
+    report of scores and training times is written to `report_path`.
+    """
+    started = time.perf_counter()
+    seasons = []
+    for name, input_csv, scaler_path, kmeans_path, preprocessing_path in jobs:
+        print(f"Loading {input_csv}...")
+        data = read_table(input_csv, delimiter=';')
+        preprocessing = prepare_ml.load_preprocessing(preprocessing_path)
+
+        # Select only the desired 8 features, back in raw units
+        X = pd.DataFrame(raw_features(data[selected_features], preprocessing), columns=selected_features)
+
+        # Scale the data
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+        seasons.append((name, input_csv, scaler, X_scaled, scaler_path, kmeans_path))
+
+    candidates = [(season_idx, k, seed) for season_idx in range(len(seasons)) for k in k_values for seed in seeds]
+    print(f"Training {len(candidates)} KMeans candidate(s) for {len(seasons)} season(s)...")
+    if n_jobs == 1 or len(candidates) == 1:
+        fitted = [fit_candidate(seasons[i][3], k, seed) for i, k, seed in candidates]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [pool.submit(fit_candidate, seasons[i][3], k, seed) for i, k, seed in candidates]
+            fitted = [future.result() for future in futures]
+
+    report = {'k_values': list(k_values), 'seeds': list(seeds), 'seasons': {}}
+    for season_idx, (name, input_csv, scaler, X_scaled, scaler_path, kmeans_path) in enumerate(seasons):
+        results = [fitted[i] for i, candidate in enumerate(candidates) if candidate[0] == season_idx]
+        scores = [score for _, score in results]
+        best = best_candidate(scores)
+        kmeans = results[best][0]
+
+        # Save the scaler and the best KMeans model
+        os.makedirs(os.path.dirname(scaler_path) or '.', exist_ok=True)
+        with open(scaler_path, 'wb') as f:
+            pickle.dump(scaler, f)
+        with open(kmeans_path, 'wb') as f:
+            pickle.dump(kmeans, f)
+        export_compact_model(scaler, kmeans, scaler_path, kmeans_path)
+
+        print(f"{name}: best model k={scores[best]['k']} seed={scores[best]['seed']} "
+              f"(silhouette={scores[best]['silhouette']}, inertia={scores[best]['inertia']:.2f})")
+        print(f"Saved scaler to {scaler_path}")
+        print(f"Saved kmeans model to {kmeans_path}\n")
+
+        report['seasons'][name] = {
+            'input': input_csv,
+            'rows': len(X_scaled),
+            'scaler': scaler_path,
+            'kmeans': kmeans_path,
+            'best': scores[best],
+            'candidates': scores,
+        }
+    report['total_seconds'] = round(time.perf_counter() - started, 4)
+
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved training report to {report_path}")
+    return report
+
+
+def train_and_save_models(input_csv, scaler_path, kmeans_path, k_values=DEFAULT_K_VALUES, seeds=DEFAULT_SEEDS,
+                          n_jobs=None, report_path=None, preprocessing_path=None):
+    """
+    Trains and saves the scaler and best KMeans model for a single season.
+    The preprocessing artifact defaults to the one next to kmeans_path.
+    """
+    name = os.path.splitext(os.path.basename(kmeans_path))[0]
+    preprocessing_path = preprocessing_path or preprocessing_for(kmeans_path)
+    return train_seasons([(name, input_csv, scaler_path, kmeans_path, preprocessing_path)],
+                         k_values, seeds, n_jobs, report_path)
+
+
+def iter_feature_chunks(input_csv, preprocessing, chunksize=STREAMING_CHUNK_SIZE):
+    """
+    Yields the 8 selected features of an ML-ready CSV, back in raw units, as
+    float64 arrays of at most `chunksize` rows, without loading the whole file.
+    """
+    for chunk in pd.read_csv(input_csv, delimiter=';', usecols=selected_features, chunksize=chunksize,
+                             float_precision='round_trip'):
+        yield raw_features(chunk[selected_features], preprocessing)
+
+
+def train_streaming(input_csv, scaler_path, kmeans_path, n_clusters=4, seed=42,
+                    chunksize=STREAMING_CHUNK_SIZE, epochs=3, preprocessing_path=None):
+    """
+    Trains the scaler and a mini-batch KMeans model by streaming the ML-ready
+    data in chunks, so memory stays bounded by the chunk size:
+
+        pass 1      StandardScaler.partial_fit on every chunk
+        passes 2..  MiniBatchKMeans.partial_fit on every scaled chunk, `epochs` times
+        last pass   predict every chunk to fill in labels_ and inertia_
+
+    The saved objects are a StandardScaler and a MiniBatchKMeans with
+    labels_ for every row, so they drop in wherever the KMeans pickles are used.
+    """
+    print(f"Streaming {input_csv} in chunks of {chunksize} rows...")
+    start = time.perf_counter()
+    preprocessing = prepare_ml.load_preprocessing(preprocessing_path or preprocessing_for(kmeans_path))
 
-    # Scale the data
     scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    n_rows = 0
+    for X in iter_feature_chunks(input_csv, preprocessing, chunksize):
+        scaler.partial_fit(X)
+        n_rows += len(X)
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=seed, batch_size=min(chunksize, 1024), n_init=3)
+    for epoch in range(epochs):
+        for X in iter_feature_chunks(input_csv, preprocessing, chunksize):
+            # partial_fit needs at least n_clusters rows to initialize
+            if not hasattr(kmeans, 'cluster_centers_') and len(X) < n_clusters:
+                continue
+            kmeans.partial_fit(scaler.transform(X))
 
-    # Train KMeans with 4 clusters
-    kmeans = KMeans(n_clusters=4, random_state=42, n_init=10)
-    kmeans.fit(X_scaled)
+    labels = np.empty(n_rows, dtype=np.int32)
+    inertia = 0.0
+    offset = 0
+    for X in iter_feature_chunks(input_csv, preprocessing, chunksize):
+        X_scaled = scaler.transform(X)
+        chunk_labels = kmeans.predict(X_scaled)
+        labels[offset:offset + len(X)] = chunk_labels
+        inertia += float(((X_scaled - kmeans.cluster_centers_[chunk_labels]) ** 2).sum())
+        offset += len(X)
+    kmeans.labels_ = labels
+    kmeans.inertia_ = inertia
 
     # Save the scaler and KMeans model
+    os.makedirs(os.path.dirname(scaler_path) or '.', exist_ok=True)
     with open(scaler_path, 'wb') as f:
         pickle.dump(scaler, f)
     with open(kmeans_path, 'wb') as f:
         pickle.dump(kmeans, f)
+    export_compact_model(scaler, kmeans, scaler_path, kmeans_path)
 
+    print(f"Streamed {n_rows} rows in {time.perf_counter() - start:.2f}s (inertia={inertia:.2f})")
     print(f"Saved scaler to {scaler_path}")
     print(f"Saved kmeans model to {kmeans_path}\n")
+    return scaler, kmeans
+
+
+def parse_k_values(value):
+    """
+    Parses a k sweep such as '4', '2-8' or '3,4,6'.
+    """
+    k_values = []
+    for part in value.split(','):
+        if '-' in part:
+            low, high = part.split('-', 1)
+            k_values.extend(range(int(low), int(high) + 1))
+        else:
+            k_values.append(int(part))
+    if not k_values or min(k_values) < 1:
+        raise argparse.ArgumentTypeError(f"Invalid k values: {value}")
+    return tuple(k_values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the scaler and KMeans models for both datasets.")
+    parser.add_argument('--models-dir', default=models_dir,
+                        help="where to save the models (default: $NBA_MODELS_DIR or 'models')")
+    parser.add_argument('--k', type=parse_k_values, default=DEFAULT_K_VALUES,
+                        help="cluster counts to sweep, e.g. '4', '2-8' or '3,4,6' (default: 4)")
+    parser.add_argument('--seeds', type=lambda v: tuple(int(s) for s in v.split(',')), default=DEFAULT_SEEDS,
+                        help="comma-separated random seeds to try for each k (default: 42)")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="train with mini-batch KMeans over chunks instead of loading the full dataset "
+                             "(uses the first --k value and --seeds value)")
+    parser.add_argument('--chunksize', type=int, default=STREAMING_CHUNK_SIZE, help="rows per chunk in streaming mode")
+    parser.add_argument('--epochs', type=int, default=3, help="passes over the data in streaming mode")
+    parser.add_argument('--export-compact', action='store_true',
+                        help="only export compact NumPy copies of the already trained models")
+    args = parser.parse_args()
+
+    # Make sure models directory exists
+    os.makedirs(args.models_dir, exist_ok=True)
+
+    jobs = [
+        ("Regular_Season", regular_season_path,
+         os.path.join(args.models_dir, "scaler_regular.pkl"),
+         os.path.join(args.models_dir, "kmeans_regular.pkl"),
+         prepare_ml.preprocessing_path('regular', args.models_dir)),
+        ("Playoffs", playoffs_path,
+         os.path.join(args.models_dir, "scaler_playoffs.pkl"),
+         os.path.join(args.models_dir, "kmeans_playoffs.pkl"),
+         prepare_ml.preprocessing_path('playoffs', args.models_dir)),
+    ]
+
+    if args.export_compact:
+        for name, input_csv, scaler_path, kmeans_path, _ in jobs:
+            with open(scaler_path, 'rb') as f:
+                scaler = pickle.load(f)
+            with open(kmeans_path, 'rb') as f:
+                kmeans = pickle.load(f)
+            export_compact_model(scaler, kmeans, scaler_path, kmeans_path)
+    elif args.streaming:
+        for name, input_csv, scaler_path, kmeans_path, preprocessing_path in jobs:
+            train_streaming(input_csv, scaler_path, kmeans_path, n_clusters=args.k[0], seed=args.seeds[0],
+                            chunksize=args.chunksize, epochs=args.epochs, preprocessing_path=preprocessing_path)
+    else:
+        # Train and save for regular season and playoffs together
+        train_seasons(
+            jobs,
+            k_values=args.k,
+            seeds=args.seeds,
+            n_jobs=args.jobs,
+            report_path=os.path.join(args.models_dir, "training_report.json"),
+        )
 
-# Train and save for regular season
-train_and_save_models(
-    regular_season_path,
-    os.path.join(models_dir, "scaler_regular.pkl"),
-    os.path.join(models_dir, "kmeans_regular.pkl")
-)
-
-# Train and save for playoffs
-train_and_save_models(
-    playoffs_path,
-    os.path.join(models_dir, "scaler_playoffs.pkl"),
-    os.path.join(models_dir, "kmeans_playoffs.pkl")
-)
-
-print(" Finished training scalers and kmeans models for both datasets!")
\ No newline at end of file
+    if not args.export_compact:
+        print(" Finished training scalers and kmeans models for both datasets!")
@@ -0,0 +1,206 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+FEATURES = ['PTS', 'Age', 'Usage Rate', 'AST', 'TRB', 'STL', 'BLK', '3P%']
+
+# Paths
+features_dir = "data/features"
+
+
+def feature_matrix_paths(dataset, directory=features_dir):
+    """
+    Returns the (matrix .npy, player names .npy, metadata .json) paths for a
+    dataset name such as 'Regular_Season'.
+    """
+    return (
+        os.path.join(directory, f"Features_Scaled_{dataset}.npy"),
+        os.path.join(directory, f"Players_{dataset}.npy"),
+        os.path.join(directory, f"Features_Scaled_{dataset}.json"),
+    )
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_sources(scaler_path, clustered_path=None):
+    """
+    Content hashes of the files a derived artifact is built from: the
+    season's scaler and, for artifacts built from the clustered dataset, that
+    dataset. Stored in every derived artifact so the app can tell whether
+    artifacts loaded together were built from the same data.
+    """
+    sources = {'scaler_sha256': file_sha256(scaler_path)}
+    if clustered_path is not None:
+        sources['dataset_sha256'] = file_sha256(clustered_path)
+    return sources
+
+
+def export_feature_matrix(scaler_path, clustered_path, dataset, directory=features_dir):
+    """
+    Standardizes the clustered dataset with the season's scaler and writes it
+    as a contiguous float32 .npy file, with the player names and cluster labels
+    alongside, so serving processes can memory-map it instead of rebuilding it.
+    """
+    import joblib
+    from artifact_store import read_table
+    from inference import player_label_map
+
+    os.makedirs(directory, exist_ok=True)
+    matrix_path, names_path, meta_path = feature_matrix_paths(dataset, directory)
+
+    scaler = joblib.load(scaler_path)
+    data = read_table(clustered_path)
+    X_scaled = np.ascontiguousarray(scaler.transform(data[FEATURES].astype(float)), dtype=np.float32)
+
+    meta = {
+        'rows': len(X_scaled),
+        'features': FEATURES,
+        'labels': sorted(str(label) for label in data['Cluster_Label'].unique()),
+        'sources': artifact_sources(scaler_path, clustered_path),
+        'player_labels': player_label_map(data['Player'], data['Cluster_Label']),
+    }
+
+    np.save(matrix_path, X_scaled)
+    np.save(names_path, data['Player'].to_numpy().astype(str))
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    print(f"Saved {X_scaled.shape[0]}x{X_scaled.shape[1]} float32 feature matrix to {matrix_path}")
+
+
+def open_feature_matrix(matrix_path):
+    """
+    Memory-maps an exported feature matrix read-only. Every process that maps
+    the same file shares one copy of its pages in the OS page cache.
+    """
+    return np.load(matrix_path, mmap_mode='r')
+
+
+class LazyPlayerNames:
+    """
+    Player names for an exported feature matrix, memory-mapped on first use.
+    Supports the indexing the request handlers use on the players array.
+    """
+
+    def __init__(self, names_path):
+        self.names_path = names_path
+        self._names = None
+
+    @property
+    def names(self):
+        if self._names is None:
+            self._names = np.load(self.names_path, mmap_mode='r')
+        return self._names
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, idx):
+        values = self.names[idx]
+        if isinstance(values, np.ndarray):
+            return values.astype(object)
+        return str(values)
+
+
+def _private_memory_kb():
+    # Unique set size: pages mapped only by this process
+    private = 0
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                private += int(line.split()[1])
+    return private
+
+
+def _memory_worker(mode, scaler_path, clustered_path, matrix_path, repeat, ready, results):
+    import pandas as pd
+    import joblib
+    from artifact_store import read_table
+
+    scaler = joblib.load(scaler_path)
+    before = _private_memory_kb()
+    if mode == 'pandas':
+        data = pd.concat([read_table(clustered_path)] * repeat, ignore_index=True)
+        X_scaled = scaler.transform(data[FEATURES].astype(float))
+        checksum = float(X_scaled.sum())
+    else:
+        X_scaled = open_feature_matrix(matrix_path)
+        checksum = float(X_scaled.sum(dtype=np.float64))
+
+    # Measure while every worker still holds its data, so shared pages are shared
+    ready.wait()
+    results.put((mode, _private_memory_kb() - before, checksum))
+    ready.wait()
+
+
+def compare_memory(scaler_path, clustered_path, workers=4, repeat=100, directory=features_dir):
+    """
+    Loads the feature matrix in `workers` processes, first the current way
+    (each worker parses the clustered data with pandas and scales it) and then
+    by memory-mapping an exported float32 matrix, and prints the memory each
+    approach adds across all workers: the private memory of every worker plus,
+    for the memory-mapped file, one shared page-cache copy. `repeat` tiles the
+    dataset to simulate a larger history. Linux only.
+    """
+    import multiprocessing
+    import pandas as pd
+    import joblib
+    from artifact_store import read_table
+
+    # Export a tiled matrix so both modes work on the same number of rows
+    scaler = joblib.load(scaler_path)
+    data = pd.concat([read_table(clustered_path)] * repeat, ignore_index=True)
+    os.makedirs(directory, exist_ok=True)
+    matrix_path = os.path.join(directory, "Features_Scaled_Memory_Comparison.npy")
+    np.save(matrix_path, np.ascontiguousarray(scaler.transform(data[FEATURES].astype(float)), dtype=np.float32))
+    shared_kb = os.path.getsize(matrix_path) / 1024
+
+    # Fresh interpreters, so workers do not inherit the parent's copy of the data
+    context = multiprocessing.get_context('spawn')
+    print(f"Comparing {workers} workers over {len(data)} player rows:")
+    try:
+        for mode in ('pandas', 'mmap'):
+            ready = context.Barrier(workers)
+            results = context.Queue()
+            processes = [
+                context.Process(target=_memory_worker,
+                                args=(mode, scaler_path, clustered_path, matrix_path, repeat, ready, results))
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            private_kb = sum(results.get()[1] for _ in processes)
+            for process in processes:
+                process.join()
+            total_kb = private_kb + (shared_kb if mode == 'mmap' else 0)
+            print(f"  {mode:>6}: {total_kb / 1024:.1f} MiB total "
+                  f"({private_kb / 1024:.1f} MiB private across workers"
+                  f"{f', {shared_kb / 1024:.1f} MiB shared' if mode == 'mmap' else ''})")
+    finally:
+        os.remove(matrix_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export memory-mappable feature matrices for the Flask app.")
+    parser.add_argument('--compare-memory', action='store_true',
+                        help="compare per-worker memory of pandas loading against the memory-mapped matrix")
+    parser.add_argument('--workers', type=int, default=4, help="worker processes for --compare-memory")
+    parser.add_argument('--repeat', type=int, default=100, help="times to tile the dataset for --compare-memory")
+    args = parser.parse_args()
+
+    if args.compare_memory:
+        compare_memory('models/scaler_regular.pkl', 'data/clustered/Clustered_Manual_Regular_Season.csv',
+                       workers=args.workers, repeat=args.repeat)
+    else:
+        export_feature_matrix('models/scaler_regular.pkl', 'data/clustered/Clustered_Manual_Regular_Season.csv',
+                              'Regular_Season')
+        export_feature_matrix('models/scaler_playoffs.pkl', 'data/clustered/Clustered_Manual_Playoffs.csv',
+                              'Playoffs')
@@ -0,0 +1,173 @@
+import csv
+import hashlib
+import os
+
+import numpy as np
+
+FEATURES = ['PTS', 'Age', 'Usage Rate', 'AST', 'TRB', 'STL', 'BLK', '3P%']
+
+COMPACT_FORMAT_VERSION = 1
+
+
+def compact_model_path(kmeans_path):
+    """
+    Returns the compact artifact path for a KMeans pickle, e.g.
+    models/kmeans_regular.pkl -> models/compact_regular.npz.
+    """
+    directory, filename = os.path.split(kmeans_path)
+    stem = os.path.splitext(filename)[0]
+    if stem.startswith('kmeans_'):
+        stem = stem[len('kmeans_'):]
+    return os.path.join(directory, f"compact_{stem}.npz")
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class CompactScaler:
+    """
+    StandardScaler.transform with NumPy alone: (X - mean) / scale.
+    """
+
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=float)
+        self.scale_ = np.asarray(scale, dtype=float)
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2 or X.shape[1] != len(self.mean_):
+            raise ValueError(f"Expected an (n, {len(self.mean_)}) array, got shape {X.shape}")
+        return (X - self.mean_) / self.scale_
+
+
+class CompactKMeans:
+    """
+    KMeans.predict with NumPy alone: the index of the nearest centroid.
+    """
+
+    def __init__(self, cluster_centers):
+        self.cluster_centers_ = np.asarray(cluster_centers, dtype=float)
+        self.n_clusters = len(self.cluster_centers_)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        sq_dist = ((X[:, None, :] - self.cluster_centers_[None, :, :]) ** 2).sum(axis=2)
+        return np.argmin(sq_dist, axis=1).astype(np.int32)
+
+
+def export_compact_model(scaler, kmeans, scaler_path, kmeans_path):
+    """
+    Writes a fitted scaler's mean/scale vectors and a KMeans model's centroids
+    to a small .npz next to the pickles, tagged with the pickles' content
+    hashes so a stale export is never used for retrained models.
+    """
+    path = compact_model_path(kmeans_path)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones_like(scaler.mean_)
+    np.savez(
+        path,
+        format_version=np.array(COMPACT_FORMAT_VERSION),
+        features=np.array(getattr(scaler, 'feature_names_in_', FEATURES), dtype=str),
+        mean=np.asarray(scaler.mean_, dtype=float),
+        scale=np.asarray(scale, dtype=float),
+        centers=np.asarray(kmeans.cluster_centers_, dtype=float),
+        sources=np.array([_sha256(scaler_path), _sha256(kmeans_path)]),
+    )
+    print(f"Saved compact model to {path}")
+    return path
+
+
+def load_compact_model(path, scaler_path=None, kmeans_path=None):
+    """
+    Loads a compact artifact as (CompactScaler, CompactKMeans). Returns None if
+    it is missing, from another format version, or was exported from pickles
+    other than the ones at scaler_path/kmeans_path (when those exist).
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as artifact:
+        if int(artifact['format_version']) != COMPACT_FORMAT_VERSION:
+            return None
+        if list(artifact['features']) != FEATURES:
+            return None
+        if scaler_path and kmeans_path and os.path.exists(scaler_path) and os.path.exists(kmeans_path):
+            if list(artifact['sources']) != [_sha256(scaler_path), _sha256(kmeans_path)]:
+                print(f"{path} is older than the pickled models; ignoring it.")
+                return None
+        return CompactScaler(artifact['mean'], artifact['scale']), CompactKMeans(artifact['centers'])
+
+
+def read_player_table(csv_path, features=FEATURES):
+    """
+    Reads a clustered dataset with the csv module instead of pandas.
+    Returns (player names, (n, 8) float feature matrix, cluster labels).
+    """
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        player_col = header.index('Player')
+        label_col = header.index('Cluster_Label')
+        feature_cols = [header.index(feature) for feature in features]
+        players, rows, labels = [], [], []
+        for record in reader:
+            players.append(record[player_col])
+            rows.append([float(record[j]) for j in feature_cols])
+            labels.append(record[label_col])
+    X = np.array(rows, dtype=float).reshape(len(rows), len(features))
+    return np.array(players, dtype=object), X, np.array(labels, dtype=object)
+
+
+def player_label_map(players, row_labels):
+    """
+    Returns {player name: manual 'Cluster_Label'} for a clustered dataset
+    (first row wins). A stat line's player type is the label of its closest
+    player, as in predict_player_type.py.
+    """
+    labels = {}
+    for player, label in zip(players, row_labels):
+        labels.setdefault(str(player), str(label))
+    return labels
+
+
+def check_matches_sklearn(scaler_path, kmeans_path, clustered_path, n_random=5000, seed=42):
+    """
+    Checks that the compact scaler and KMeans give the same standardized
+    features and clusters as the pickled sklearn objects, on every player and
+    on random stat lines.
+    """
+    import joblib
+    import pandas as pd
+
+    scaler, kmeans = joblib.load(scaler_path), joblib.load(kmeans_path)
+    compact = load_compact_model(compact_model_path(kmeans_path), scaler_path, kmeans_path)
+    if compact is None:
+        raise AssertionError(f"No up-to-date compact model for {kmeans_path}")
+    compact_scaler, compact_kmeans = compact
+
+    _, X, _ = read_player_table(clustered_path)
+    expected_X = pd.read_csv(clustered_path)[FEATURES].astype(float).to_numpy()
+    if not np.array_equal(X, expected_X):
+        raise AssertionError(f"read_player_table differs from pandas for {clustered_path}")
+
+    rng = np.random.default_rng(seed)
+    queries = np.vstack([X, rng.uniform(X.min(axis=0), X.max(axis=0), size=(n_random, X.shape[1]))])
+    expected_scaled = scaler.transform(queries)
+    actual_scaled = compact_scaler.transform(queries)
+    if not np.array_equal(expected_scaled, actual_scaled):
+        raise AssertionError(f"Compact scaler differs from {scaler_path}")
+    if not np.array_equal(kmeans.predict(expected_scaled), compact_kmeans.predict(actual_scaled)):
+        raise AssertionError(f"Compact KMeans differs from {kmeans_path}")
+    print(f"Compact model matches {scaler_path} and {kmeans_path} on {len(queries)} stat lines.")
+
+
+SEASONS = [
+    ('models/scaler_regular.pkl', 'models/kmeans_regular.pkl', 'data/clustered/Clustered_Manual_Regular_Season.csv'),
+    ('models/scaler_playoffs.pkl', 'models/kmeans_playoffs.pkl', 'data/clustered/Clustered_Manual_Playoffs.csv'),
+]
+
+
+if __name__ == "__main__":
+    # Exported by create_models.py; this only verifies the exports
+    for scaler_path, kmeans_path, clustered_path in SEASONS:
+        check_matches_sklearn(scaler_path, kmeans_path, clustered_path)
@@ -1,7 +1,24 @@
-import pandas as pd
+import argparse
+import json
+import operator
+import numpy as np
 import os
 
-# Define your rules
+from artifact_store import read_table, write_table
+
+# Rules file: an ordered list of {"label": ..., <condition>} entries, first match wins
+rules_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cluster_rules.json")
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Row-by-row reference version of the default rules, used by --check
 def assign_cluster(row):
     if row['PTS'] < 5 or row['Usage Rate'] < 0.2:
         return "Bench Player"
@@ -14,27 +31,109 @@ def assign_cluster(row):
     else:
         return "Role Player"
 
+def load_rules(path=rules_path):
+    """
+    Loads the labeling rules from a JSON file. Each entry has a 'label' and
+    an optional condition; an entry without a condition is the default label.
+    Conditions are either a comparison
+        {"column": "PTS", "op": ">=", "value": 23}
+    where "column" may be a list of columns that are summed first, or a
+    combination {"any": [...]} / {"all": [...]} of nested conditions.
+    """
+    with open(path) as f:
+        rules = json.load(f)
+    if not rules or any('label' not in rule for rule in rules):
+        raise ValueError(f"Every rule in {path} needs a 'label'.")
+    return rules
+
+
+def evaluate_condition(df, condition):
+    """
+    Evaluates a rule condition over the whole DataFrame at once and returns a
+    boolean mask. Missing values never match, like the row-by-row rules.
+    """
+    if 'any' in condition:
+        return np.logical_or.reduce([evaluate_condition(df, c) for c in condition['any']])
+    if 'all' in condition:
+        return np.logical_and.reduce([evaluate_condition(df, c) for c in condition['all']])
+
+    columns = condition['column']
+    if isinstance(columns, list):
+        values = df[columns[0]].to_numpy(dtype=float)
+        for column in columns[1:]:
+            values = values + df[column].to_numpy(dtype=float)
+    else:
+        values = df[columns].to_numpy(dtype=float)
+    return OPERATORS[condition['op']](values, condition['value'])
+
+
+def assign_clusters(df, rules):
+    """
+    Labels every row with the first rule whose condition matches, using one
+    boolean mask per rule instead of a Python call per row.
+    """
+    conditions, labels = [], []
+    default = "Unknown"
+    for rule in rules:
+        condition = {key: value for key, value in rule.items() if key != 'label'}
+        if not condition:
+            default = rule['label']
+            break
+        conditions.append(evaluate_condition(df, condition))
+        labels.append(rule['label'])
+
+    if not conditions:
+        return np.full(len(df), default, dtype=object)
+    return np.select(conditions, labels, default=default).astype(object)
+
+
+def check_matches_row_rules(input_path, rules):
+    """
+    Verifies that the vectorized rules give exactly the same labels as the
+    row-by-row assign_cluster function for a key stats file.
+    """
+    df = read_table(input_path)
+    expected = df.apply(assign_cluster, axis=1).to_numpy()
+    actual = assign_clusters(df, rules)
+    mismatches = np.flatnonzero(expected != actual)
+    if len(mismatches) > 0:
+        raise AssertionError(f"{len(mismatches)} of {len(df)} labels differ in {input_path}, first at row {mismatches[0]}")
+    print(f"Vectorized rules match row-by-row labels for all {len(df)} rows in {input_path}")
+
+
 # Paths
 input_dir = "data/key_stats"
 output_dir = "data/clustered"
-os.makedirs(output_dir, exist_ok=True)
 
 # Files
 regular_season_input = os.path.join(input_dir, "Key_Stats_Regular_Season.csv")
 playoffs_input = os.path.join(input_dir, "Key_Stats_Playoffs.csv")
 
 # Process a single file
-def process_file(input_path, output_filename):
-    df = pd.read_csv(input_path)  
+def process_file(input_path, output_filename, output_dir=output_dir, rules=None):
+    os.makedirs(output_dir, exist_ok=True)
+    df = read_table(input_path)
     
     # Apply the rules
-    df['Cluster_Label'] = df.apply(assign_cluster, axis=1)
+    df['Cluster_Label'] = assign_clusters(df, rules or load_rules())
 
     # Save to clustered_manual/
     output_path = os.path.join(output_dir, output_filename)
-    df.to_csv(output_path, index=False)
+    write_table(df, output_path)
     print(f"Saved clustered data to {output_path}")
 
-# Run
-process_file(regular_season_input, "Clustered_Manual_Regular_Season.csv")
-process_file(playoffs_input, "Clustered_Manual_Playoffs.csv")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Label players with the rule-based clusters.")
+    parser.add_argument('--rules', default=rules_path, help="JSON rules file")
+    parser.add_argument('--check', action='store_true',
+                        help="only verify the rules match the row-by-row labels")
+    args = parser.parse_args()
+    rules = load_rules(args.rules)
+
+    if args.check:
+        check_matches_row_rules(regular_season_input, rules)
+        check_matches_row_rules(playoffs_input, rules)
+    else:
+        # Run
+        process_file(regular_season_input, "Clustered_Manual_Regular_Season.csv", rules=rules)
+        process_file(playoffs_input, "Clustered_Manual_Playoffs.csv", rules=rules)
@@ -0,0 +1,264 @@
+import argparse
+import bisect
+import csv
+import re
+import time
+import unicodedata
+from collections import Counter
+
+# Player name columns indexed for lookups, with the season type they come from
+NAME_SOURCES = [
+    ('data/processed/ml_ready/Player_Mapping_Regular_Season.csv', ';', 'R'),
+    ('data/processed/ml_ready/Player_Mapping_Playoffs.csv', ';', 'P'),
+    ('data/clustered/Clustered_Manual_Regular_Season.csv', ',', 'R'),
+    ('data/clustered/Clustered_Manual_Playoffs.csv', ',', 'P'),
+]
+
+# Letters NFKD does not decompose, plus the mis-decoded ones found in the raw
+# files (e.g. 'Alperen Þengün', 'Luka \x8aamani?')
+TRANSLITERATIONS = str.maketrans({
+    'þ': 's', 'Þ': 's', '\x8a': 's', '\x9a': 's', 'ø': 'o', 'Ø': 'o', 'ł': 'l', 'Ł': 'l',
+    'đ': 'd', 'Đ': 'd', 'æ': 'ae', 'Æ': 'ae', 'ß': 'ss',
+})
+
+# Dropped without a space, so "P.J." and "De'Aaron" fold to "pj" and "deaaron"
+JOINING_PUNCTUATION = re.compile(r"['’`.]")
+SEPARATORS = re.compile(r"[^a-z0-9]+")
+
+NGRAM_SIZE = 3
+
+# Fuzzy matches scoring below this are not returned
+FUZZY_MIN_SCORE = 0.3
+
+# resolve() accepts a fuzzy match only from this score up
+RESOLVE_MIN_SCORE = 0.6
+
+MAX_LIMIT = 50
+
+
+def fold_name(name):
+    """
+    Folds a player name to a lowercase ASCII key: accents are stripped,
+    known non-decomposing and mis-decoded letters transliterated, periods and
+    apostrophes dropped and any other punctuation (including the '?' left by
+    broken encodings) turned into single spaces.
+    """
+    text = unicodedata.normalize('NFKD', str(name).translate(TRANSLITERATIONS))
+    text = text.encode('ascii', 'ignore').decode('ascii').casefold()
+    text = JOINING_PUNCTUATION.sub('', text)
+    return SEPARATORS.sub(' ', text).strip()
+
+
+def name_ngrams(key, n=NGRAM_SIZE):
+    padded = f" {key} "
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+class NameIndex:
+    """
+    Player name lookups over a fixed set of names:
+        exact    - folded name -> player, one dict access
+        complete - prefix autocomplete, by binary search over sorted folded
+                   names and sorted word suffixes ("jok" finds Nikola Jokic)
+        fuzzy    - candidates sharing character trigrams with the query,
+                   ranked by Dice similarity of the trigram sets
+    """
+
+    def __init__(self, names=(), tags=None):
+        self.names = []
+        self.spellings = []
+        self.tags = []
+        self._keys = []
+        self._exact = {}
+        for i, name in enumerate(names):
+            self.add(name, None if tags is None else tags[i])
+        self._build()
+
+    def add(self, name, tag=None):
+        """
+        Adds a name. Names that fold to the same key (e.g. 'Alperen Sengun'
+        and 'Alperen Þengün') share one entry, shown with the first spelling.
+        Call _build() after the last add.
+        """
+        name = str(name)
+        key = fold_name(name)
+        i = self._exact.get(key)
+        if i is None:
+            i = self._exact[key] = len(self.names)
+            self.names.append(name)
+            self.spellings.append([])
+            self.tags.append(set())
+            self._keys.append(key)
+        if name not in self.spellings[i]:
+            self.spellings[i].append(name)
+        if tag is not None:
+            self.tags[i].add(tag)
+
+    def _build(self):
+        self._full = sorted((key, i) for i, key in enumerate(self._keys))
+        # Word suffixes after the first word, e.g. "jokic" for "nikola jokic"
+        self._suffixes = sorted(
+            (key[m.end():], i) for i, key in enumerate(self._keys) for m in re.finditer(' ', key)
+        )
+        self._grams = {}
+        self._gram_counts = []
+        for i, key in enumerate(self._keys):
+            grams = name_ngrams(key)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._grams.setdefault(gram, []).append(i)
+
+    @classmethod
+    def from_files(cls, sources=NAME_SOURCES):
+        """
+        Builds an index from the 'Player' column of CSV files, given as
+        (path, delimiter, tag) tuples. Missing files are skipped.
+        """
+        index = cls()
+        for path, delimiter, tag in sources:
+            try:
+                with open(path, newline='', encoding='utf-8') as f:
+                    for row in csv.DictReader(f, delimiter=delimiter):
+                        index.add(row['Player'], tag)
+            except FileNotFoundError:
+                continue
+        index._build()
+        return index
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return fold_name(name) in self._exact
+
+    def _entry(self, i, match, score):
+        return {'player': self.names[i], 'match': match, 'score': round(score, 3), 'seasons': sorted(self.tags[i])}
+
+    def exact(self, name):
+        """
+        Returns the indexed spelling of a name, matching accents, case and
+        punctuation loosely, or None.
+        """
+        i = self._exact.get(fold_name(name))
+        return None if i is None else self.names[i]
+
+    def _prefix_ids(self, prefix, limit, tag=None):
+        """
+        Ids of up to `limit` players (only those with `tag`, if given) whose
+        full name or a later word starts with `prefix`, full names first.
+        Stops scanning as soon as `limit` ids are collected.
+        """
+        ids = {}
+        for keys in (self._full, self._suffixes):
+            start = bisect.bisect_left(keys, (prefix,))
+            for j in range(start, len(keys)):
+                if len(ids) >= limit:
+                    return list(ids)
+                key, i = keys[j]
+                if not key.startswith(prefix):
+                    break
+                if i not in ids and (tag is None or tag in self.tags[i]):
+                    ids[i] = None
+        return list(ids)
+
+    def complete(self, prefix, limit=10):
+        """
+        Returns up to `limit` players whose name, or any word of it after the
+        first, starts with `prefix`; full-name matches first, each group in
+        alphabetical order.
+        """
+        prefix = fold_name(prefix)
+        if not prefix:
+            return []
+        return [self._entry(i, 'prefix', 1.0) for i in self._prefix_ids(prefix, limit)]
+
+    def _fuzzy_scores(self, key):
+        grams = name_ngrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._grams.get(gram, ()))
+        return {i: 2 * count / (len(grams) + self._gram_counts[i]) for i, count in shared.items()}
+
+    def fuzzy(self, query, limit=10, min_score=FUZZY_MIN_SCORE):
+        """
+        Returns up to `limit` players ranked by trigram similarity to `query`,
+        best first, skipping those scoring under min_score.
+        """
+        key = fold_name(query)
+        if not key:
+            return []
+        scores = self._fuzzy_scores(key)
+        ranked = sorted((i for i, score in scores.items() if score >= min_score),
+                        key=lambda i: (-scores[i], self._keys[i]))
+        return [self._entry(i, 'fuzzy', scores[i]) for i in ranked[:limit]]
+
+    def search(self, query, limit=10, tag=None):
+        """
+        Autocomplete for a partly typed name: the exact match if any, then
+        prefix matches, then fuzzy matches, without repeats. With a tag, only
+        players from sources with that tag (e.g. 'P') are returned.
+        """
+        key = fold_name(query)
+        if not key:
+            return []
+        results, seen = [], set()
+
+        def take(i, match, score):
+            if len(results) < limit and i not in seen and (tag is None or tag in self.tags[i]):
+                results.append(self._entry(i, match, score))
+                seen.add(i)
+
+        i = self._exact.get(key)
+        if i is not None:
+            take(i, 'exact', 1.0)
+        # One extra candidate in case the exact match comes up again
+        for i in self._prefix_ids(key, limit + 1, tag):
+            take(i, 'prefix', 1.0)
+        if len(results) < limit:
+            scores = self._fuzzy_scores(key)
+            for i in sorted((i for i, score in scores.items() if score >= FUZZY_MIN_SCORE),
+                            key=lambda i: (-scores[i], self._keys[i])):
+                if len(results) >= limit:
+                    break
+                take(i, 'fuzzy', scores[i])
+        return results
+
+    def spellings_for(self, name):
+        """
+        Returns every indexed spelling of a name (see add()), or [].
+        """
+        i = self._exact.get(fold_name(name)) if name is not None else None
+        return [] if i is None else list(self.spellings[i])
+
+    def resolve(self, name, min_score=RESOLVE_MIN_SCORE):
+        """
+        Returns the indexed spelling of a name: the exact match if any, else
+        the best fuzzy match scoring at least min_score, else None.
+        """
+        match = self.exact(name)
+        if match is not None:
+            return match
+        best = self.fuzzy(name, 1, min_score)
+        return best[0]['player'] if best else None
+
+
+def load_name_index(sources=NAME_SOURCES):
+    return NameIndex.from_files(sources)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up player names in the name index.")
+    parser.add_argument('query', nargs='+', help="(partial) player names")
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_name_index()
+    print(f"Indexed {len(index)} players in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for query in args.query:
+        start = time.perf_counter()
+        results = index.search(query, args.limit)
+        elapsed = (time.perf_counter() - start) * 1e6
+        print(f"\n{query!r} ({elapsed:.0f} us):")
+        for entry in results:
+            print(f"  {entry['player']} [{entry['match']} {entry['score']}] {'/'.join(entry['seasons'])}")
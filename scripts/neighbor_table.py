@@ -0,0 +1,162 @@
+import argparse
+import os
+
+import numpy as np
+
+from feature_matrix import artifact_sources, features_dir
+from similarity import SimilarityEngine, MAX_K
+
+FEATURES = ['PTS', 'Age', 'Usage Rate', 'AST', 'TRB', 'STL', 'BLK', '3P%']
+
+# Neighbors stored per player; lookups can ask for any k up to this
+NEIGHBOR_K = 20
+
+
+def neighbor_table_path(dataset, directory=features_dir):
+    """
+    Returns the .npz path of a dataset's neighbor table, e.g. for 'Playoffs'.
+    """
+    return os.path.join(directory, f"Neighbors_{dataset}.npz")
+
+
+def compute_neighbors(X_scaled, k=NEIGHBOR_K):
+    """
+    Finds the k nearest other players of every player (Euclidean distance in
+    the standardized feature space). Returns (indices, distances) as int32 and
+    float32 arrays of shape (n_players, k), nearest first.
+    """
+    X_scaled = np.asarray(X_scaled, dtype=float)
+    k = min(k, MAX_K - 1, len(X_scaled) - 1)
+    indices, distances = SimilarityEngine(X_scaled).top_k(X_scaled, k + 1)
+
+    # Drop each player from their own list. A player with an identical twin
+    # may not come back first, or at all, in which case the extra last
+    # neighbor is dropped instead.
+    keep = indices != np.arange(len(X_scaled))[:, None]
+    missing_self = keep.all(axis=1)
+    keep[missing_self, -1] = False
+    indices = indices[keep].reshape(len(X_scaled), k)
+    distances = distances[keep].reshape(len(X_scaled), k)
+    return indices.astype(np.int32), distances.astype(np.float32)
+
+
+def build_neighbor_table(scaler_path, clustered_path, dataset, k=NEIGHBOR_K, directory=features_dir):
+    """
+    Precomputes the top-k similar players of every player in a clustered
+    dataset and saves them with the player names, so "who compares to X"
+    lookups need no distance math at request time.
+    """
+    import joblib
+    from artifact_store import read_table
+
+    os.makedirs(directory, exist_ok=True)
+    scaler = joblib.load(scaler_path)
+    data = read_table(clustered_path)
+    X_scaled = scaler.transform(data[FEATURES].astype(float))
+
+    indices, distances = compute_neighbors(X_scaled, k)
+    output_path = neighbor_table_path(dataset, directory)
+    sources = artifact_sources(scaler_path, clustered_path)
+    np.savez(output_path, indices=indices, distances=distances,
+             players=data['Player'].to_numpy().astype(str),
+             **{name: np.array(value) for name, value in sources.items()})
+    print(f"Saved top-{indices.shape[1]} neighbors of {len(indices)} players to {output_path}")
+
+
+def normalize_name(name):
+    return " ".join(name.split()).casefold()
+
+
+class NeighborTable:
+    """
+    A loaded neighbor table. similar() answers from the stored rows, so a
+    lookup costs one dict access plus k reads. `sources` holds the hashes of
+    the scaler and dataset it was built from (empty for older tables).
+    """
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as table:
+            self.indices = table['indices']
+            self.distances = table['distances']
+            self.players = table['players'].astype(object)
+            self.sources = {name: str(table[name]) for name in ('scaler_sha256', 'dataset_sha256') if name in table}
+        for array in (self.indices, self.distances, self.players):
+            array.setflags(write=False)
+        self.k = self.indices.shape[1]
+        # First occurrence wins if two rows share a name
+        self._rows = {}
+        for row, player in enumerate(self.players):
+            self._rows.setdefault(normalize_name(player), row)
+
+    def __len__(self):
+        return len(self.players)
+
+    def __contains__(self, name):
+        return normalize_name(name) in self._rows
+
+    def find(self, name):
+        """
+        Returns (row, stored name) for a player, matching case and spacing
+        loosely. Raises KeyError for unknown players.
+        """
+        row = self._rows.get(normalize_name(name))
+        if row is None:
+            raise KeyError(f"Unknown player '{name}'.")
+        return row, self.players[row]
+
+    def similar(self, name, k=None):
+        """
+        Returns the k most similar players to `name` as
+        [{'player': ..., 'distance': ...}, ...], nearest first.
+        """
+        k = self.k if k is None else int(k)
+        if not 1 <= k <= self.k:
+            raise ValueError(f"k must be between 1 and {self.k}.")
+        row, _ = self.find(name)
+        return [
+            {'player': self.players[i], 'distance': round(float(d), 4)}
+            for i, d in zip(self.indices[row, :k], self.distances[row, :k])
+        ]
+
+
+def check_table_matches_brute_force(path, scaler_path, clustered_path):
+    """
+    Recomputes every player's neighbors by brute force and checks the stored
+    table agrees. Ties may be ordered differently, so distances are compared.
+    """
+    import joblib
+    from artifact_store import read_table
+
+    scaler = joblib.load(scaler_path)
+    data = read_table(clustered_path)
+    X_scaled = scaler.transform(data[FEATURES].astype(float))
+    table = NeighborTable(path)
+
+    dist = np.linalg.norm(X_scaled[:, None, :] - X_scaled[None, :, :], axis=2)
+    np.fill_diagonal(dist, np.inf)
+    expected = np.sort(dist, axis=1)[:, :table.k]
+    stored = np.linalg.norm(X_scaled[:, None, :] - X_scaled[table.indices], axis=2)
+    if (table.indices == np.arange(len(table))[:, None]).any():
+        raise AssertionError(f"{path}: a player is listed as their own neighbor.")
+    if not np.allclose(stored, expected, atol=1e-6) or not np.allclose(table.distances, expected, atol=1e-4):
+        raise AssertionError(f"{path} does not match the brute-force neighbors.")
+    print(f"{path} matches the brute-force neighbors of all {len(table)} players.")
+
+
+DATASETS = {
+    'R': ('models/scaler_regular.pkl', 'data/clustered/Clustered_Manual_Regular_Season.csv', 'Regular_Season'),
+    'P': ('models/scaler_playoffs.pkl', 'data/clustered/Clustered_Manual_Playoffs.csv', 'Playoffs'),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute every player's most similar players.")
+    parser.add_argument('--k', type=int, default=NEIGHBOR_K, help="neighbors to store per player")
+    parser.add_argument('--check', action='store_true', help="check the stored tables against brute force")
+    args = parser.parse_args()
+
+    for scaler_path, clustered_path, dataset in DATASETS.values():
+        if args.check:
+            check_table_matches_brute_force(neighbor_table_path(dataset), scaler_path, clustered_path)
+        else:
+            build_neighbor_table(scaler_path, clustered_path, dataset, args.k)
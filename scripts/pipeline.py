@@ -0,0 +1,305 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+
+import pandas as pd
+
+import artifact_store
+import clean_data
+import create_key_stats
+import create_models
+import feature_matrix
+import inference
+import manual_clusters
+import neighbor_table
+import player_season_store
+import prepare_ml
+
+# Paths
+raw_dir = "data/raw"
+cache_dir = "data/cache"
+manifest_path = os.path.join(cache_dir, "pipeline_manifest.json")
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Per-season raw files, e.g. "2023-2024 NBA Player Stats - Regular.csv"
+RAW_FILE_PATTERN = re.compile(r"^(\d{4}-\d{4}) NBA Player Stats - (Regular|Playoffs)\.csv$")
+
+# Per-season raw files are Latin-1 encoded (the combined files are UTF-8)
+RAW_ENCODING = 'latin-1'
+
+# Output naming for each season type
+SEASON_TYPES = {
+    'Regular': {'dataset': 'Regular_Season', 'models': 'regular', 'is_regular_season': True},
+    'Playoffs': {'dataset': 'Playoffs', 'models': 'playoffs', 'is_regular_season': False},
+}
+
+# Files each stage's key covers: the scripts it runs plus every local module
+# they import, so editing any of them reruns the stage. pipeline.py hosts
+# the code of the two cleaning stages.
+CLEAN_DATA_CODE = ["clean_data.py", "advanced_metrics.py", "artifact_store.py"]
+STAGE_CODE = {
+    'clean_rows': ["pipeline.py"] + CLEAN_DATA_CODE,
+    'clean_data': ["pipeline.py"] + CLEAN_DATA_CODE,
+    'prepare_ml': ["prepare_ml.py", "artifact_store.py"],
+    'create_key_stats': ["create_key_stats.py", "artifact_store.py"],
+    'manual_clusters': ["manual_clusters.py", "cluster_rules.json", "artifact_store.py"],
+    'create_models': ["create_models.py", "prepare_ml.py", "inference.py", "artifact_store.py"],
+    'export_features': ["feature_matrix.py", "inference.py", "artifact_store.py"],
+    'neighbor_table': ["neighbor_table.py", "similarity.py", "feature_matrix.py", "inference.py", "artifact_store.py"],
+    'player_seasons': ["player_season_store.py", "similarity.py", "feature_matrix.py", "inference.py"] + CLEAN_DATA_CODE,
+}
+
+
+def file_hash(path):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def output_stat(path):
+    """
+    Returns (mtime in ns, size, inode) of a file, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def find_season_files(directory=raw_dir):
+    """
+    Finds the per-season raw files and groups them by season type, sorted by
+    season so the combined data keeps the same row order as the combined CSVs.
+    """
+    season_files = {season_type: [] for season_type in SEASON_TYPES}
+    for filename in sorted(os.listdir(directory)):
+        match = RAW_FILE_PATTERN.match(filename)
+        if match:
+            season, season_type = match.groups()
+            season_files[season_type].append((season, os.path.join(directory, filename)))
+    return season_files
+
+
+class Pipeline:
+    """
+    Runs pipeline stages only when their inputs change.
+
+    Each stage is keyed on the content hash of its input files and of the
+    scripts that implement it. The key is recorded in a manifest after the
+    stage succeeds, i.e. rewrites every one of its outputs; on the next run
+    a stage whose key matches and whose outputs still exist is skipped.
+    Since a stage's outputs are the next stage's inputs, a rebuild that
+    produces identical files stops there.
+    """
+
+    def __init__(self, manifest_file=manifest_path, force=False, dry_run=False):
+        self.manifest_file = manifest_file
+        self.force = force
+        self.dry_run = dry_run
+        self.manifest = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file) as f:
+                self.manifest = json.load(f)
+        self.ran = []
+        self.skipped = []
+        # Outputs that a dry run would have rebuilt
+        self._pending_outputs = set()
+
+    def stage_key(self, inputs, code):
+        digest = hashlib.sha256()
+        # Switching the columnar copies on or off rebuilds every stage
+        digest.update(str(artifact_store.COLUMNAR_ENABLED).encode())
+        for path in list(inputs) + [os.path.join(scripts_dir, name) for name in code]:
+            digest.update(os.path.normpath(path).encode())
+            digest.update(file_hash(path).encode())
+        return digest.hexdigest()
+
+    def run_stage(self, name, inputs, outputs, build, code=()):
+        key = self.stage_key(inputs, code)
+        entry = self.manifest.get(name)
+        up_to_date = (
+            not self.force
+            and entry is not None
+            and entry['key'] == key
+            and all(os.path.exists(path) for path in outputs)
+            and not self._pending_outputs.intersection(inputs)
+        )
+        if up_to_date:
+            print(f"[skip] {name} is up to date.")
+            self.skipped.append(name)
+            return False
+
+        print(f"[run] {name}")
+        self.ran.append(name)
+        if self.dry_run:
+            self._pending_outputs.update(outputs)
+            return True
+
+        before = {path: output_stat(path) for path in outputs}
+        started = time.time_ns()
+        build()
+        # The stage scripts print their errors instead of raising, so a
+        # failed build is caught by its outputs not having been rewritten
+        stale = []
+        for path in outputs:
+            after = output_stat(path)
+            if after is None or (after == before[path] and after[0] < started):
+                stale.append(path)
+        if stale:
+            raise RuntimeError(f"Stage {name} did not write {stale}; fix the error above and rerun.")
+        self.manifest[name] = {'key': key, 'inputs': list(inputs), 'outputs': list(outputs)}
+        self.save_manifest()
+        return True
+
+    def save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_file), exist_ok=True)
+        with open(self.manifest_file, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+
+
+def clean_season_file(raw_file, output_file, is_regular_season):
+    data = pd.read_csv(raw_file, delimiter=';', encoding=RAW_ENCODING)
+    print(f"Processing {raw_file}...")
+    data = clean_data.clean_raw_rows(data, is_regular_season)
+    data.to_csv(output_file, index=False, sep=';')
+
+
+def combine_season_files(season_outputs, cleaned_file, human_readable_file):
+    data = pd.concat([pd.read_csv(path, delimiter=';') for path in season_outputs], ignore_index=True)
+    data = clean_data.combine_cleaned_rows(data)
+    clean_data.save_cleaned_data(data, cleaned_file, human_readable_file)
+
+
+def run_pipeline(pipeline, season_types=None):
+    """
+    Runs every stage for the requested season types, from the per-season raw
+    files through to the trained models.
+    """
+    season_files = find_season_files()
+    seasons_dir = os.path.join(cache_dir, "seasons")
+    for directory in [seasons_dir, "data/processed/cleaned", "data/processed/human_readable",
+                      "data/processed/ml_ready", create_key_stats.output_dir, manual_clusters.output_dir, create_models.models_dir]:
+        os.makedirs(directory, exist_ok=True)
+
+    for season_type in season_types or SEASON_TYPES:
+        settings = SEASON_TYPES[season_type]
+        dataset = settings['dataset']
+        if not season_files[season_type]:
+            print(f"No per-season {season_type} files found in {raw_dir}. Skipping.")
+            continue
+
+        # Stage 1: row-level cleaning, one cached output per season file
+        season_outputs = []
+        for season, raw_file in season_files[season_type]:
+            season_output = os.path.join(seasons_dir, f"Cleaned_Rows_{season}_{season_type}.csv")
+            pipeline.run_stage(
+                f"clean_rows/{season}/{season_type}", [raw_file], [season_output],
+                lambda raw_file=raw_file, season_output=season_output: clean_season_file(
+                    raw_file, season_output, settings['is_regular_season']),
+                code=STAGE_CODE['clean_rows'],
+            )
+            season_outputs.append(season_output)
+
+        # Stage 2: combine seasons, average duplicate players, add advanced metrics
+        cleaned_file = f"data/processed/cleaned/Cleaned_NBA_Player_Stats_{dataset}.csv"
+        human_readable_file = f"data/processed/human_readable/Human_Readable_Cleaned_NBA_Player_Stats_{dataset}.csv"
+        pipeline.run_stage(
+            f"clean_data/{season_type}", season_outputs, [cleaned_file, human_readable_file],
+            lambda: combine_season_files(season_outputs, cleaned_file, human_readable_file),
+            code=STAGE_CODE['clean_data'],
+        )
+
+        # Stage 3: ML-ready data, player mapping and the fitted preprocessing
+        ml_ready_file = f"data/processed/ml_ready/ML_Ready_NBA_Player_Stats_{dataset}.csv"
+        mapping_file = f"data/processed/ml_ready/Player_Mapping_{dataset}.csv"
+        preprocessing_file = prepare_ml.preprocessing_path(settings['models'], create_models.models_dir)
+        pipeline.run_stage(
+            f"prepare_ml/{season_type}", [cleaned_file], [ml_ready_file, mapping_file, preprocessing_file],
+            lambda: prepare_ml.preprocess_data(cleaned_file, ml_ready_file, mapping_file, preprocessing_file),
+            code=STAGE_CODE['prepare_ml'],
+        )
+
+        # Stage 4: key stats
+        key_stats_name = f"Key_Stats_{dataset}.csv"
+        key_stats_file = os.path.join(create_key_stats.output_dir, key_stats_name)
+        pipeline.run_stage(
+            f"create_key_stats/{season_type}", [cleaned_file], [key_stats_file],
+            lambda: create_key_stats.process_file(cleaned_file, key_stats_name),
+            code=STAGE_CODE['create_key_stats'],
+        )
+
+        # Stage 5: rule-based labels
+        clustered_name = f"Clustered_Manual_{dataset}.csv"
+        clustered_file = os.path.join(manual_clusters.output_dir, clustered_name)
+        pipeline.run_stage(
+            f"manual_clusters/{season_type}", [key_stats_file], [clustered_file],
+            lambda: manual_clusters.process_file(key_stats_file, clustered_name),
+            code=STAGE_CODE['manual_clusters'],
+        )
+
+        # Stage 6: scaler and KMeans models
+        scaler_file = os.path.join(create_models.models_dir, f"scaler_{settings['models']}.pkl")
+        kmeans_file = os.path.join(create_models.models_dir, f"kmeans_{settings['models']}.pkl")
+        pipeline.run_stage(
+            f"create_models/{season_type}", [ml_ready_file, preprocessing_file],
+            [scaler_file, kmeans_file, inference.compact_model_path(kmeans_file)],
+            lambda: create_models.train_and_save_models(ml_ready_file, scaler_file, kmeans_file,
+                                                        preprocessing_path=preprocessing_file),
+            code=STAGE_CODE['create_models'],
+        )
+
+        # Stage 7: memory-mappable standardized feature matrix for the app
+        feature_files = list(feature_matrix.feature_matrix_paths(dataset))
+        pipeline.run_stage(
+            f"export_features/{season_type}", [clustered_file, scaler_file], feature_files,
+            lambda: feature_matrix.export_feature_matrix(scaler_file, clustered_file, dataset),
+            code=STAGE_CODE['export_features'],
+        )
+
+        # Stage 8: every player's most similar players, for name lookups
+        neighbors_file = neighbor_table.neighbor_table_path(dataset)
+        pipeline.run_stage(
+            f"neighbor_table/{season_type}", [clustered_file, scaler_file], [neighbors_file],
+            lambda: neighbor_table.build_neighbor_table(scaler_file, clustered_file, dataset),
+            code=STAGE_CODE['neighbor_table'],
+        )
+
+        # Stage 9: one row per player per season, partitioned by season and position
+        season_raw_files = list(season_files[season_type])
+        store_file = player_season_store.player_season_store_path(dataset)
+        pipeline.run_stage(
+            f"player_seasons/{season_type}", [raw_file for _, raw_file in season_raw_files] + [scaler_file], [store_file],
+            lambda: player_season_store.build_player_season_store(
+                season_raw_files, scaler_file, dataset, settings['is_regular_season']),
+            code=STAGE_CODE['player_seasons'],
+        )
+
+    print(f"\nPipeline finished: {len(pipeline.ran)} stage(s) rebuilt, {len(pipeline.skipped)} up to date.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally rebuild the NBA player data pipeline.")
+    parser.add_argument('--force', action='store_true', help="rebuild every stage regardless of the cache")
+    parser.add_argument('--dry-run', action='store_true', help="only report which stages would be rebuilt")
+    parser.add_argument('--season-type', choices=sorted(SEASON_TYPES), action='append',
+                        help="limit the run to one season type (repeatable)")
+    parser.add_argument('--columnar', action='store_true',
+                        help="also write columnar (.npz + schema) copies of every output")
+    args = parser.parse_args()
+    if args.columnar:
+        artifact_store.COLUMNAR_ENABLED = True
+
+    try:
+        run_pipeline(Pipeline(force=args.force, dry_run=args.dry_run), args.season_type)
+    except RuntimeError as e:
+        print(f"\nPipeline stopped: {e}")
+        exit(1)
@@ -0,0 +1,71 @@
+import numpy as np
+
+# Rows scored per distance block in the brute-force path, capped so the
+# (rows x players x features) temporary stays under ~4M elements
+BRUTE_FORCE_CHUNK_SIZE = 256
+BRUTE_FORCE_MAX_ELEMENTS = 4_000_000
+
+
+def brute_force_nearest(X_scaled, queries):
+    """
+    Returns the index of the closest row of X_scaled for every query by
+    computing the full Euclidean distance to every player (first index wins ties).
+    """
+    chunk_size = max(1, min(BRUTE_FORCE_CHUNK_SIZE, BRUTE_FORCE_MAX_ELEMENTS // max(1, X_scaled.size)))
+    closest_idx = np.empty(len(queries), dtype=np.intp)
+    for start in range(0, len(queries), chunk_size):
+        block = queries[start:start + chunk_size]
+        diff = block[:, None, :] - X_scaled[None, :, :]
+        distances = np.linalg.norm(diff, axis=2)
+        closest_idx[start:start + len(block)] = np.argmin(distances, axis=1)
+    return closest_idx
+
+
+class BruteForceIndex:
+    """
+    Same interface as PlayerIndex without building a tree, so the feature
+    matrix is used as-is (e.g. a shared memory-mapped float32 matrix).
+    """
+
+    def __init__(self, X_scaled):
+        self.X_scaled = X_scaled
+
+    def __len__(self):
+        return len(self.X_scaled)
+
+    def nearest(self, queries):
+        return brute_force_nearest(self.X_scaled, np.atleast_2d(np.asarray(queries, dtype=float)))
+
+
+class PlayerIndex:
+    """
+    KD-tree over a standardized feature matrix for closest-player lookups.
+    Answers are identical to brute_force_nearest: the tree finds the nearest
+    distance, then every player within that distance is re-scored exactly and
+    the lowest index wins ties, just like np.argmin.
+    """
+
+    def __init__(self, X_scaled, leaf_size=40):
+        from sklearn.neighbors import KDTree
+
+        self.X_scaled = np.ascontiguousarray(X_scaled, dtype=float)
+        self.tree = KDTree(self.X_scaled, leaf_size=leaf_size)
+
+    def __len__(self):
+        return len(self.X_scaled)
+
+    def nearest(self, queries):
+        queries = np.atleast_2d(np.asarray(queries, dtype=float))
+        distances, _ = self.tree.query(queries, k=1)
+
+        # Small tolerance so players tied with the nearest one are not missed
+        radius = distances[:, 0] * (1 + 1e-9) + 1e-12
+        candidates = self.tree.query_radius(queries, r=radius)
+
+        closest_idx = np.empty(len(queries), dtype=np.intp)
+        for i, candidate_idx in enumerate(candidates):
+            candidate_idx = np.sort(candidate_idx)
+            exact = np.linalg.norm(self.X_scaled[candidate_idx] - queries[i], axis=1)
+            closest_idx[i] = candidate_idx[np.argmin(exact)]
+        return closest_idx
+
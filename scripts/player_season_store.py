@@ -0,0 +1,286 @@
+import argparse
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from feature_matrix import artifact_sources, features_dir
+from similarity import SimilarityEngine, MAX_K
+
+FEATURES = ['PTS', 'Age', 'Usage Rate', 'AST', 'TRB', 'STL', 'BLK', '3P%']
+
+POSITIONS = ('PG', 'SG', 'SF', 'PF', 'C')
+
+# Metrics whose distances mean the same thing in every partition; Mahalanobis
+# whitens by the covariance of the players searched, so it is left out
+PARTITION_METRICS = ('euclidean', 'cosine')
+
+# Per-season raw files are Latin-1 encoded (the combined files are UTF-8)
+RAW_ENCODING = 'latin-1'
+
+SEASON_FORMAT = re.compile(r"^(\d{4})-(\d{2}|\d{4})$")
+
+
+def player_season_store_path(dataset, directory=features_dir):
+    """
+    Returns the .npz path of a dataset's player-season store, e.g. for 'Playoffs'.
+    """
+    return os.path.join(directory, f"Player_Seasons_{dataset}.npz")
+
+
+def normalize_season(season):
+    """
+    Accepts '2023-2024' or '2023-24' and returns '2023-2024'.
+    Raises ValueError for anything else.
+    """
+    match = SEASON_FORMAT.match(str(season).strip())
+    if not match:
+        raise ValueError(f"Invalid season '{season}'. Use e.g. 2023-2024 or 2023-24.")
+    start, end = match.groups()
+    if len(end) == 2:
+        end = str(int(start) + 1)
+    if int(end) != int(start) + 1:
+        raise ValueError(f"Invalid season '{season}'.")
+    return f"{start}-{end}"
+
+
+def primary_position(pos):
+    """
+    Returns the first listed position of a dual position like 'PG-SG'.
+    """
+    return str(pos).split('-')[0].strip().upper()
+
+
+def read_season_rows(raw_file, is_regular_season=True):
+    """
+    Reads one per-season raw file and returns one row per player: traded
+    players keep their combined 'TOT' line instead of one line per team. Rows
+    go through the same cleaning and advanced metrics as the combined data.
+    """
+    import pandas as pd
+    import clean_data
+
+    data = pd.read_csv(raw_file, delimiter=';', encoding=RAW_ENCODING)
+    print(f"Processing {raw_file}...")
+    if 'Tm' in data.columns:
+        # The 'TOT' line comes first in the raw files; sort to be sure
+        data = data.sort_values('Tm', key=lambda tm: tm != 'TOT', kind='stable')
+        data = data.drop_duplicates(subset='Player').sort_index()
+    data = clean_data.clean_raw_rows(data, is_regular_season)
+    data = clean_data.add_advanced_metrics(data)
+    data['Pos'] = data['Pos'].map(primary_position)
+    return data
+
+
+def build_player_season_store(season_files, scaler_path, dataset, is_regular_season=True, directory=features_dir):
+    """
+    Builds a dataset's player-season store from its per-season raw files,
+    given as (season, raw_file) pairs. Rows are sorted by season and position
+    so every (season, position) partition is a contiguous slice of the saved
+    scaled matrix; the slice bounds are stored alongside.
+    """
+    import joblib
+    import pandas as pd
+
+    os.makedirs(directory, exist_ok=True)
+    scaler = joblib.load(scaler_path)
+
+    frames = []
+    for season, raw_file in season_files:
+        rows = read_season_rows(raw_file, is_regular_season)
+        rows.insert(0, 'Season', normalize_season(season))
+        frames.append(rows[['Season', 'Pos', 'Player'] + FEATURES])
+    data = pd.concat(frames, ignore_index=True)
+    data = data[data['Pos'].isin(POSITIONS)]
+    data = data.sort_values(['Season', 'Pos', 'Player'], kind='stable').reset_index(drop=True)
+
+    X = data[FEATURES].to_numpy(dtype=float)
+    X_scaled = scaler.transform(data[FEATURES].astype(float))
+
+    keys = list(zip(data['Season'], data['Pos']))
+    starts = [i for i in range(len(keys)) if i == 0 or keys[i] != keys[i - 1]]
+    bounds = np.array([(start, end) for start, end in zip(starts, starts[1:] + [len(keys)])], dtype=np.int64)
+
+    output_path = player_season_store_path(dataset, directory)
+    np.savez(
+        output_path,
+        players=data['Player'].to_numpy().astype(str),
+        seasons=data['Season'].to_numpy().astype(str),
+        positions=data['Pos'].to_numpy().astype(str),
+        features=X,
+        X_scaled=np.asarray(X_scaled, dtype=float),
+        partition_seasons=np.array([keys[i][0] for i in starts], dtype=str),
+        partition_positions=np.array([keys[i][1] for i in starts], dtype=str),
+        partition_bounds=bounds,
+        **{name: np.array(value) for name, value in artifact_sources(scaler_path).items()},
+    )
+    print(f"Saved {len(data)} player-seasons in {len(bounds)} (season, position) partitions to {output_path}")
+
+
+# One (season, position) slice of the store and its prebuilt engines
+Partition = namedtuple('Partition', ['season', 'position', 'start', 'stop', 'X_scaled', 'engines'])
+
+
+class PlayerSeasonStore:
+    """
+    A loaded player-season store. Each (season, position) partition holds a
+    read-only view of its rows of the scaled matrix and an unweighted engine
+    per metric, so a filtered query only scans the partitions it selects.
+    `sources` holds the hash of the scaler it was built with (empty for
+    older stores).
+    """
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as store:
+            self.players = store['players'].astype(object)
+            self.seasons_column = store['seasons'].astype(object)
+            self.positions_column = store['positions'].astype(object)
+            self.X_scaled = np.ascontiguousarray(store['X_scaled'])
+            partition_seasons = store['partition_seasons']
+            partition_positions = store['partition_positions']
+            bounds = store['partition_bounds']
+            self.sources = {'scaler_sha256': str(store['scaler_sha256'])} if 'scaler_sha256' in store else {}
+        for array in (self.players, self.seasons_column, self.positions_column, self.X_scaled):
+            array.setflags(write=False)
+
+        self.partitions = {}
+        for season, position, (start, stop) in zip(partition_seasons, partition_positions, bounds):
+            X_part = self.X_scaled[start:stop]
+            engines = {metric: SimilarityEngine(X_part, metric) for metric in PARTITION_METRICS}
+            self.partitions[(str(season), str(position))] = Partition(
+                str(season), str(position), int(start), int(stop), X_part, engines)
+        self._rows = {}
+        for row, key in enumerate(zip(self.players, self.seasons_column)):
+            self._rows.setdefault(key, row)
+        self.seasons = sorted({season for season, _ in self.partitions})
+        self.positions = [position for position in POSITIONS if any(p == position for _, p in self.partitions)]
+
+    def __len__(self):
+        return len(self.players)
+
+    def scaled_row(self, player, season):
+        """
+        Returns a player-season's standardized stats, or None if it is not stored.
+        """
+        row = self._rows.get((player, season))
+        return None if row is None else self.X_scaled[row]
+
+    def select(self, seasons=None, positions=None):
+        """
+        Returns the partitions matching the season and position filters (None
+        or empty means any). Raises ValueError for unknown values or when no
+        partition matches.
+        """
+        seasons = [normalize_season(season) for season in seasons or ()]
+        positions = [primary_position(position) for position in positions or ()]
+        unknown = [season for season in seasons if season not in self.seasons]
+        if unknown:
+            raise ValueError(f"No data for season(s) {unknown}. Available: {self.seasons}.")
+        unknown = [position for position in positions if position not in self.positions]
+        if unknown:
+            raise ValueError(f"Unknown position(s) {unknown}. Choose from {self.positions}.")
+
+        selected = [
+            partition for (season, position), partition in self.partitions.items()
+            if (not seasons or season in seasons) and (not positions or position in positions)
+        ]
+        if not selected:
+            raise ValueError("No players match the season and position filters.")
+        return selected
+
+    def resolve_filters(self, seasons=None, positions=None):
+        """
+        Validates season and position filters and returns them normalized, as
+        (seasons, positions) tuples, so equal filters compare equal.
+        """
+        self.select(seasons, positions)
+        return (tuple(sorted({normalize_season(season) for season in seasons or ()})),
+                tuple(sorted({primary_position(position) for position in positions or ()})))
+
+    def top_k(self, X_scaled, k=1, seasons=None, positions=None, metric='euclidean', weights=None):
+        """
+        Returns the k nearest player-seasons to every scaled stat line among
+        the matching partitions, as [{'player', 'season', 'position',
+        'distance'}, ...] lists, nearest first. Each partition is searched on
+        its own and the per-partition top-k lists are merged.
+        """
+        if metric not in PARTITION_METRICS:
+            raise ValueError(f"Season and position filters support the {PARTITION_METRICS} metrics only.")
+        if not 1 <= k <= MAX_K:
+            raise ValueError(f"k must be between 1 and {MAX_K}.")
+        X_scaled = np.atleast_2d(np.asarray(X_scaled, dtype=float))
+
+        all_rows, all_distances = [], []
+        for partition in self.select(seasons, positions):
+            if weights is None:
+                engine = partition.engines[metric]
+            else:
+                engine = SimilarityEngine(partition.X_scaled, metric, weights)
+            indices, distances = engine.top_k(X_scaled, min(k, len(engine)))
+            all_rows.append(indices + partition.start)
+            all_distances.append(distances)
+        rows = np.concatenate(all_rows, axis=1)
+        distances = np.concatenate(all_distances, axis=1)
+
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        rows = np.take_along_axis(rows, order, axis=1)
+        distances = np.take_along_axis(distances, order, axis=1)
+        return [
+            [
+                {'player': self.players[i], 'season': self.seasons_column[i],
+                 'position': self.positions_column[i], 'distance': round(float(d), 4)}
+                for i, d in zip(row_idx, row_dist)
+            ]
+            for row_idx, row_dist in zip(rows, distances)
+        ]
+
+
+def check_store_matches_brute_force(path, n_random=500, seed=42):
+    """
+    Checks filtered queries against a brute-force scan of the full store
+    filtered row by row, for every single-season and single-position filter.
+    """
+    store = PlayerSeasonStore(path)
+    rng = np.random.default_rng(seed)
+    queries = rng.normal(size=(n_random, store.X_scaled.shape[1]))
+    filters = [([season], None) for season in store.seasons] + [(None, [position]) for position in store.positions]
+    filters += [([store.seasons[-1]], [position]) for position in store.positions]
+    for seasons, positions in filters:
+        mask = np.ones(len(store), dtype=bool)
+        if seasons:
+            mask &= store.seasons_column == seasons[0]
+        if positions:
+            mask &= store.positions_column == positions[0]
+        dist = np.linalg.norm(queries[:, None, :] - store.X_scaled[mask][None, :, :], axis=2)
+        expected = np.sort(dist, axis=1)[:, :5]
+        results = store.top_k(queries, 5, seasons, positions)
+        actual = np.array([[entry['distance'] for entry in row] for row in results])
+        if not np.allclose(actual, expected, atol=1e-4):
+            raise AssertionError(f"{path}: filtered query {seasons} {positions} differs from brute force.")
+        if seasons and any(entry['season'] != seasons[0] for row in results for entry in row):
+            raise AssertionError(f"{path}: filtered query {seasons} returned another season.")
+        if positions and any(entry['position'] != positions[0] for row in results for entry in row):
+            raise AssertionError(f"{path}: filtered query {positions} returned another position.")
+    print(f"{path} matches brute force for {len(filters)} filters over {len(store)} player-seasons.")
+
+
+DATASETS = {
+    'Regular': ('models/scaler_regular.pkl', 'Regular_Season', True),
+    'Playoffs': ('models/scaler_playoffs.pkl', 'Playoffs', False),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the per-season, per-position player store.")
+    parser.add_argument('--check', action='store_true', help="check filtered queries against brute force")
+    args = parser.parse_args()
+
+    from pipeline import find_season_files
+
+    season_files = find_season_files()
+    for season_type, (scaler_path, dataset, is_regular_season) in DATASETS.items():
+        if args.check:
+            check_store_matches_brute_force(player_season_store_path(dataset))
+        else:
+            build_player_season_store(season_files[season_type], scaler_path, dataset, is_regular_season)
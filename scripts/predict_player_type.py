@@ -1,10 +1,51 @@
+import argparse
 import pandas as pd
 import numpy as np
 import pickle
 
+from artifact_store import read_table
+from name_index import NameIndex, load_name_index
+from neighbor_table import NeighborTable, neighbor_table_path
+from player_index import brute_force_nearest
+from player_season_store import PlayerSeasonStore, player_season_store_path
+from similarity import SimilarityEngine, METRICS, MAX_K
+
 # Define features (same ones always)
 FEATURES = ['PTS', 'Age', 'Usage Rate', 'AST', 'TRB', 'STL', 'BLK', '3P%']
 
+def parse_weight(item):
+    """
+    Parses a --weight argument like 'Age=0.25' into (feature, weight).
+    """
+    name, sep, value = item.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected FEATURE=WEIGHT, e.g. Age=0.25, got '{item}'")
+    name = name.strip()
+    if name not in FEATURES:
+        raise argparse.ArgumentTypeError(f"unknown feature '{name}', choose from {', '.join(FEATURES)}")
+    try:
+        weight = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"weight for {name} must be a number, got '{value}'")
+    if not np.isfinite(weight) or weight < 0:
+        raise argparse.ArgumentTypeError(f"weight for {name} must be a non-negative number, got '{value}'")
+    return name, weight
+
+# Options for the list of comparable players
+parser = argparse.ArgumentParser(description="Predict an NBA player type and find comparable players.")
+parser.add_argument('--top-k', type=int, default=5, help=f"number of comparable players to list (1-{MAX_K})")
+parser.add_argument('--metric', choices=METRICS, default='euclidean', help="distance metric for comparisons")
+parser.add_argument('--weight', action='append', default=[], type=parse_weight, metavar='FEATURE=WEIGHT',
+                    help="per-feature weight, e.g. --weight Age=0.25 (repeatable)")
+parser.add_argument('--similar-to', metavar='PLAYER',
+                    help="list the players most similar to an existing player instead of entering stats")
+parser.add_argument('--season', action='append', default=[], metavar='YYYY-YYYY',
+                    help="compare only against players from this season, e.g. 2023-24 (repeatable)")
+parser.add_argument('--position', action='append', default=[], metavar='POS',
+                    help="compare only against players at this position, e.g. C (repeatable)")
+args = parser.parse_args()
+weights = dict(args.weight) or None
+
 # Ask user which comparison
 choice = input("Would you like a Regular Season (R) or Playoff (P) comparison? ").strip().lower()
 
@@ -12,20 +53,64 @@ if choice == 'r':
     print("\nYou selected: Regular Season Comparison")
     scaler = pickle.load(open('models/scaler_regular.pkl', 'rb'))
     kmeans = pickle.load(open('models/kmeans_regular.pkl', 'rb'))
-    key_stats = pd.read_csv('data/key_stats/Key_Stats_Regular_Season.csv')
-    clustered = pd.read_csv('data/clustered/Clustered_Manual_Regular_Season.csv')
+    key_stats = read_table('data/key_stats/Key_Stats_Regular_Season.csv')
+    clustered = read_table('data/clustered/Clustered_Manual_Regular_Season.csv')
 elif choice == 'p':
     print("\nYou selected: Playoff Comparison")
     scaler = pickle.load(open('models/scaler_playoffs.pkl', 'rb'))
     kmeans = pickle.load(open('models/kmeans_playoffs.pkl', 'rb'))
-    key_stats = pd.read_csv('data/key_stats/Key_Stats_Playoffs.csv')
-    clustered = pd.read_csv('data/clustered/Clustered_Manual_Playoffs.csv')
+    key_stats = read_table('data/key_stats/Key_Stats_Playoffs.csv')
+    clustered = read_table('data/clustered/Clustered_Manual_Playoffs.csv')
 else:
     print("\nInvalid input. Please restart and enter 'R' or 'P'.")
     exit()
 
+# Manual labels by player name (first row wins), looked up through a name
+# index so other spellings of the same name still match
+cluster_labels = {}
+for player, label in zip(clustered['Player'], clustered['Cluster_Label']):
+    cluster_labels.setdefault(player, label)
+clustered_names = NameIndex(clustered['Player'])
+
+def player_label(name):
+    for spelling in [name] + clustered_names.spellings_for(name):
+        if spelling in cluster_labels:
+            return cluster_labels[spelling]
+    return "Unknown"
+
+# Look up an existing player in the precomputed neighbor table
+if args.similar_to:
+    table = NeighborTable(neighbor_table_path('Regular_Season' if choice == 'r' else 'Playoffs'))
+    name = args.similar_to
+    if name not in table:
+        # Forgive accents, punctuation and typos
+        player_names = load_name_index()
+        name = next((spelling for spelling in player_names.spellings_for(player_names.resolve(name))
+                     if spelling in table), None)
+        if name is None:
+            print(f"\nUnknown player '{args.similar_to}'.")
+            suggestions = [entry['player'] for entry in player_names.search(args.similar_to, 5, choice.upper())]
+            if suggestions:
+                print(f"Did you mean: {', '.join(suggestions)}?")
+            exit()
+    similar = table.similar(name, min(args.top_k, table.k))
+    print(f"\nPlayers most similar to {table.find(name)[1]}:")
+    for rank, entry in enumerate(similar, start=1):
+        print(f"{rank}. {entry['player']} ({entry['distance']:.3f})")
+    exit()
+
+# Season and position filters search the matching partitions of the player-season store
+store = None
+if args.season or args.position:
+    store = PlayerSeasonStore(player_season_store_path('Regular_Season' if choice == 'r' else 'Playoffs'))
+    try:
+        store.select(args.season, args.position)
+    except ValueError as e:
+        print(f"\n{e}")
+        exit()
+
 # Prepare player dataset
-X = key_stats[FEATURES]
+X = key_stats[FEATURES].astype(float)
 X_scaled = scaler.transform(X)
 
 # Ask user for input
@@ -42,28 +127,49 @@ user_scaled = scaler.transform(user_df)
 # Predict cluster number
 predicted_cluster = kmeans.predict(user_scaled)[0]
 
+if store is not None:
+    try:
+        matches = store.top_k(user_scaled, min(args.top_k, MAX_K), args.season, args.position, args.metric, weights)[0]
+    except ValueError as e:
+        print(f"\n{e}")
+        exit()
+    closest = matches[0]
+    real_label = player_label(closest['player'])
+
+    print("\n--- Prediction Results ---")
+    print(f"Predicted Player Type: {real_label}")
+    print(f"Most similar NBA Player: {closest['player']} ({closest['season']}, {closest['position']})")
+
+    print(f"\nTop {len(matches)} comparable player-seasons ({args.metric} distance):")
+    for rank, entry in enumerate(matches, start=1):
+        print(f"{rank}. {entry['player']} ({entry['season']}, {entry['position']}) ({entry['distance']:.3f})")
+    exit()
+
 # Find players in the same cluster
 key_stats['Cluster'] = kmeans.labels_
 same_cluster_players = key_stats[key_stats['Cluster'] == predicted_cluster]
 
 # Find closest player
 cluster_scaled = X_scaled[key_stats['Cluster'] == predicted_cluster]
-distances = np.linalg.norm(cluster_scaled - user_scaled, axis=1)
-closest_idx = np.argmin(distances)
+# One query against one cluster: a single brute-force pass beats building a tree
+closest_idx = brute_force_nearest(cluster_scaled, user_scaled)[0]
 closest_player_row = same_cluster_players.iloc[closest_idx]
 
 # Find their name
 closest_player_name = closest_player_row['Player']
 
 # Find the real label from clustered_manual file
-matched_row = clustered[clustered['Player'] == closest_player_name]
+real_label = player_label(closest_player_name)
 
-if not matched_row.empty:
-    real_label = matched_row.iloc[0]['Cluster_Label']
-else:
-    real_label = "Unknown"
+# Top-k comparable players within the same cluster
+engine = SimilarityEngine(cluster_scaled, metric=args.metric, weights=weights)
+similar_idx, similar_dist = engine.top_k(user_scaled, min(args.top_k, MAX_K))
 
 # Output
 print("\n--- Prediction Results ---")
 print(f"Predicted Player Type: {real_label}")
 print(f"Most similar NBA Player: {closest_player_name}")
+
+print(f"\nTop {similar_idx.shape[1]} comparable players ({args.metric} distance):")
+for rank, (idx, dist) in enumerate(zip(similar_idx[0], similar_dist[0]), start=1):
+    print(f"{rank}. {same_cluster_players.iloc[idx]['Player']} ({dist:.3f})")
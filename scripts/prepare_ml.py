@@ -1,91 +1,226 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
 import pandas as pd
-import random
 from sklearn.preprocessing import StandardScaler
 
-def standardize_positions(data):
+from artifact_store import read_table, write_table
+
+# Bump when the preprocessing artifact layout or position picks change
+PREPROCESSING_FORMAT_VERSION = 2
+
+# Seed for picking one position of a dual position like 'PG-SG'
+POSITION_SEED = 42
+
+# Rows transformed per vectorized batch
+TRANSFORM_BATCH_SIZE = 50000
+
+# Columns that are never features
+DROPPED_COLUMNS = ['ID', 'Player', 'PF']
+
+
+def preprocessing_path(models_name, directory="models"):
     """
-    Standardizes the 'Pos' column by randomly selecting one position
-    if a player has a dual position (e.g., 'PG-SG').
+    Returns the preprocessing artifact path for a season type, e.g.
+    'regular' -> models/preprocessing_regular.json.
     """
-    print("Standardizing positions...")
-    def resolve_position(pos):
-        if '-' in pos:  # If there's a dual position like 'PG-SG'
-            return random.choice(pos.split('-'))
-        return pos  # Return the position as-is if no '-'
+    return os.path.join(directory, f"preprocessing_{models_name}.json")
 
-    data['Pos'] = data['Pos'].apply(resolve_position)
+
+def position_pick(player, position, n_options, seed=POSITION_SEED):
+    """
+    Index of the option a dual position resolves to for one player: a seeded,
+    stable hash of (player, position) modulo the number of options.
+    """
+    key = f"{seed}\x1f{player}\x1f{position}".encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big') % n_options
+
+
+def resolve_positions(positions, players=None, seed=POSITION_SEED):
+    """
+    Resolves dual positions (e.g. 'PG-SG') to one of their listed positions.
+    The pick depends only on the row's own player and position (see
+    position_pick), so a player resolves the same way whatever batch, subset
+    or row order they are transformed in. Single positions are returned as-is.
+    """
+    positions = pd.Series(positions, dtype=object).astype(str).reset_index(drop=True)
+    if players is None:
+        players = pd.Series('', index=positions.index, dtype=object)
+    players = pd.Series(players, dtype=object).astype(str).reset_index(drop=True)
+    options = positions.str.split('-', expand=True)
+    n_options = options.notna().sum(axis=1).to_numpy()
+
+    # Only dual positions need a pick; each distinct (player, position) is hashed once
+    picks = np.zeros(len(positions), dtype=np.intp)
+    dual = np.flatnonzero(n_options > 1)
+    cache = {}
+    for i in dual:
+        key = (players.iat[i], positions.iat[i])
+        if key not in cache:
+            cache[key] = position_pick(key[0], key[1], int(n_options[i]), seed)
+        picks[i] = cache[key]
+    resolved = options.to_numpy()[np.arange(len(options)), picks]
+    return resolved.astype(object)
+
+
+def standardize_positions(data, seed=POSITION_SEED):
+    """
+    Standardizes the 'Pos' column by selecting one position, by a seeded hash
+    of the player and position, if a player has a dual position (e.g., 'PG-SG').
+    """
+    print("Standardizing positions...")
+    data['Pos'] = resolve_positions(data['Pos'], data.get('Player'), seed)
     print("Positions standardized successfully.")
     return data
 
-def scale_numeric_columns(data):
+
+def fit_preprocessing(data, seed=POSITION_SEED):
     """
-    Scales numeric columns using StandardScaler, excluding categorical or one-hot-encoded columns.
+    Fits the preprocessing on cleaned data: the numeric feature columns and
+    their order, a StandardScaler over them and the position vocabulary used
+    for one-hot encoding. Returns it as a JSON-serializable artifact.
     """
-    print("Scaling numeric columns...")
-    # Identify numeric columns
-    numeric_columns = data.select_dtypes(include=['float64', 'int64']).columns.tolist()
+    print("Fitting preprocessing...")
+    positions = sorted(set(resolve_positions(data['Pos'], data.get('Player'), seed)))
+    data = data.drop(columns=DROPPED_COLUMNS, errors='ignore')
+    numeric_columns = [col for col in data.select_dtypes(include=['number']).columns if not col.startswith('Pos_')]
 
-    # Exclude one-hot encoded position columns
-    one_hot_columns = [col for col in data.columns if col.startswith('Pos_')]
-    numeric_columns = [col for col in numeric_columns if col not in one_hot_columns + ['Player']]
-
-    # Apply StandardScaler
     scaler = StandardScaler()
-    data[numeric_columns] = scaler.fit_transform(data[numeric_columns])
-    print("Numeric columns scaled successfully.")
+    scaler.fit(data[numeric_columns])
+    print("Preprocessing fitted successfully.")
+
+    return {
+        'format_version': PREPROCESSING_FORMAT_VERSION,
+        'numeric_columns': numeric_columns,
+        'mean': scaler.mean_.tolist(),
+        'scale': scaler.scale_.tolist(),
+        'positions': positions,
+        'position_columns': [f"Pos_{position}" for position in positions],
+        'position_seed': seed,
+    }
+
+
+def save_preprocessing(artifact, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(artifact, f, indent=2)
+    print(f"Preprocessing saved to {path}.")
 
-    return data
 
-def preprocess_data(input_file, output_file, mapping_output_file):
+def load_preprocessing(path):
+    """
+    Loads a preprocessing artifact written by save_preprocessing. Raises
+    ValueError if it was written in another format version.
+    """
+    with open(path) as f:
+        artifact = json.load(f)
+    if artifact.get('format_version') != PREPROCESSING_FORMAT_VERSION:
+        raise ValueError(f"{path} has format version {artifact.get('format_version')}, "
+                         f"expected {PREPROCESSING_FORMAT_VERSION}. Rerun prepare_ml.py.")
+    return artifact
+
+
+def transform_preprocessing(data, artifact, batch_size=TRANSFORM_BATCH_SIZE):
+    """
+    Applies a fitted preprocessing artifact to cleaned rows without refitting:
+    scales the numeric columns with the stored mean and scale and one-hot
+    encodes the per-player position picks against the stored vocabulary
+    (unknown positions get all zeros). Rows are processed in vectorized
+    batches. Returns a DataFrame with the artifact's column order.
     """
-    Reads data from the input file, standardizes positions, removes unnecessary columns,
-    scales numeric columns, saves the processed data, and stores a separate ID-to-Player mapping.
+    missing = [col for col in artifact['numeric_columns'] + ['Player', 'Pos'] if col not in data.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+
+    mean = np.asarray(artifact['mean'], dtype=float)
+    scale = np.asarray(artifact['scale'], dtype=float)
+    vocabulary = np.array(artifact['positions'], dtype=object)
+    numeric = data[artifact['numeric_columns']].to_numpy(dtype=float)
+    positions = resolve_positions(data['Pos'], data['Player'], artifact['position_seed'])
+
+    scaled = np.empty_like(numeric)
+    one_hot = np.empty((len(data), len(vocabulary)), dtype=bool)
+    for start in range(0, len(data), batch_size):
+        stop = start + batch_size
+        scaled[start:stop] = (numeric[start:stop] - mean) / scale
+        one_hot[start:stop] = positions[start:stop, None] == vocabulary[None, :]
+
+    transformed = pd.DataFrame(scaled, columns=artifact['numeric_columns'])
+    for j, column in enumerate(artifact['position_columns']):
+        transformed[column] = one_hot[:, j]
+    return transformed
+
+
+def preprocess_data(input_file, output_file, mapping_output_file, preprocessing_file=None, seed=POSITION_SEED):
+    """
+    Reads data from the input file, fits the preprocessing (saved to
+    preprocessing_file when given), applies it, saves the processed data, and
+    stores a separate ID-to-Player mapping.
     """
     try:
         # Load the cleaned data
-        data = pd.read_csv(input_file, delimiter=';')
+        data = read_table(input_file, delimiter=';')
         print(f"Processing {input_file}...")
 
         # Save a mapping of ID to Player Name for later interpretation
         player_mapping = data[['ID', 'Player']]
-        player_mapping.to_csv(mapping_output_file, index=False, sep=';')
+        write_table(player_mapping, mapping_output_file, delimiter=';')
         print(f"Saved Player Mapping to {mapping_output_file}.")
 
-        # Drop unnecessary columns: ID, Player (Names), and PF (Personal Fouls)
-        columns_to_drop = ['ID', 'Player', 'PF']
-        data = data.drop(columns=columns_to_drop, errors='ignore')
-        print("Dropped unnecessary columns: ID, Player, PF.")
-
-        # Standardize the positions
-        data = standardize_positions(data)
-
-        # Apply one-hot encoding to 'Pos'
-        position_dummies = pd.get_dummies(data['Pos'], prefix='Pos')
-        data = pd.concat([data, position_dummies], axis=1)
-        data = data.drop(columns=['Pos'])
-        print("One-hot encoding applied to 'Pos' column.")
-
-        # Scale numeric columns
-        data = scale_numeric_columns(data)
+        # Fit the scaler and position vocabulary, then apply them
+        artifact = fit_preprocessing(data, seed)
+        if preprocessing_file:
+            save_preprocessing(artifact, preprocessing_file)
+        data = transform_preprocessing(data, artifact)
+        print("Positions one-hot encoded and numeric columns scaled successfully.")
 
         # Save the ML-ready data
-        data.to_csv(output_file, index=False, sep=';')
+        write_table(data, output_file, delimiter=';')
         print(f"ML-ready data saved to {output_file}.")
 
     except Exception as e:
         print(f"An error occurred while processing {input_file}: {e}")
 
+
+def transform_data(input_file, output_file, preprocessing_file):
+    """
+    Makes new cleaned rows ML-ready with a saved preprocessing artifact,
+    without refitting anything.
+    """
+    artifact = load_preprocessing(preprocessing_file)
+    data = read_table(input_file, delimiter=';')
+    print(f"Transforming {input_file} with {preprocessing_file}...")
+    data = transform_preprocessing(data, artifact)
+    write_table(data, output_file, delimiter=';')
+    print(f"ML-ready data saved to {output_file}.")
+
+
 if __name__ == "__main__":
-    # Process the regular season data
-    preprocess_data(
-        'data/processed/cleaned/Cleaned_NBA_Player_Stats_Regular_Season.csv',
-        'data/processed/ml_ready/ML_Ready_NBA_Player_Stats_Regular_Season.csv',
-        'data/processed/ml_ready/Player_Mapping_Regular_Season.csv'
-    )
-
-    # Process the playoffs data
-    preprocess_data(
-        'data/processed/cleaned/Cleaned_NBA_Player_Stats_Playoffs.csv',
-        'data/processed/ml_ready/ML_Ready_NBA_Player_Stats_Playoffs.csv',
-        'data/processed/ml_ready/Player_Mapping_Playoffs.csv'
-    )
+    parser = argparse.ArgumentParser(description="Make cleaned player stats ML-ready.")
+    parser.add_argument('--transform', nargs=2, metavar=('INPUT', 'OUTPUT'),
+                        help="apply a saved preprocessing artifact to new cleaned rows instead of refitting")
+    parser.add_argument('--preprocessing', default=preprocessing_path('regular'),
+                        help="preprocessing artifact used with --transform")
+    args = parser.parse_args()
+
+    if args.transform:
+        transform_data(args.transform[0], args.transform[1], args.preprocessing)
+    else:
+        # Process the regular season data
+        preprocess_data(
+            'data/processed/cleaned/Cleaned_NBA_Player_Stats_Regular_Season.csv',
+            'data/processed/ml_ready/ML_Ready_NBA_Player_Stats_Regular_Season.csv',
+            'data/processed/ml_ready/Player_Mapping_Regular_Season.csv',
+            preprocessing_path('regular'),
+        )
+
+        # Process the playoffs data
+        preprocess_data(
+            'data/processed/cleaned/Cleaned_NBA_Player_Stats_Playoffs.csv',
+            'data/processed/ml_ready/ML_Ready_NBA_Player_Stats_Playoffs.csv',
+            'data/processed/ml_ready/Player_Mapping_Playoffs.csv',
+            preprocessing_path('playoffs'),
+        )
@@ -0,0 +1,129 @@
+import numpy as np
+
+FEATURES = ['PTS', 'Age', 'Usage Rate', 'AST', 'TRB', 'STL', 'BLK', '3P%']
+
+METRICS = ('euclidean', 'cosine', 'mahalanobis')
+
+# Largest number of comparable players a single query may ask for
+MAX_K = 50
+
+# Queries scored per distance block; bounds the (queries x players) temporary
+QUERY_CHUNK_SIZE = 1024
+
+
+def resolve_weights(weights):
+    """
+    Turns per-feature weights into an array in FEATURES order.
+    Accepts None (all ones), a dict of {feature: weight} with missing features
+    defaulting to 1, or a sequence of 8 weights. Weights must be finite and
+    non-negative, and at least one must be positive.
+    """
+    if weights is None:
+        return np.ones(len(FEATURES))
+    if isinstance(weights, dict):
+        unknown = set(weights) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown features in weights: {sorted(unknown)}")
+        resolved = np.array([float(weights.get(feature, 1.0)) for feature in FEATURES])
+    else:
+        resolved = np.asarray(weights, dtype=float)
+        if resolved.shape != (len(FEATURES),):
+            raise ValueError(f"Expected {len(FEATURES)} weights, got {resolved.shape}")
+    if not np.isfinite(resolved).all() or (resolved < 0).any():
+        raise ValueError("Weights must be finite and non-negative.")
+    if resolved.sum() == 0:
+        raise ValueError("At least one weight must be positive.")
+    return resolved
+
+
+class SimilarityEngine:
+    """
+    Top-k similar-player search over a standardized feature matrix.
+
+    Every metric is reduced to a Euclidean search in a transformed space that
+    is computed once per engine:
+        euclidean   - features scaled by sqrt(weight)
+        mahalanobis - weighted features whitened by the Cholesky factor of the
+                      inverse covariance of the (unweighted) players
+        cosine      - weighted features normalized to unit length; the reported
+                      distance is 1 - cosine similarity
+    """
+
+    def __init__(self, X_scaled, metric='euclidean', weights=None):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}'. Choose from {METRICS}.")
+        self.metric = metric
+        self.weights = resolve_weights(weights)
+
+        # Keep float32 matrices (e.g. memory-mapped ones) as they are
+        X = np.asarray(X_scaled)
+        if not np.issubdtype(X.dtype, np.floating):
+            X = X.astype(float)
+        if metric == 'mahalanobis':
+            # Covariance comes from the unweighted players so weights still matter
+            inv_cov = np.linalg.pinv(np.cov(X, rowvar=False))
+            # Small ridge keeps the factorization stable if features are collinear
+            self._whiten = np.linalg.cholesky(inv_cov + np.eye(len(inv_cov)) * 1e-10)
+        else:
+            self._whiten = None
+
+        if self._whiten is None and metric == 'euclidean' and (self.weights == 1).all():
+            # Unweighted Euclidean needs no transformed copy of the matrix
+            self._points = X
+        else:
+            self._points = self._transform(X * np.sqrt(self.weights))
+        self._sq_norms = np.einsum('ij,ij->i', self._points, self._points, dtype=float)
+
+    def __len__(self):
+        return len(self._points)
+
+    def _transform(self, X):
+        if self._whiten is not None:
+            X = X @ self._whiten
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(X, axis=1, keepdims=True)
+            X = X / np.where(norms == 0, 1, norms)
+        return X
+
+    def top_k(self, queries, k=10):
+        """
+        Returns (indices, distances), each of shape (n_queries, k), sorted from
+        most to least similar. Candidates are picked with np.argpartition so
+        only the k survivors per query are sorted.
+        """
+        k = int(k)
+        if not 1 <= k <= MAX_K:
+            raise ValueError(f"k must be between 1 and {MAX_K}.")
+        k = min(k, len(self))
+
+        queries = np.atleast_2d(np.asarray(queries, dtype=float)) * np.sqrt(self.weights)
+        queries = self._transform(queries)
+
+        indices = np.empty((len(queries), k), dtype=np.intp)
+        distances = np.empty((len(queries), k))
+        for start in range(0, len(queries), QUERY_CHUNK_SIZE):
+            block = queries[start:start + QUERY_CHUNK_SIZE]
+            sq_dist = (
+                np.einsum('ij,ij->i', block, block)[:, None]
+                + self._sq_norms[None, :]
+                - 2 * block @ self._points.T
+            )
+            np.maximum(sq_dist, 0, out=sq_dist)
+
+            if k < len(self):
+                candidates = np.argpartition(sq_dist, k - 1, axis=1)[:, :k]
+            else:
+                candidates = np.broadcast_to(np.arange(len(self)), sq_dist.shape)
+            candidate_dist = np.take_along_axis(sq_dist, candidates, axis=1)
+            order = np.argsort(candidate_dist, axis=1, kind='stable')
+
+            rows = slice(start, start + len(block))
+            indices[rows] = np.take_along_axis(candidates, order, axis=1)
+            distances[rows] = np.take_along_axis(candidate_dist, order, axis=1)
+
+        if self.metric == 'cosine':
+            # Squared chord length between unit vectors is 2 - 2cos
+            distances /= 2
+        else:
+            np.sqrt(distances, out=distances)
+        return indices, distances
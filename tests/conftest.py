@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The scripts and the app import each other as top-level modules
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+sys.path.insert(0, os.path.join(ROOT, 'flask_app'))
+
+
+@pytest.fixture(scope='session', autouse=True)
+def repo_root():
+    # Artifact paths are relative to the repository root
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(ROOT)
+        yield ROOT
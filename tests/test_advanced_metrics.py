@@ -0,0 +1,23 @@
+import contextlib
+import io
+
+import pandas as pd
+
+from advanced_metrics import ADVANCED_METRICS, ZERO_GUARDED_COLUMNS, add_advanced_metrics_fused
+from artifact_store import read_table
+from clean_data import add_advanced_metrics_columnwise
+
+
+def test_fused_metrics_match_columnwise():
+    names = [name for name, _, _ in ADVANCED_METRICS]
+    data = read_table('data/processed/cleaned/Cleaned_NBA_Player_Stats_Playoffs.csv', delimiter=';')
+    base = data.drop(columns=names).head(40).copy()
+    # Zeros in every guarded column exercise the division guards
+    for i, column in enumerate(ZERO_GUARDED_COLUMNS):
+        base.loc[i, column] = 0
+    base.loc[len(ZERO_GUARDED_COLUMNS), ZERO_GUARDED_COLUMNS] = 0
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = add_advanced_metrics_columnwise(base.copy())
+    actual = add_advanced_metrics_fused(base.copy())
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
@@ -0,0 +1,41 @@
+import pytest
+
+FORM = {'Season': 'R', 'PTS': '25', 'Age': '27', 'Usage_Rate': '0.3', 'AST': '5', 'TRB': '7', 'STL': '1',
+        'BLK': '0.5', 'ThreeP': '0.37'}
+
+
+@pytest.fixture(scope='module')
+def client():
+    # Imported here: the app loads its artifacts relative to the repository root
+    import app
+    return app.app.test_client()
+
+
+def test_form_prediction(client):
+    response = client.post('/', data=FORM)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('field, value, message', [
+    ('PTS', 'abc', "could not convert"),
+    ('Age', 'nan', "Age must be a finite number"),
+    ('AST', 'inf', "AST must be a finite number"),
+    ('TRB', '-3', "TRB must not be negative"),
+])
+def test_form_rejects_invalid_stats(client, field, value, message):
+    response = client.post('/', data=dict(FORM, **{field: value}))
+    assert response.status_code == 400
+    assert message in response.get_data(as_text=True)
+
+
+def test_prediction_timeout_is_a_503(client, monkeypatch):
+    import app
+
+    def timed_out(*args, **kwargs):
+        raise TimeoutError("Prediction not scored after 10s")
+
+    monkeypatch.setattr(app, 'run_prediction', timed_out)
+    assert client.post('/', data=FORM).status_code == 503
+    response = client.post('/api/predict', json={'players': [[25, 27, 0.3, 5, 7, 1, 0.5, 0.37]]})
+    assert response.status_code == 503
+    assert "not scored" in response.get_json()['error']
@@ -0,0 +1,28 @@
+import filecmp
+
+import pandas as pd
+import pytest
+
+import clean_data
+
+RAW_FILES = [
+    ('data/raw/Combined NBA Player Stats - Regular.csv', True),
+    ('data/raw/Combined NBA Player Stats - Playoffs.csv', False),
+]
+
+
+@pytest.mark.parametrize('raw_file, is_regular_season', RAW_FILES, ids=['regular', 'playoffs'])
+def test_streaming_matches_in_memory(tmp_path, raw_file, is_regular_season):
+    # Every row of a few dozen players, so traded players and players from
+    # several seasons straddle the small chunks
+    data = pd.read_csv(raw_file, delimiter=';', encoding='utf-8')
+    players = sorted(data['Player'].unique())[::15]
+    small_file = tmp_path / 'raw.csv'
+    data[data['Player'].isin(players)].to_csv(small_file, sep=';', index=False)
+
+    in_memory, streamed = tmp_path / 'in_memory.csv', tmp_path / 'streamed.csv'
+    clean_data.drop_tm_column(str(small_file), str(in_memory), is_regular_season)
+    clean_data.stream_clean(str(small_file), str(streamed), is_regular_season, chunksize=17)
+
+    assert len(pd.read_csv(in_memory, delimiter=';')) > 10
+    assert filecmp.cmp(in_memory, streamed, shallow=False)
@@ -0,0 +1,43 @@
+import re
+
+import numpy as np
+import pytest
+
+import model_registry
+from comparison_charts import render_comparison_svg
+
+BAR_TITLE = re.compile(r"<title>(You|Closest player|Cluster centroid): ([+-]\d+\.\d+) sd</title>")
+
+
+@pytest.fixture(scope='module', params=['R', 'P'])
+def season_models(request):
+    return model_registry.load_season_models(request.param, model_registry.SEASON_ARTIFACTS[request.param])
+
+
+def bar_values(svg):
+    values = {}
+    for name, value in BAR_TITLE.findall(svg.decode('utf-8')):
+        values.setdefault(name, []).append(float(value))
+    return {name: np.array(series) for name, series in values.items()}
+
+
+def test_league_average_line_is_near_zero_sd(season_models):
+    _, X, _ = model_registry.load_player_table(model_registry.SEASON_ARTIFACTS[season_models.season]['data'])
+    average = X.mean(axis=0)
+    cluster = int(season_models.kmeans.predict(season_models.scaler.transform(average[None, :]))[0])
+
+    bars = bar_values(render_comparison_svg(season_models, average, cluster, season_models.players[0]))
+    assert len(bars['You']) == len(model_registry.FEATURES)
+    np.testing.assert_allclose(bars['You'], 0, atol=0.01)
+
+
+def test_centroid_bars_share_the_players_space(season_models):
+    # A KMeans centroid is the mean of its players' standardized stats
+    clusters = season_models.kmeans.predict(season_models.X_scaled)
+    for cluster in np.unique(clusters):
+        members = np.flatnonzero(clusters == cluster)
+        player = season_models.players[members[0]]
+        svg = render_comparison_svg(season_models, np.zeros(len(model_registry.FEATURES)), cluster, player)
+        bars = bar_values(svg)
+        np.testing.assert_allclose(bars['Cluster centroid'], season_models.X_scaled[members].mean(axis=0), atol=0.006)
+        np.testing.assert_allclose(bars['Closest player'], season_models.X_scaled[members[0]], atol=0.006)
@@ -0,0 +1,41 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from artifact_store import read_table
+from manual_clusters import assign_cluster, assign_clusters, load_rules, playoffs_input, regular_season_input
+
+
+@pytest.fixture(scope='module')
+def rules():
+    return load_rules()
+
+
+def row_by_row(df):
+    return df.apply(assign_cluster, axis=1).to_numpy()
+
+
+@pytest.mark.parametrize('path', [regular_season_input, playoffs_input])
+def test_rules_match_row_by_row_labels(rules, path):
+    df = read_table(path)
+    np.testing.assert_array_equal(assign_clusters(df, rules), row_by_row(df))
+
+
+def test_rules_match_row_by_row_labels_on_thresholds(rules):
+    # Every combination of values just below, on and above each threshold;
+    # the STL/BLK pairs sum to exactly 2.0 or just under it
+    pts = [4.9, 5.0, 19.9, 20.0, 22.9, 23.0, np.nan]
+    usage = [0.19, 0.2, 0.49, 0.5, 27.9, 28.0]
+    defense = [(0.7, 1.3), (1.1, 0.9), (0.6, 1.4), (1.0, 0.99), (np.nan, 2.0)]
+    three_pct = [39.9, 40.0]
+    rows = [
+        {'PTS': p, 'Usage Rate': u, 'STL': stl, 'BLK': blk, '3P%': t}
+        for p, u, (stl, blk), t in itertools.product(pts, usage, defense, three_pct)
+    ]
+    df = pd.DataFrame(rows)
+    expected = row_by_row(df)
+    np.testing.assert_array_equal(assign_clusters(df, rules), expected)
+    # The grid reaches every label
+    assert set(expected) == {rule['label'] for rule in rules}
@@ -0,0 +1,71 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from micro_batcher import MicroBatcher
+
+Models = namedtuple('Models', ['season'])
+MODELS = Models('R')
+
+
+def echo(models, X, similar, filters):
+    return [float(row[0]) for row in X]
+
+
+class FailingOnce:
+    """
+    Wraps a callable so its first call raises.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("boom")
+        return self.function(*args)
+
+
+class Histogram:
+    def __init__(self):
+        self.observe = FailingOnce(lambda *args: None)
+
+
+def test_failing_predict_fn_fails_its_requests_only():
+    batcher = MicroBatcher(FailingOnce(echo), timeout=5)
+    with pytest.raises(RuntimeError, match="boom"):
+        batcher.predict(MODELS, np.ones((1, 8)))
+    assert batcher.predict(MODELS, np.full((2, 8), 3.0)) == [3.0, 3.0]
+
+
+def test_failing_observe_does_not_stop_the_worker():
+    batcher = MicroBatcher(echo, size_histogram=Histogram(), timeout=5)
+    with pytest.raises(RuntimeError, match="boom"):
+        batcher.predict(MODELS, np.ones((1, 8)))
+    assert batcher.predict(MODELS, np.full((1, 8), 2.0)) == [2.0]
+
+
+def test_error_outside_predict_fn_does_not_stop_the_worker():
+    batcher = MicroBatcher(echo, timeout=5)
+    # No season to record the batch wait under
+    with pytest.raises(AttributeError):
+        batcher.predict(object(), np.ones((1, 8)))
+    assert batcher.predict(MODELS, np.full((1, 8), 4.0)) == [4.0]
+
+
+def test_predict_times_out():
+    release = threading.Event()
+
+    def stuck(models, X, similar, filters):
+        release.wait(5)
+        return echo(models, X, similar, filters)
+
+    batcher = MicroBatcher(stuck, timeout=0.05)
+    with pytest.raises(TimeoutError):
+        batcher.predict(MODELS, np.ones((1, 8)))
+    release.set()
+    assert batcher.predict(MODELS, np.full((1, 8), 5.0)) == [5.0]
@@ -0,0 +1,121 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import model_registry
+from feature_matrix import export_feature_matrix, feature_matrix_paths
+from inference import compact_model_path
+from neighbor_table import build_neighbor_table
+from predictor import predict_batch
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    """
+    A private copy of the regular-season artifacts, laid out like the
+    repository's, so a test can rewrite them under a live registry.
+    """
+    source = model_registry.SEASON_ARTIFACTS['R']
+    copied = {}
+    for key in ('scaler', 'kmeans', 'data', 'neighbors', 'player_seasons'):
+        copied[key] = str(tmp_path / source[key])
+        os.makedirs(os.path.dirname(copied[key]), exist_ok=True)
+        shutil.copy(source[key], copied[key])
+    shutil.copy(compact_model_path(source['kmeans']), compact_model_path(copied['kmeans']))
+    copied['features'] = feature_matrix_paths('Regular_Season', str(tmp_path / "data/features"))
+    for path, target in zip(source['features'], copied['features']):
+        shutil.copy(path, target)
+    return copied
+
+
+def truncate_dataset(path, rows):
+    with open(path) as f:
+        lines = f.readlines()
+    with open(path, 'w') as f:
+        f.writelines(lines[:rows + 1])
+
+
+@pytest.mark.parametrize('shared_features', [False, True])
+def test_reload_rejects_dataset_without_matching_neighbor_table(artifacts, shared_features):
+    registry = model_registry.ModelRegistry({'R': artifacts}, shared_features=shared_features)
+    active = registry.get('R')
+    n_players = len(active.players)
+
+    truncate_dataset(artifacts['data'], 50)
+    if shared_features:
+        export_feature_matrix(artifacts['scaler'], artifacts['data'], 'Regular_Season',
+                              directory=os.path.dirname(artifacts['features'][0]))
+
+    assert not registry.reload('R')
+    assert registry.get('R') is active
+    assert len(registry.get('R').players) == n_players
+    assert 'Neighbor table' in registry.versions()['R']['last_error']
+
+    # Once the neighbor table is rebuilt from the new dataset the swap goes through
+    build_neighbor_table(artifacts['scaler'], artifacts['data'], 'Regular_Season',
+                         directory=os.path.dirname(artifacts['neighbors']))
+    assert registry.reload('R')
+    reloaded = registry.get('R')
+    assert len(reloaded.players) == len(reloaded.neighbors) == 50
+    np.testing.assert_array_equal(reloaded.neighbors.players, np.asarray(reloaded.players[:]))
+
+
+def test_reload_rejects_store_built_with_another_scaler(artifacts, tmp_path):
+    registry = model_registry.ModelRegistry({'R': artifacts}, shared_features=False)
+    active = registry.get('R')
+
+    with np.load(artifacts['player_seasons'], allow_pickle=False) as store:
+        arrays = dict(store)
+    arrays['scaler_sha256'] = np.array('0' * 64)
+    np.savez(artifacts['player_seasons'], **arrays)
+
+    assert not registry.reload('R')
+    assert registry.get('R') is active
+    assert 'Player-season store' in registry.versions()['R']['last_error']
+
+
+def test_reload_accepts_a_new_cluster_count(artifacts):
+    import joblib
+    from sklearn.cluster import KMeans
+
+    registry = model_registry.ModelRegistry({'R': artifacts}, shared_features=False)
+    active = registry.get('R')
+    n_clusters = len(active.kmeans.cluster_centers_) + 1
+
+    # A retrain whose k sweep picked another cluster count
+    joblib.dump(KMeans(n_clusters=n_clusters, n_init=1, random_state=0).fit(active.X_scaled), artifacts['kmeans'])
+
+    assert registry.reload('R')
+    reloaded = registry.get('R')
+    assert len(reloaded.kmeans.cluster_centers_) == n_clusters
+    _, X, _ = model_registry.load_player_table(artifacts['data'])
+    clusters, player_types, _ = predict_batch(reloaded, X)
+    assert clusters.max() < n_clusters
+    assert "Unknown" not in player_types
+
+
+def test_reload_rejects_scaler_fitted_on_standardized_rows(artifacts):
+    import joblib
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+
+    registry = model_registry.ModelRegistry({'R': artifacts}, shared_features=False)
+    active = registry.get('R')
+
+    # Fitted on z-scores, so it passes raw stat lines through nearly unchanged
+    standardized = pd.DataFrame(np.asarray(active.X_scaled), columns=model_registry.FEATURES)
+    joblib.dump(StandardScaler().fit(standardized), artifacts['scaler'])
+
+    assert not registry.reload('R')
+    assert registry.get('R') is active
+    assert 'does not standardize' in registry.versions()['R']['last_error']
+
+
+def test_bundled_artifacts_share_sources():
+    for season, paths in model_registry.SEASON_ARTIFACTS.items():
+        models = model_registry.load_season_models(season, paths)
+        model_registry.validate_season_models(models)
+        assert models.neighbors.sources == models.sources
+        assert models.player_seasons.sources == {'scaler_sha256': models.sources['scaler_sha256']}
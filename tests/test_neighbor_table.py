@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from neighbor_table import FEATURES, NeighborTable, build_neighbor_table, compute_neighbors, neighbor_table_path
+
+
+def brute_force_neighbors(X, k):
+    dist = np.linalg.norm(X[:, None, :] - X[None, :, :], axis=2)
+    np.fill_diagonal(dist, np.inf)
+    return np.sort(dist, axis=1)[:, :k]
+
+
+def test_neighbors_match_brute_force():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(60, len(FEATURES)))
+    # Identical twins: each must list the other, never itself
+    X[1] = X[0]
+    X[2] = X[0]
+
+    indices, distances = compute_neighbors(X, 10)
+    assert indices.shape == distances.shape == (60, 10)
+    assert not (indices == np.arange(60)[:, None]).any()
+    expected = brute_force_neighbors(X, 10)
+    np.testing.assert_allclose(np.linalg.norm(X[:, None, :] - X[indices], axis=2), expected, atol=1e-12)
+    np.testing.assert_allclose(distances, expected, atol=1e-5)
+
+
+def test_built_table_lists_the_brute_force_neighbors(tmp_path):
+    import joblib
+
+    clustered = tmp_path / 'clustered.csv'
+    pd.read_csv('data/clustered/Clustered_Manual_Playoffs.csv').head(50).to_csv(clustered, index=False)
+    build_neighbor_table('models/scaler_playoffs.pkl', str(clustered), 'Playoffs', k=5, directory=str(tmp_path))
+    table = NeighborTable(neighbor_table_path('Playoffs', str(tmp_path)))
+
+    data = pd.read_csv(clustered)
+    X_scaled = joblib.load('models/scaler_playoffs.pkl').transform(data[FEATURES].astype(float))
+    expected = brute_force_neighbors(X_scaled, 5)
+    for row, player in enumerate(data['Player']):
+        similar = table.similar(player)
+        np.testing.assert_allclose([entry['distance'] for entry in similar], expected[row], atol=1e-4)
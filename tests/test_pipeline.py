@@ -0,0 +1,87 @@
+import ast
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import pipeline
+
+
+def local_imports(name):
+    """
+    Names of the scripts/ modules a script imports, at module level or
+    inside functions, but not under `if __name__ == "__main__":`.
+    """
+    with open(os.path.join(pipeline.scripts_dir, name)) as f:
+        tree = ast.parse(f.read())
+    main_blocks = [
+        node for node in tree.body
+        if isinstance(node, ast.If) and isinstance(node.test, ast.Compare)
+        and isinstance(node.test.left, ast.Name) and node.test.left.id == '__name__'
+    ]
+    skipped = {id(child) for block in main_blocks for child in ast.walk(block)}
+
+    modules = set()
+    for node in ast.walk(tree):
+        if id(node) in skipped:
+            continue
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.add(node.module)
+    return {f"{module}.py" for module in modules
+            if os.path.exists(os.path.join(pipeline.scripts_dir, f"{module}.py"))}
+
+
+@pytest.mark.parametrize('stage', sorted(pipeline.STAGE_CODE))
+def test_stage_code_covers_imported_modules(stage):
+    code = pipeline.STAGE_CODE[stage]
+    for name in code:
+        assert os.path.exists(os.path.join(pipeline.scripts_dir, name)), name
+
+    # pipeline.py imports every stage module; only the code it hosts counts
+    pending = [name for name in code if name.endswith('.py') and name != 'pipeline.py']
+    needed = set(pending)
+    while pending:
+        for module in local_imports(pending.pop()) - needed - {'pipeline.py'}:
+            needed.add(module)
+            pending.append(module)
+    assert needed <= set(code), f"{stage} is missing {sorted(needed - set(code))}"
+
+
+
+def run_pipeline_copy(workdir, *args):
+    """
+    Runs the pipeline from the bundled raw data in a scratch copy of the repo
+    and returns {relative path: bytes} for every stage output, leaving out
+    the columnar copies and the stage cache.
+    """
+    shutil.copytree(pipeline.scripts_dir, os.path.join(workdir, 'scripts'))
+    shutil.copytree(os.path.join('data', 'raw'), os.path.join(workdir, 'data', 'raw'))
+    subprocess.run([sys.executable, '-W', 'ignore', os.path.join('scripts', 'pipeline.py'), *args],
+                   cwd=workdir, check=True, capture_output=True)
+
+    outputs = {}
+    for directory in ('data', 'models'):
+        for root, _, files in os.walk(os.path.join(workdir, directory)):
+            for name in files:
+                path = os.path.relpath(os.path.join(root, name), workdir)
+                if path.startswith(os.path.join('data', 'raw')) or path.startswith(os.path.join('data', 'cache')):
+                    continue
+                if name.endswith('.schema.json') or (name.endswith('.npz') and os.path.exists(
+                        os.path.join(root, os.path.splitext(name)[0] + '.csv'))):
+                    continue
+                with open(os.path.join(root, name), 'rb') as f:
+                    outputs[path] = f.read()
+    return outputs
+
+
+def test_columnar_run_matches_csv_run(tmp_path):
+    csv_outputs = run_pipeline_copy(str(tmp_path / 'csv'))
+    columnar_outputs = run_pipeline_copy(str(tmp_path / 'columnar'), '--columnar')
+
+    assert sorted(columnar_outputs) == sorted(csv_outputs)
+    differing = [path for path in csv_outputs if columnar_outputs[path] != csv_outputs[path]]
+    assert not differing
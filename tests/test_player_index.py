@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import model_registry
+from player_index import BruteForceIndex, PlayerIndex, brute_force_nearest
+from similarity import FEATURES, resolve_weights
+
+WEIGHTS = {'PTS': 2.0, 'Age': 0.25, '3P%': 0.5, 'BLK': 0.0}
+
+
+@pytest.fixture(scope='module', params=['R', 'P'])
+def season_models(request):
+    """
+    A season bundle loaded with the KD-tree threshold lowered, so the bundled
+    datasets (a few hundred players) go through the tree path.
+    """
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(model_registry, 'KD_TREE_MIN_PLAYERS', 1)
+        models = model_registry.load_season_models(request.param, model_registry.SEASON_ARTIFACTS[request.param])
+    return models
+
+
+def make_queries(X_scaled, n_queries=2000, seed=42):
+    # Random stat lines around the players, plus every player's own line
+    rng = np.random.default_rng(seed)
+    spread = X_scaled.std(axis=0) * 2
+    random_queries = X_scaled.mean(axis=0) + rng.standard_normal((n_queries, X_scaled.shape[1])) * spread
+    return np.vstack([random_queries, X_scaled])
+
+
+def assert_matches_brute_force(index, X_scaled, queries):
+    expected = brute_force_nearest(X_scaled, queries)
+    actual = index.nearest(queries)
+    np.testing.assert_array_equal(actual, expected)
+
+    expected_distances = np.linalg.norm(X_scaled[None, :, :] - queries[:, None, :], axis=2).min(axis=1)
+    actual_distances = np.linalg.norm(X_scaled[actual] - queries, axis=1)
+    np.testing.assert_allclose(actual_distances, expected_distances, rtol=0, atol=1e-12)
+
+
+def test_lowered_threshold_builds_kd_tree(season_models):
+    assert isinstance(season_models.index, PlayerIndex)
+
+
+def test_kd_tree_matches_brute_force(season_models):
+    X_scaled = np.asarray(season_models.X_scaled)
+    assert_matches_brute_force(season_models.index, X_scaled, make_queries(X_scaled))
+
+
+def test_weighted_kd_tree_matches_brute_force(season_models):
+    # Weighted Euclidean distance is plain Euclidean distance after scaling
+    # every feature by sqrt(weight)
+    scale = np.sqrt(resolve_weights(WEIGHTS))
+    X_weighted = np.asarray(season_models.X_scaled) * scale
+    queries = make_queries(np.asarray(season_models.X_scaled)) * scale
+    assert_matches_brute_force(PlayerIndex(X_weighted), X_weighted, queries)
+
+
+def test_ties_go_to_lowest_index():
+    X_scaled = np.array([[1.0] * len(FEATURES), [0.0] * len(FEATURES), [1.0] * len(FEATURES)])
+    queries = np.array([[1.0] * len(FEATURES), [0.5] * len(FEATURES)])
+    expected = brute_force_nearest(X_scaled, queries)
+    np.testing.assert_array_equal(PlayerIndex(X_scaled).nearest(queries), expected)
+    np.testing.assert_array_equal(BruteForceIndex(X_scaled).nearest(queries), expected)
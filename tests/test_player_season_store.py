@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from player_season_store import (RAW_ENCODING, PlayerSeasonStore, build_player_season_store,
+                                 player_season_store_path)
+
+SEASON_FILES = [
+    ('2022-2023', 'data/raw/2022-2023 NBA Player Stats - Regular.csv'),
+    ('2023-2024', 'data/raw/2023-2024 NBA Player Stats - Regular.csv'),
+]
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    # The first rows of two seasons, traded players' team lines included
+    directory = tmp_path_factory.mktemp('store')
+    season_files = []
+    for season, raw_file in SEASON_FILES:
+        small_file = directory / f"{season}.csv"
+        data = pd.read_csv(raw_file, delimiter=';', encoding=RAW_ENCODING).head(150)
+        data.to_csv(small_file, sep=';', index=False, encoding=RAW_ENCODING)
+        season_files.append((season, str(small_file)))
+    build_player_season_store(season_files, 'models/scaler_regular.pkl', 'Regular_Season', directory=str(directory))
+    return PlayerSeasonStore(player_season_store_path('Regular_Season', str(directory)))
+
+
+def test_filtered_queries_match_brute_force(store):
+    queries = np.random.default_rng(42).normal(size=(25, store.X_scaled.shape[1]))
+    filters = [([season], None) for season in store.seasons] + [(None, [position]) for position in store.positions]
+    filters += [(store.seasons, ['PG', 'C']), ([store.seasons[-1]], ['SF']), (None, None)]
+    for seasons, positions in filters:
+        mask = np.ones(len(store), dtype=bool)
+        if seasons:
+            mask &= np.isin(store.seasons_column, seasons)
+        if positions:
+            mask &= np.isin(store.positions_column, positions)
+        dist = np.linalg.norm(queries[:, None, :] - store.X_scaled[mask][None, :, :], axis=2)
+        k = min(5, mask.sum())
+
+        results = store.top_k(queries, k, seasons, positions)
+        actual = np.array([[entry['distance'] for entry in row] for row in results])
+        np.testing.assert_allclose(actual, np.sort(dist, axis=1)[:, :k], atol=1e-4)
+        for row in results:
+            assert all(not seasons or entry['season'] in seasons for entry in row)
+            assert all(not positions or entry['position'] in positions for entry in row)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import model_registry
+from predictor import predict_batch, predict_filtered
+
+# A star's stat line and a deep-bench one, in FEATURES order
+STAR = [27.0, 27.0, 0.70, 6.0, 7.0, 1.2, 0.7, 0.35]
+BENCH = [2.5, 25.0, 0.35, 0.6, 1.5, 0.3, 0.2, 0.25]
+
+
+@pytest.fixture(scope='module', params=[('R', False), ('R', True), ('P', False), ('P', True)],
+                ids=['R', 'R-shared', 'P', 'P-shared'])
+def season_models(request):
+    season, shared = request.param
+    loader = model_registry.load_shared_season_models if shared else model_registry.load_season_models
+    return loader(season, model_registry.SEASON_ARTIFACTS[season])
+
+
+def test_scaler_standardizes_raw_stats(season_models):
+    # The players' raw stat lines come out with zero mean and unit spread
+    players, X, _ = model_registry.load_player_table(model_registry.SEASON_ARTIFACTS[season_models.season]['data'])
+    X_scaled = season_models.scaler.transform(X)
+    np.testing.assert_allclose(X_scaled.mean(axis=0), 0, atol=0.25)
+    np.testing.assert_allclose(X_scaled.std(axis=0), 1, atol=0.25)
+
+
+def test_different_stat_lines_get_different_types(season_models):
+    _, player_types, closest = predict_batch(season_models, np.array([STAR, BENCH]))
+    assert list(player_types) == ["All Star", "Bench Player"]
+    assert closest[0] != closest[1]
+
+
+def test_player_type_is_the_closest_players_label(season_models):
+    _, player_types, closest = predict_batch(season_models, np.array([STAR, BENCH]))
+    assert [season_models.labels[str(player)] for player in closest] == list(player_types)
+
+    _, filtered_types, matches = predict_filtered(season_models, np.array([STAR, BENCH]), (None, None))
+    assert [season_models.labels[row[0]['player']] for row in matches] == list(filtered_types)
+    assert filtered_types[0] != filtered_types[1]
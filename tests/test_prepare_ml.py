@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import prepare_ml
+from artifact_store import read_table
+
+CLEANED_FILES = [
+    'data/processed/cleaned/Cleaned_NBA_Player_Stats_Regular_Season.csv',
+    'data/processed/cleaned/Cleaned_NBA_Player_Stats_Playoffs.csv',
+]
+
+
+@pytest.fixture(scope='module', params=CLEANED_FILES)
+def cleaned(request):
+    return read_table(request.param, delimiter=';')
+
+
+def test_shuffled_subset_transforms_like_the_fitted_rows(cleaned):
+    artifact = prepare_ml.fit_preprocessing(cleaned)
+    fitted = prepare_ml.transform_preprocessing(cleaned, artifact)
+
+    subset = cleaned.sample(frac=0.3, random_state=7)
+    transformed = prepare_ml.transform_preprocessing(subset, artifact, batch_size=16)
+
+    expected = fitted.iloc[subset.index.to_numpy()].reset_index(drop=True)
+    pd.testing.assert_frame_equal(transformed, expected)
+
+
+def test_dual_positions_resolve_per_player():
+    players = ['A', 'B', 'C', 'D'] * 50
+    positions = ['PG-SG', 'SF-PF', 'C', 'SG-SF'] * 50
+    resolved = prepare_ml.resolve_positions(positions, players)
+    for player, position, pick in zip(players, positions, resolved):
+        assert pick in position.split('-')
+    # Every row of the same player and position resolves alike, in any order
+    assert len(set(zip(players, resolved))) == 4
+    order = np.random.default_rng(0).permutation(len(players))
+    reordered = prepare_ml.resolve_positions(np.array(positions)[order], np.array(players)[order])
+    np.testing.assert_array_equal(reordered, resolved[order])
+
+
+def test_old_artifacts_are_rejected(tmp_path, cleaned):
+    artifact = dict(prepare_ml.fit_preprocessing(cleaned), format_version=1)
+    path = str(tmp_path / "preprocessing.json")
+    prepare_ml.save_preprocessing(artifact, path)
+    with pytest.raises(ValueError):
+        prepare_ml.load_preprocessing(path)